@@ -11,6 +11,7 @@ import {
   Dialog, DialogContent, DialogTitle, DialogDescription,
 } from "@/components/ui/dialog";
 import StatusBadge from "@/components/shared/StatusBadge";
+import { useAuth } from "@/lib/AuthContext";
 import moment from "moment";
 
 // --- Pixel Creator API config ---
@@ -258,8 +259,20 @@ const WIZARD_STEPS = [
   { num: 2, label: "Install" },
 ];
 
+// Frees a session reserved for the Create Pixel dialog. Best-effort, and
+// keepalive so it still goes out if the page is being left
+function releaseLease(leaseId, userId) {
+  const query = userId ? `?user_id=${encodeURIComponent(userId)}` : "";
+  fetch(`${PIXEL_CREATOR_URL}/api/sessions/${encodeURIComponent(leaseId)}${query}`, {
+    method: "DELETE",
+    headers: { "X-Api-Key": PIXEL_CREATOR_API_KEY },
+    keepalive: true,
+  }).catch(() => {});
+}
+
 // --- Create Pixel Modal ---
 function CreatePixelModal({ open, onOpenChange, onPixelCreating, onPixelCreated }) {
+  const { user } = useAuth();
   const [step, setStep] = useState(1);
   const [name, setName] = useState("");
   const [url, setUrl] = useState("");
@@ -268,8 +281,39 @@ function CreatePixelModal({ open, onOpenChange, onPixelCreating, onPixelCreated
   const [realPixelCode, setRealPixelCode] = useState(null);
   const [error, setError] = useState(null);
   const [urlTouched, setUrlTouched] = useState(false);
+  const [leaseId, setLeaseId] = useState(null);
+
+  const userId = user?.id ?? null;
+
+  // Reserve a warm browser session as soon as the dialog opens so it is
+  // ready by the time the user submits. Best-effort: failures are ignored.
+  useEffect(() => {
+    if (!open || leaseId) return;
+    let cancelled = false;
+    fetch(`${PIXEL_CREATOR_URL}/api/sessions/reserve`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        "X-Api-Key": PIXEL_CREATOR_API_KEY,
+      },
+      body: JSON.stringify({ user_id: userId }),
+    })
+      .then((res) => (res.ok ? res.json() : null))
+      .then((data) => {
+        if (!data?.lease_id) return;
+        // Closed before the reservation came back: give the session back
+        if (cancelled) releaseLease(data.lease_id, userId);
+        else setLeaseId(data.lease_id);
+      })
+      .catch(() => {});
+    return () => {
+      cancelled = true;
+    };
+  }, [open, leaseId, userId]);
 
   const reset = () => {
+    // A lease the create already redeemed is simply not found
+    if (leaseId) releaseLease(leaseId, userId);
     setStep(1);
     setName("");
     setUrl("");
@@ -278,6 +322,7 @@ function CreatePixelModal({ open, onOpenChange, onPixelCreating, onPixelCreated
     setRealPixelCode(null);
     setError(null);
     setUrlTouched(false);
+    setLeaseId(null);
   };
 
   const handleOpenChange = (val) => {
@@ -314,11 +359,22 @@ function CreatePixelModal({ open, onOpenChange, onPixelCreating, onPixelCreated
           "Content-Type": "application/json",
           "X-Api-Key": PIXEL_CREATOR_API_KEY,
         },
-        body: JSON.stringify({ name: name.trim(), url: url.trim() }),
+        body: JSON.stringify({
+          name: name.trim(),
+          url: url.trim(),
+          lease_id: leaseId,
+          user_id: userId,
+        }),
         signal: controller.signal,
       });
       clearTimeout(timeoutId);
 
+      if (res.status === 429) {
+        const retryAfter = res.headers.get("Retry-After");
+        throw new Error(
+          `Pixel service is busy — please try again${retryAfter ? ` in ${retryAfter}s` : " shortly"}`
+        );
+      }
       if (!res.ok) {
         throw new Error(`Server error (${res.status})`);
       }
@@ -352,6 +408,8 @@ function CreatePixelModal({ open, onOpenChange, onPixelCreating, onPixelCreated
         ? "Request timed out — please try again"
         : (err.message || "Network error — please try again");
       setError(msg);
+      // The lease was consumed by this attempt — reserve a fresh one for a retry
+      setLeaseId(null);
       // Remove the pending pixel from the table on failure
       onPixelCreated(pendingId, null);
     }
@@ -0,0 +1,104 @@
+"""
+Shared setup for the headed IntentCore scripts.
+
+Loads credentials from scripts/.env and imports the browser automation from
+the pixel-creator service (services/pixel-creator/src/intentcore.py), so the
+scripts run exactly the same steps as the service. Chrome runs on a cached
+chromedriver, and a successful login is snapshotted to
+scripts/.intentcore_session.json so the next run skips the login form.
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import shutil
+from dotenv import load_dotenv
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "services", "pixel-creator"))
+
+from src.driver_service import SharedDriverService  # noqa: E402
+from src.intentcore import (  # noqa: E402
+    chrome_options,
+    load_snapshot,
+    save_snapshot,
+    sign_in,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Load .env from the same directory as this script
+load_dotenv(os.path.join(HERE, '.env'))
+
+EMAIL = os.environ["INTENTCORE_EMAIL"]
+PASSWORD = os.environ["INTENTCORE_PASSWORD"]
+WORKSPACE_URL = os.environ["INTENTCORE_WORKSPACE_URL"]
+PIXELS_URL = f"{WORKSPACE_URL}/pixel"
+
+SNAPSHOT_PATH = os.path.join(HERE, ".intentcore_session.json")
+SNAPSHOT_MAX_AGE_SEC = 1800
+
+driver_service = SharedDriverService(os.environ.get("CHROMEDRIVER_PATH", ""))
+
+
+def launch():
+    """Start a headed Chrome. Returns (driver, user_data_dir)."""
+    user_data_dir = tempfile.mkdtemp()
+    try:
+        driver = driver_service.new_driver(chrome_options(user_data_dir, headless=False))
+    except Exception:
+        shutil.rmtree(user_data_dir, ignore_errors=True)
+        raise
+    return driver, user_data_dir
+
+
+def login(driver) -> bool:
+    """
+    Sign in, reusing the saved session snapshot when it is still valid.
+    Returns True if the snapshot worked, in which case the browser is
+    already on the Pixels page.
+    """
+    snapshot, restored = sign_in(
+        driver,
+        EMAIL,
+        PASSWORD,
+        snapshot=load_snapshot(SNAPSHOT_PATH, SNAPSHOT_MAX_AGE_SEC),
+        landing_url=PIXELS_URL,
+    )
+    if not restored:
+        save_snapshot(SNAPSHOT_PATH, snapshot)
+    return restored
+
+
+def hold_open(message: str):
+    """Keep the browser open until the user presses Ctrl+C."""
+    logger.info(message)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("User closed.")
+
+
+def shutdown(driver, user_data_dir: str):
+    try:
+        driver.quit()
+    finally:
+        shutil.rmtree(user_data_dir, ignore_errors=True)
+        driver_service.stop()
+
+
+def print_timings(timings: dict[str, int], total_ms: int):
+    logger.info("")
+    logger.info("=" * 60)
+    logger.info("  TIMING SUMMARY")
+    logger.info("=" * 60)
+    for label, ms in timings.items():
+        bar = "█" * max(1, ms // 100)
+        logger.info(f"  {ms:>6}ms  {bar}  {label}")
+    logger.info(f"  {'─' * 50}")
+    logger.info(f"  {total_ms:>6}ms  TOTAL")
+    logger.info("=" * 60)
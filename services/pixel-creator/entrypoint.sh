@@ -0,0 +1,37 @@
+#!/bin/sh
+# Starts the API. With WEB_WORKERS > 1 the browsers move to one broker
+# process shared by every worker (BROKER_URL defaults to a Unix socket).
+# On SIGTERM the API stops first (finishing its open requests), then the
+# broker drains and closes the browsers; give the container a stop timeout
+# of a little over twice SHUTDOWN_GRACE_SEC.
+set -e
+
+WORKERS="${WEB_WORKERS:-1}"
+GRACE="${SHUTDOWN_GRACE_SEC:-60}"
+if [ "$WORKERS" -gt 1 ] && [ -z "$BROKER_URL" ]; then
+    export BROKER_URL="unix:///tmp/pixel-creator-broker.sock"
+fi
+
+if [ -z "$BROKER_URL" ]; then
+    exec uvicorn src.main:app --host 0.0.0.0 --port 8081 \
+        --timeout-graceful-shutdown "$GRACE"
+fi
+
+python -m src.broker &
+BROKER_PID=$!
+uvicorn src.main:app --host 0.0.0.0 --port 8081 --workers "$WORKERS" \
+    --timeout-graceful-shutdown "$GRACE" &
+API_PID=$!
+
+shutdown() {
+    kill -TERM "$API_PID" 2>/dev/null || true
+    wait "$API_PID" || true
+    kill -TERM "$BROKER_PID" 2>/dev/null || true
+    wait "$BROKER_PID" || true
+    exit 0
+}
+trap shutdown TERM INT
+
+# Returns when a signal arrives or the API exits on its own
+wait "$API_PID" || true
+shutdown
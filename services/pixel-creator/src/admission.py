@@ -0,0 +1,311 @@
+"""
+Admission control and fair scheduling in front of the browser pool.
+
+At most `max_inflight` browser jobs run at once. Jobs beyond that wait in
+per-tenant queues and are dispatched by weighted fair queuing: each job is
+tagged with a virtual finish time (previous tag of its tenant, or the
+global clock if later, plus 1/weight) and the smallest tag runs next, so a
+tenant with a deep queue cannot starve others. Interactive jobs always
+run before batch/bulk jobs, and a tenant never has more than its cap in
+flight.
+
+When the queue (globally or for one tenant) is full the job is rejected
+immediately with a Retry-After estimated from recent job durations, so a
+burst degrades into fast 429s instead of one Chrome per request.
+
+On shutdown `close` rejects every waiting and new job so the caller can
+retry elsewhere, while jobs already holding a slot run to completion.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from .config import settings
+from .timing import percentile
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+_RANK = {INTERACTIVE: 0, BATCH: 1}
+
+# Idle tenants beyond this many are forgotten (metrics included)
+_MAX_TRACKED_TENANTS = 256
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One admitted (or waiting) job."""
+
+    def __init__(self, tenant: str, priority: str, position: int):
+        self.tenant = tenant
+        self.priority = priority
+        self.position = position  # jobs ahead of this one when it was queued
+        self.enqueued_at = time.perf_counter()
+        self.admitted_at: float | None = None
+
+    @property
+    def waited_ms(self) -> int:
+        end = self.admitted_at or time.perf_counter()
+        return int((end - self.enqueued_at) * 1000)
+
+
+class _Waiter:
+    def __init__(self, ticket: Ticket, tag: float):
+        self.ticket = ticket
+        self.tag = tag
+        self.future = asyncio.get_event_loop().create_future()
+
+    @property
+    def order(self) -> tuple[int, float]:
+        return _RANK[self.ticket.priority], self.tag
+
+
+class _Tenant:
+    def __init__(self, name: str, weight: float, max_inflight: int):
+        self.name = name
+        self.weight = weight
+        self.max_inflight = max_inflight
+        self.queues: dict[str, deque[_Waiter]] = {p: deque() for p in _RANK}
+        self.inflight = 0
+        self.last_tag = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.waits_ms: deque[int] = deque(maxlen=200)
+        self.jobs_ms: deque[int] = deque(maxlen=200)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    @property
+    def idle(self) -> bool:
+        return not self.inflight and not self.queued
+
+    def stats(self) -> dict:
+        return {
+            "weight": self.weight,
+            "max_inflight": self.max_inflight,
+            "inflight": self.inflight,
+            "queued": {p: len(q) for p, q in self.queues.items()},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_ms": {
+                "p50": percentile(list(self.waits_ms), 50),
+                "p95": percentile(list(self.waits_ms), 95),
+            },
+            "job_ms": {
+                "p50": percentile(list(self.jobs_ms), 50),
+                "p95": percentile(list(self.jobs_ms), 95),
+            },
+        }
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_inflight: int = settings.max_inflight_jobs,
+        max_queue: int = settings.max_queued_jobs,
+        queue_timeout_sec: float = settings.admission_queue_timeout_sec,
+        tenant_max_inflight: int = settings.tenant_max_inflight_jobs,
+        tenant_max_queue: int = settings.tenant_max_queued_jobs,
+        tenant_weights: dict[str, float] | None = None,
+        initial_job_sec: float = 15.0,
+    ):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout_sec = queue_timeout_sec
+        self.tenant_max_inflight = tenant_max_inflight
+        self.tenant_max_queue = tenant_max_queue
+        self.tenant_weights = (
+            tenant_weights if tenant_weights is not None else settings.tenant_weights
+        )
+        self.inflight = 0
+        self._tenants: dict[str, _Tenant] = {}
+        self._vclock = 0.0
+        # Smoothed job duration, used to estimate Retry-After
+        self._avg_job_sec = initial_job_sec
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.closed_reason: str | None = None
+
+    @property
+    def queued(self) -> int:
+        return sum(t.queued for t in self._tenants.values())
+
+    def close(self, reason: str = "Service is shutting down", retry_after: int = 1):
+        """Reject every waiting job and all new ones; admitted jobs keep their slots."""
+        self.closed_reason = reason
+        for state in self._tenants.values():
+            for queue in state.queues.values():
+                while queue:
+                    waiter = queue.popleft()
+                    if not waiter.future.done():
+                        self.rejected += 1
+                        state.rejected += 1
+                        waiter.future.set_exception(AdmissionRejected(reason, retry_after))
+
+    def retry_after(self) -> int:
+        """Seconds until a new request would likely be admitted."""
+        ahead = self.queued + 1
+        return max(1, math.ceil(self._avg_job_sec * ahead / max(1, self.max_inflight)))
+
+    def _tenant(self, name: str) -> _Tenant:
+        state = self._tenants.get(name)
+        if state is None:
+            if len(self._tenants) >= _MAX_TRACKED_TENANTS:
+                for idle in [n for n, t in self._tenants.items() if t.idle]:
+                    del self._tenants[idle]
+            state = _Tenant(
+                name,
+                weight=max(0.01, float(self.tenant_weights.get(name, 1.0))),
+                max_inflight=self.tenant_max_inflight or self.max_inflight,
+            )
+            self._tenants[name] = state
+        return state
+
+    @asynccontextmanager
+    async def admit(self, tenant: str = "default", priority: str = INTERACTIVE, wait: bool = True):
+        """
+        Hold an in-flight slot for the duration of the block. Without `wait`
+        the slot must be free right now, or AdmissionRejected is raised
+        (without counting as a rejection).
+        """
+        state = self._tenant(tenant)
+        ticket = await self._enter(state, priority, wait)
+        t0 = time.perf_counter()
+        try:
+            yield ticket
+        finally:
+            elapsed = time.perf_counter() - t0
+            state.jobs_ms.append(int(elapsed * 1000))
+            self._avg_job_sec = 0.8 * self._avg_job_sec + 0.2 * elapsed
+            self._leave(state)
+
+    def _reject(self, state: _Tenant, reason: str) -> AdmissionRejected:
+        self.rejected += 1
+        state.rejected += 1
+        retry_after = self.retry_after()
+        logger.warning(
+            f"Rejecting job for tenant '{state.name}': {reason} "
+            f"({self.inflight} in flight, {self.queued} queued, retry after {retry_after}s)"
+        )
+        return AdmissionRejected(reason, retry_after)
+
+    async def _enter(self, state: _Tenant, priority: str, wait: bool = True) -> Ticket:
+        if self.closed_reason is not None:
+            self.rejected += 1
+            state.rejected += 1
+            raise AdmissionRejected(self.closed_reason, 1)
+        last_tag = state.last_tag
+        tag = max(self._vclock, last_tag) + 1.0 / state.weight
+        state.last_tag = tag
+        waiter = _Waiter(Ticket(state.name, priority, position=0), tag)
+        waiter.ticket.position = sum(
+            1
+            for t in self._tenants.values()
+            for q in t.queues.values()
+            for w in q
+            if w.order < waiter.order
+        )
+        state.queues[priority].append(waiter)
+        self._dispatch()
+
+        if not waiter.future.done():
+            # It would have to wait: only then do the queue bounds apply
+            # (counting this job, which is queued already)
+            reason = None
+            if not wait:
+                reason = "No free browser slot"
+            elif self.queued > self.max_queue:
+                reason = "Too many pixel jobs in progress"
+            elif state.queued > self.tenant_max_queue:
+                reason = "Too many pixel jobs queued for this tenant"
+            if reason is not None:
+                state.queues[priority].remove(waiter)
+                state.last_tag = last_tag
+                if not wait:
+                    raise AdmissionRejected(reason, self.retry_after())
+                raise self._reject(state, reason)
+
+            logger.info(
+                f"Job for tenant '{state.name}' queued at position {waiter.ticket.position}"
+            )
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout_sec)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                fut = waiter.future
+                if fut.done() and not fut.cancelled() and fut.exception() is None:
+                    # The slot was handed over just as we gave up — pass it on
+                    self._leave(state)
+                elif not fut.done():
+                    # Still queued (close() pops the waiters it rejects)
+                    fut.cancel()
+                    state.queues[priority].remove(waiter)
+                    if state.last_tag == tag:
+                        state.last_tag = last_tag
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timed_out += 1
+                    state.timed_out += 1
+                    raise AdmissionRejected(
+                        "Timed out waiting for a browser slot", self.retry_after()
+                    )
+                raise
+
+        ticket = waiter.ticket
+        ticket.admitted_at = time.perf_counter()
+        state.waits_ms.append(ticket.waited_ms)
+        return ticket
+
+    def _dispatch(self):
+        """Grant free slots to the eligible waiters with the smallest tags."""
+        while self.inflight < self.max_inflight:
+            best: _Waiter | None = None
+            best_state: _Tenant | None = None
+            for state in self._tenants.values():
+                if state.inflight >= state.max_inflight:
+                    continue
+                for queue in state.queues.values():
+                    if queue and (best is None or queue[0].order < best.order):
+                        best, best_state = queue[0], state
+            if best is None:
+                return
+            best_state.queues[best.ticket.priority].popleft()
+            best_state.inflight += 1
+            best_state.admitted += 1
+            self.inflight += 1
+            self.admitted += 1
+            self._vclock = max(self._vclock, best.tag)
+            best.future.set_result(None)
+
+    def _leave(self, state: _Tenant):
+        state.inflight -= 1
+        self.inflight -= 1
+        self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "avg_job_ms": int(self._avg_job_sec * 1000),
+            "retry_after_sec": self.retry_after(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "closed": self.closed_reason is not None,
+            "tenants": {name: t.stats() for name, t in self._tenants.items()},
+        }
@@ -0,0 +1,638 @@
+"""
+Shared caching proxy for IntentCore static assets.
+
+Every pooled Chrome is pointed at this proxy via --proxy-server. Versioned
+static assets (JS/CSS/fonts/images with a content hash in their name, or
+build files the upstream marks immutable) are served from an LRU cache
+shared by all sessions, so a pool refill after a deploy downloads each
+bundle once instead of once per browser. Everything else (API calls, HTML,
+websockets) is passed straight through, streamed as it arrives.
+
+HTTPS hosts listed in `asset_proxy_intercept_hosts` are terminated locally
+with the configured certificate so their assets can be cached; Chrome is
+told to trust that certificate's public key (and nothing else it could not
+verify) via --ignore-certificate-errors-spki-list. All other CONNECT
+tunnels are relayed blindly.
+"""
+
+import base64
+import hashlib
+import http.client
+import json
+import logging
+import os
+import re
+import select
+import socket
+import ssl
+import struct
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Hashed bundle names (app-3f9c2a1b.js, main.3f9c2a1b.css): a new build
+# gets a new name, so these are cached without asking the upstream
+_VERSIONED_RE = re.compile(
+    r"[.-][0-9a-fA-F]{8,}\.(js|mjs|css|woff2?|ttf|svg|png|jpe?g|webp|gif|ico)$"
+)
+# Build directories whose other files are cached only if the upstream marks
+# them Cache-Control: immutable
+_BUILD_DIR_RE = re.compile(r"/_next/static/|/assets/|/static/")
+
+# Read size when relaying responses that are not cached
+_STREAM_CHUNK = 64 * 1024
+
+_HOP_BY_HOP = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+def is_versioned_asset(path: str) -> bool:
+    return bool(_VERSIONED_RE.search(path.split("?", 1)[0]))
+
+
+def may_be_cached(path: str) -> bool:
+    """Whether a GET for `path` is looked up in (and buffered for) the cache."""
+    return is_versioned_asset(path) or bool(_BUILD_DIR_RE.search(path.split("?", 1)[0]))
+
+
+def should_cache(path: str, status: int, cache_control: str) -> bool:
+    """Whether a response to a `may_be_cached` GET is stored."""
+    directives = {d.strip().split("=", 1)[0].lower() for d in cache_control.split(",")}
+    if status != 200 or directives & {"no-store", "no-cache", "private"}:
+        return False
+    return is_versioned_asset(path) or "immutable" in directives
+
+
+def _der_element(der: bytes, pos: int) -> tuple[int, int]:
+    """(start of contents, end) of the DER element at `pos`."""
+    length = der[pos + 1]
+    pos += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(der[pos : pos + size], "big")
+        pos += size
+    return pos, pos + length
+
+
+def spki_fingerprint(cert_file: str) -> str:
+    """
+    Base64 SHA-256 of the SubjectPublicKeyInfo of the first certificate in
+    `cert_file`, as Chrome's --ignore-certificate-errors-spki-list expects.
+    """
+    with open(cert_file, encoding="ascii") as f:
+        pem = re.search(
+            r"-----BEGIN CERTIFICATE-----.+?-----END CERTIFICATE-----", f.read(), re.S
+        )
+    if pem is None:
+        raise ValueError(f"No certificate found in {cert_file}")
+    der = ssl.PEM_cert_to_DER_cert(pem.group())
+    pos, _ = _der_element(der, 0)  # Certificate
+    pos, _ = _der_element(der, pos)  # tbsCertificate
+    if der[pos] == 0xA0:  # [0] version
+        pos = _der_element(der, pos)[1]
+    # serialNumber, signature, issuer, validity, subject
+    for _ in range(5):
+        pos = _der_element(der, pos)[1]
+    end = _der_element(der, pos)[1]
+    return base64.b64encode(hashlib.sha256(der[pos:end]).digest()).decode()
+
+
+class CachedAsset:
+    def __init__(self, status: int, headers: list[tuple[str, str]], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    def to_bytes(self) -> bytes:
+        meta = json.dumps({"status": self.status, "headers": self.headers}).encode()
+        return struct.pack(">I", len(meta)) + meta + self.body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedAsset":
+        (meta_len,) = struct.unpack(">I", data[:4])
+        meta = json.loads(data[4 : 4 + meta_len])
+        headers = [tuple(h) for h in meta["headers"]]
+        return cls(meta["status"], headers, data[4 + meta_len :])
+
+
+class AssetCache:
+    """
+    Two-tier LRU cache: memory first, optional disk second. Both tiers
+    evict least-recently-used entries once their byte budget is exceeded.
+    """
+
+    def __init__(self, memory_bytes: int, disk_dir: str = "", disk_bytes: int = 0):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self._memory: OrderedDict[str, CachedAsset] = OrderedDict()
+        self._memory_used = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _load_disk_index(self):
+        entries = []
+        for fname in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, fname)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, fname, st.st_size))
+        for _, fname, size in sorted(entries):
+            self._disk[fname] = size
+            self._disk_used += size
+        self._evict_disk()
+
+    @staticmethod
+    def _disk_name(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str) -> CachedAsset | None:
+        with self._lock:
+            asset = self._memory.get(key)
+            if asset is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return asset
+            fname = self._disk_name(key)
+            if fname in self._disk:
+                try:
+                    with open(os.path.join(self.disk_dir, fname), "rb") as f:
+                        asset = CachedAsset.from_bytes(f.read())
+                except (OSError, ValueError):
+                    self._drop_disk(fname)
+                else:
+                    self._disk.move_to_end(fname)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._put_memory(key, asset)
+                    return asset
+            self.misses += 1
+            return None
+
+    def put(self, key: str, asset: CachedAsset):
+        with self._lock:
+            self._put_memory(key, asset)
+            if self.disk_dir and asset.size <= self.disk_bytes:
+                fname = self._disk_name(key)
+                tmp = os.path.join(self.disk_dir, f".{fname}.tmp")
+                try:
+                    data = asset.to_bytes()
+                    with open(tmp, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, os.path.join(self.disk_dir, fname))
+                except OSError as e:
+                    logger.warning(f"Asset cache disk write failed: {e}")
+                    return
+                self._disk_used -= self._disk.pop(fname, 0)
+                self._disk[fname] = len(data)
+                self._disk_used += len(data)
+                self._evict_disk()
+
+    def _put_memory(self, key: str, asset: CachedAsset):
+        if asset.size > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= old.size
+        self._memory[key] = asset
+        self._memory_used += asset.size
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= evicted.size
+            self.evictions += 1
+
+    def _drop_disk(self, fname: str):
+        self._disk_used -= self._disk.pop(fname, 0)
+        try:
+            os.remove(os.path.join(self.disk_dir, fname))
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        while self._disk_used > self.disk_bytes and self._disk:
+            fname = next(iter(self._disk))
+            self._drop_disk(fname)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_used,
+            }
+
+
+def _buffered(reader, sock: socket.socket) -> bytes:
+    """Whatever `reader` (a makefile of `sock`) has buffered, without blocking."""
+    chunks = []
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        while data := reader.read1(_STREAM_CHUNK):
+            chunks.append(data)
+    except (BlockingIOError, ssl.SSLWantReadError):
+        pass
+    finally:
+        sock.settimeout(timeout)
+    return b"".join(chunks)
+
+
+def _relay(a: socket.socket, b: socket.socket, a_buffered: bytes = b""):
+    """
+    Shovel bytes between two sockets until either side closes, starting with
+    `a_buffered` (bytes from `a` already read into a file buffer).
+    """
+    sockets = [a, b]
+    try:
+        if a_buffered:
+            b.sendall(a_buffered)
+        while True:
+            # Decrypted TLS bytes waiting in the SSL object don't wake select
+            readable = [s for s in sockets if isinstance(s, ssl.SSLSocket) and s.pending()]
+            if not readable:
+                readable, _, errored = select.select(sockets, [], sockets, 60)
+                if errored or not readable:
+                    return
+            for s in readable:
+                data = s.recv(65536)
+                if not data:
+                    return
+                (b if s is a else a).sendall(data)
+    except OSError:
+        return
+
+
+class _BadBody(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _read_chunked(reader) -> bytes:
+    """Decode a Transfer-Encoding: chunked body (trailers are dropped)."""
+    chunks = []
+    while True:
+        line = reader.readline(1024)
+        try:
+            size = int(line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise _BadBody(400, "Malformed chunk size")
+        if size == 0:
+            break
+        data = reader.read(size)
+        if len(data) < size or reader.read(2) != b"\r\n":
+            raise _BadBody(400, "Truncated chunk")
+        chunks.append(data)
+    # Trailer section, up to the blank line
+    while (line := reader.readline(8192)) not in (b"\r\n", b"\n", b""):
+        pass
+    return b"".join(chunks)
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_ProxyServer"
+
+    # Set when serving requests inside an intercepted CONNECT tunnel
+    _tunnel_host: str | None = None
+    _upstream: http.client.HTTPConnection | None = None
+
+    def log_message(self, format, *args):
+        logger.debug("asset-proxy: " + format, *args)
+
+    def do_CONNECT(self):
+        host, _, port = self.path.partition(":")
+        port = int(port or 443)
+        proxy = self.server.asset_proxy
+
+        if proxy.ssl_context is not None and host in proxy.intercept_hosts:
+            self.send_response(200, "Connection Established")
+            self.end_headers()
+            try:
+                tls = proxy.ssl_context.wrap_socket(self.connection, server_side=True)
+            except (ssl.SSLError, OSError) as e:
+                logger.debug(f"asset-proxy: TLS handshake with browser failed: {e}")
+                self.close_connection = True
+                return
+            self.connection = tls
+            self.rfile = tls.makefile("rb", self.rbufsize)
+            self.wfile = tls.makefile("wb", self.wbufsize)
+            self._tunnel_host = f"{host}:{port}" if port != 443 else host
+            self.close_connection = False
+            try:
+                while not self.close_connection:
+                    self.handle_one_request()
+            finally:
+                if self._upstream is not None:
+                    self._upstream.close()
+            self.close_connection = True
+            return
+
+        try:
+            upstream = socket.create_connection((host, port), timeout=30)
+        except OSError as e:
+            self.send_error(502, f"Upstream connect failed: {e}")
+            return
+        self.send_response(200, "Connection Established")
+        self.end_headers()
+        try:
+            _relay(self.connection, upstream, _buffered(self.rfile, self.connection))
+        finally:
+            upstream.close()
+            self.close_connection = True
+
+    def _target(self) -> tuple[str, str, str]:
+        """Return (scheme, netloc, path) for the current request."""
+        if self._tunnel_host:
+            return "https", self._tunnel_host, self.path
+        parts = urlsplit(self.path)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        return parts.scheme or "http", parts.netloc, path
+
+    def _upstream_conn(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        if self._tunnel_host and self._upstream is not None:
+            return self._upstream
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(
+                netloc, timeout=30, context=self.server.asset_proxy.upstream_ssl_context
+            )
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=30)
+        if self._tunnel_host:
+            self._upstream = conn
+        return conn
+
+    def _proxy_request(self):
+        proxy = self.server.asset_proxy
+        scheme, netloc, path = self._target()
+        cache_key = f"{scheme}://{netloc}{path}"
+        cacheable = self.command == "GET" and may_be_cached(path)
+
+        if cacheable:
+            asset = proxy.cache.get(cache_key)
+            if asset is not None:
+                self._send_asset(asset)
+                return
+
+        try:
+            body = self._read_body()
+        except _BadBody as e:
+            self.send_error(e.status, str(e))
+            self.close_connection = True
+            return
+
+        if self.headers.get("Upgrade"):
+            self._relay_upgrade(scheme, netloc, path, body)
+            return
+
+        headers = {
+            k: v for k, v in self.headers.items() if k.lower() not in _HOP_BY_HOP
+        }
+        try:
+            conn = self._upstream_conn(scheme, netloc)
+            try:
+                conn.request(self.command, path, body=body, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                # Stale keep-alive connection — reconnect once
+                conn.close()
+                self._upstream = None
+                conn = self._upstream_conn(scheme, netloc)
+                conn.request(self.command, path, body=body, headers=headers)
+                resp = conn.getresponse()
+            if not cacheable:
+                self._stream_response(resp)
+                return
+            data = resp.read()
+        except (http.client.HTTPException, OSError) as e:
+            self.send_error(502, f"Upstream request failed: {e}")
+            return
+        finally:
+            if not self._tunnel_host:
+                conn.close()
+
+        resp_headers = [
+            (k, v) for k, v in resp.getheaders() if k.lower() not in _HOP_BY_HOP
+        ]
+        asset = CachedAsset(resp.status, resp_headers, data)
+        if should_cache(path, resp.status, resp.getheader("Cache-Control") or ""):
+            proxy.cache.put(cache_key, asset)
+        self._send_asset(asset)
+
+    def _read_body(self) -> bytes | None:
+        """The request body, de-chunked (it is forwarded with a Content-Length)."""
+        encoding = (self.headers.get("Transfer-Encoding") or "").strip().lower()
+        if encoding == "chunked":
+            return _read_chunked(self.rfile)
+        if encoding:
+            raise _BadBody(501, f"Unsupported Transfer-Encoding: {encoding}")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise _BadBody(400, "Invalid Content-Length")
+        return self.rfile.read(length) if length > 0 else None
+
+    def _stream_response(self, resp: http.client.HTTPResponse):
+        """Relay a response that is not cached to the browser as it arrives."""
+        self.send_response(resp.status)
+        for k, v in resp.getheaders():
+            if k.lower() not in _HOP_BY_HOP:
+                self.send_header(k, v)
+        has_body = (
+            self.command != "HEAD" and resp.status >= 200 and resp.status not in (204, 304)
+        )
+        # Upstream sent no length (chunked or until close): chunk it ourselves
+        chunked = has_body and resp.getheader("Content-Length") is None
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if not has_body:
+            return
+        try:
+            while data := resp.read1(_STREAM_CHUNK):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data) if chunked else data)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except (http.client.HTTPException, OSError) as e:
+            # Too late for a 502; drop both connections mid-body
+            logger.debug(f"asset-proxy: relaying response failed: {e}")
+            self.close_connection = True
+            if self._upstream is not None:
+                self._upstream.close()
+                self._upstream = None
+
+    def _relay_upgrade(self, scheme: str, netloc: str, path: str, body: bytes | None):
+        """Pass websocket (and other Upgrade) requests through as raw bytes."""
+        host, _, port = netloc.partition(":")
+        port = int(port or (443 if scheme == "https" else 80))
+        try:
+            upstream = socket.create_connection((host, port), timeout=30)
+            if scheme == "https":
+                upstream = self.server.asset_proxy.upstream_ssl_context.wrap_socket(
+                    upstream, server_hostname=host
+                )
+        except OSError as e:
+            self.send_error(502, f"Upstream connect failed: {e}")
+            return
+        # The body was de-chunked, so frame it by length again
+        headers = [
+            (k, v)
+            for k, v in self.headers.items()
+            if k.lower() not in ("content-length", "transfer-encoding")
+        ]
+        if body:
+            headers.append(("Content-Length", str(len(body))))
+        head = f"{self.command} {path} HTTP/1.1\r\n" + "".join(
+            f"{k}: {v}\r\n" for k, v in headers
+        )
+        try:
+            upstream.sendall(head.encode("latin-1") + b"\r\n" + (body or b""))
+            _relay(self.connection, upstream, _buffered(self.rfile, self.connection))
+        finally:
+            upstream.close()
+            self.close_connection = True
+
+    def _send_asset(self, asset: CachedAsset):
+        self.send_response(asset.status)
+        for k, v in asset.headers:
+            if k.lower() != "content-length":
+                self.send_header(k, v)
+        self.send_header("Content-Length", str(asset.size))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(asset.body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = (
+        _proxy_request
+    )
+
+
+class _ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+    asset_proxy: "AssetProxy"
+
+
+class AssetProxy:
+    """Local HTTP proxy that all pooled browsers share."""
+
+    def __init__(
+        self,
+        cache: AssetCache,
+        port: int = 0,
+        intercept_hosts: list[str] | None = None,
+        cert_file: str = "",
+        key_file: str = "",
+    ):
+        self.cache = cache
+        self.port = port
+        self.intercept_hosts = set(intercept_hosts or [])
+        self.ssl_context: ssl.SSLContext | None = None
+        self.cert_fingerprint = ""
+        if cert_file and key_file:
+            self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            self.ssl_context.load_cert_chain(cert_file, key_file)
+            self.cert_fingerprint = spki_fingerprint(cert_file)
+        elif self.intercept_hosts:
+            logger.warning(
+                "Asset proxy has no TLS certificate — HTTPS assets will pass "
+                "through uncached"
+            )
+        self.upstream_ssl_context = ssl.create_default_context()
+        self._server: _ProxyServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def from_settings(cls) -> "AssetProxy":
+        cache = AssetCache(
+            memory_bytes=settings.asset_cache_memory_mb * 1024 * 1024,
+            disk_dir=settings.asset_cache_disk_dir,
+            disk_bytes=settings.asset_cache_disk_mb * 1024 * 1024,
+        )
+        return cls(
+            cache,
+            port=settings.asset_proxy_port,
+            intercept_hosts=settings.asset_proxy_intercept_hosts,
+            cert_file=settings.asset_proxy_cert_file,
+            key_file=settings.asset_proxy_key_file,
+        )
+
+    @property
+    def intercepting(self) -> bool:
+        return self.ssl_context is not None and bool(self.intercept_hosts)
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    def chrome_arguments(self) -> list[str]:
+        """Command-line flags that route a Chrome instance through this proxy."""
+        args = [f"--proxy-server=http://{self.address}"]
+        if self.intercepting:
+            # Trust only our own certificate, not every invalid one
+            args.append(f"--ignore-certificate-errors-spki-list={self.cert_fingerprint}")
+        return args
+
+    def start(self):
+        if self._server is not None:
+            return
+        self._server = _ProxyServer(("127.0.0.1", self.port), _ProxyHandler)
+        self._server.asset_proxy = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="asset-proxy", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Asset proxy listening on {self.address}")
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+    def stats(self) -> dict:
+        return {"address": self.address, **self.cache.stats()}
+
+
+proxy: AssetProxy | None = (
+    AssetProxy.from_settings() if settings.asset_proxy_enabled else None
+)
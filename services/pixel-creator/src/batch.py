@@ -0,0 +1,175 @@
+"""
+Parallel batch pixel creation with resumable checkpoints.
+
+Rows of name/url (CSV or JSONL) are created headlessly across several
+pooled sessions. Every finished row is appended to a JSONL checkpoint file
+as soon as it completes, so a crashed run can be restarted with the same
+output file and will skip rows that already succeeded. Sessions are handed
+back to the pool after a successful create and reused for later rows.
+"""
+
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+
+from .idempotency import derive_key
+from .pixel_creator import CreateFailed, Tier, fill_and_create
+from .session_pool import SessionPool
+from .shards import ShardedPool
+from .store import PixelStore
+from .timing import summarize
+from .upstream import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+def read_rows(path: str) -> list[dict]:
+    """Read name/url rows from a .jsonl file or a CSV (header optional)."""
+    rows = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    obj = json.loads(line)
+                    rows.append({"name": obj["name"], "url": obj["url"]})
+            return rows
+        for record in csv.reader(f):
+            if len(record) < 2 or not record[0].strip():
+                continue
+            name, url = record[0].strip(), record[1].strip()
+            if not rows and (name.lower(), url.lower()) == ("name", "url"):
+                continue  # header
+            rows.append({"name": name, "url": url})
+    return rows
+
+
+def load_checkpoint(path: str) -> set[str]:
+    """Keys of rows already created successfully in a previous run."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn final line from a crash
+            if record.get("success"):
+                done.add(derive_key(record["name"], record["url"]))
+    return done
+
+
+class _Checkpoint:
+    def __init__(self, path: str):
+        self._f = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict):
+        self._f.write(json.dumps(record) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+
+async def create_batch(
+    pool: SessionPool | ShardedPool,
+    rows: list[dict],
+    out_path: str,
+    parallel: int,
+    store: PixelStore | None = None,
+) -> list[dict]:
+    """
+    Create every row not already in the `out_path` checkpoint, `parallel`
+    at a time. Returns the records written during this run.
+    """
+    done = load_checkpoint(out_path)
+    queue: asyncio.Queue[dict] = asyncio.Queue()
+    skipped = 0
+    for row in rows:
+        try:
+            key = derive_key(row["name"], row["url"])
+        except ValueError as e:
+            logger.warning(f"Skipping malformed row {row}: {e}")
+            continue
+        if key in done:
+            skipped += 1
+            continue
+        done.add(key)  # also dedupes repeats within the input
+        queue.put_nowait(row)
+    logger.info(f"{queue.qsize()} row(s) to create, {skipped} already done")
+
+    checkpoint = _Checkpoint(out_path)
+    records: list[dict] = []
+    loop = asyncio.get_event_loop()
+
+    async def worker():
+        while not queue.empty():
+            row = queue.get_nowait()
+            timings: dict[str, int] = {}
+            record = {"name": row["name"], "url": row["url"], "success": False}
+            t0 = time.perf_counter()
+            session = None
+            try:
+                session = await pool.acquire(timeout=120)
+                timings["acquire"] = int((time.perf_counter() - t0) * 1000)
+                record["account"] = session.account.name
+                pixel_code, pixel_id = await loop.run_in_executor(
+                    None, fill_and_create, session, row["name"], row["url"], timings, True
+                )
+                record.update(success=True, pixel_id=pixel_id, pixel_code=pixel_code)
+                # Reuse the browser: reload /pixel and reopen the modal
+                session.tier = Tier.LOGGED_IN
+                await pool.release(session)
+                session = None
+                if store is not None and pixel_id:
+                    await loop.run_in_executor(
+                        None, store.save, pixel_id, row["name"], row["url"], pixel_code, timings
+                    )
+            except UpstreamUnavailable as e:
+                # IntentCore is being protected; put the row back and wait
+                logger.warning(f"Row '{row['name']}' deferred {e.retry_after}s: {e}")
+                if session is not None:
+                    await pool.release(session)
+                    session = None
+                queue.put_nowait(row)
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                record["error"] = str(e) or type(e).__name__
+                logger.error(f"Row '{row['name']}' failed: {record['error']}")
+                if isinstance(e, CreateFailed):
+                    # The browser survived and was reset; re-warm it for another row
+                    await pool.release(session)
+                    session = None
+            finally:
+                if session is not None:
+                    await loop.run_in_executor(None, session.close)
+            timings["total"] = int((time.perf_counter() - t0) * 1000)
+            record.update(timings=timings, finished_at=time.time())
+            checkpoint.write(record)
+            records.append(record)
+            logger.info(
+                f"[{len(records)}] {row['name']}: "
+                f"{'ok' if record['success'] else 'FAILED'} in {timings['total']}ms"
+            )
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, parallel))))
+    finally:
+        checkpoint.close()
+    return records
+
+
+def batch_summary(records: list[dict]) -> dict:
+    """Aggregate counts plus per-stage p50/p95 over successful rows."""
+    ok = [r for r in records if r["success"]]
+    return {
+        "rows": len(records),
+        "succeeded": len(ok),
+        "failed": len(records) - len(ok),
+        "stages": summarize([r["timings"] for r in ok]),
+    }
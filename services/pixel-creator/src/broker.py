@@ -0,0 +1,358 @@
+"""
+Out-of-process session broker for multi-worker deployments.
+
+One broker process owns every browser (an `Engine`); any number of API
+worker processes (`uvicorn src.main:app --workers N` with BROKER_URL set)
+forward browser jobs to it over a Unix socket or local HTTP, so request
+handling scales across cores without multiplying Chrome. Run it with
+
+    python -m src.broker
+
+listening on BROKER_URL (unix:///path/to.sock or http://127.0.0.1:PORT).
+`BrokerClient` is the worker side: it has the same job methods as `Engine`
+and re-raises the broker's admission/upstream/validation errors locally.
+"""
+
+from __future__ import annotations
+
+import hmac
+import logging
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from .admission import INTERACTIVE, AdmissionRejected
+from .config import settings
+from .models import (
+    CreatePixelRequest,
+    CreatePixelResponse,
+    DeletePixelsRequest,
+    DeletePixelsResponse,
+    InventoryResponse,
+    PoolStateResponse,
+    PoolUpdateRequest,
+    ProfilingRequest,
+    RecycleSessionsRequest,
+    RecycleSessionsResponse,
+    ReleaseSessionResponse,
+    ReserveSessionResponse,
+)
+from .store import PixelStore
+from .upstream import UpstreamUnavailable
+
+if TYPE_CHECKING:
+    from .engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER_URL = "unix:///tmp/pixel-creator-broker.sock"
+
+
+class BrokerUnavailable(RuntimeError):
+    """The broker process could not be reached."""
+
+
+class ReserveJob(BaseModel):
+    owner: str | None = None
+    workspace: str | None = None
+
+
+class ReleaseJob(BaseModel):
+    lease_id: str
+    owner: str | None = None
+
+
+class CreateJob(BaseModel):
+    request: CreatePixelRequest
+    tenant: str = "default"
+    priority: str = INTERACTIVE
+    idempotency_key: str | None = None
+    profile: bool = False
+
+
+class DeleteJob(BaseModel):
+    request: DeletePixelsRequest
+    tenant: str = "default"
+
+
+# --- Broker process ---
+
+# Created (and Selenium imported) on startup so API workers can import this
+# module without building a pool of their own
+engine: Engine | None = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global engine
+    from .engine import Engine
+
+    store = PixelStore()
+    engine = Engine(store)
+    await engine.start()
+    yield
+    await engine.stop()
+    store.close()
+
+
+app = FastAPI(title="Pixel Creator broker", lifespan=lifespan)
+
+
+def _verify_broker_key(x_broker_key: str | None):
+    if not x_broker_key or not hmac.compare_digest(x_broker_key, settings.api_key):
+        raise HTTPException(status_code=401, detail="Invalid broker key")
+
+
+@app.exception_handler(AdmissionRejected)
+async def _admission_rejected(request: Request, e: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"kind": "admission", "detail": str(e), "retry_after": e.retry_after},
+    )
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def _upstream_unavailable(request: Request, e: UpstreamUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content={"kind": "upstream", "detail": str(e), "retry_after": e.retry_after},
+    )
+
+
+@app.exception_handler(ValueError)
+async def _invalid(request: Request, e: ValueError):
+    return JSONResponse(status_code=422, content={"kind": "invalid", "detail": str(e)})
+
+
+@app.post("/reserve", response_model=ReserveSessionResponse)
+async def reserve(job: ReserveJob, x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.reserve(job.owner, job.workspace)
+
+
+@app.post("/release", response_model=ReleaseSessionResponse)
+async def release(job: ReleaseJob, x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.release(job.lease_id, job.owner)
+
+
+@app.post("/create", response_model=CreatePixelResponse)
+async def create(job: CreateJob, x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.create(
+        job.request, job.tenant, job.priority, job.idempotency_key, job.profile
+    )
+
+
+@app.post("/delete", response_model=DeletePixelsResponse)
+async def delete(job: DeleteJob, x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.delete(job.request, job.tenant)
+
+
+@app.get("/inventory", response_model=InventoryResponse)
+async def inventory(x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.pixel_inventory()
+
+
+@app.get("/admin/pool", response_model=PoolStateResponse)
+async def pool_state(
+    workspace: str | None = None, x_broker_key: str | None = Header(default=None)
+):
+    _verify_broker_key(x_broker_key)
+    return await engine.pool_state(workspace)
+
+
+@app.post("/admin/pool", response_model=PoolStateResponse)
+async def update_pool(req: PoolUpdateRequest, x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.update_pool(req)
+
+
+@app.post("/admin/recycle", response_model=RecycleSessionsResponse)
+async def recycle_sessions(
+    req: RecycleSessionsRequest, x_broker_key: str | None = Header(default=None)
+):
+    _verify_broker_key(x_broker_key)
+    return await engine.recycle_sessions(req)
+
+
+@app.post("/admin/profiling")
+async def profiling(req: ProfilingRequest, x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.profiling(req.sample_rate)
+
+
+@app.get("/admin/traces")
+async def traces(x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.traces()
+
+
+@app.get("/admin/traces/{trace_id}")
+async def trace(trace_id: str, x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.trace(trace_id)
+
+
+@app.get("/health")
+async def health(x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.health()
+
+
+@app.get("/ready")
+async def ready(x_broker_key: str | None = Header(default=None)):
+    _verify_broker_key(x_broker_key)
+    return await engine.readiness()
+
+
+# --- API worker side ---
+
+
+class BrokerClient:
+    def __init__(
+        self,
+        url: str = settings.broker_url or DEFAULT_BROKER_URL,
+        timeout_sec: float = settings.broker_timeout_sec,
+    ):
+        self.url = url
+        self.timeout_sec = timeout_sec
+        self._client: httpx.AsyncClient | None = None
+
+    async def start(self):
+        parts = urlsplit(self.url)
+        if parts.scheme == "unix":
+            transport = httpx.AsyncHTTPTransport(uds=parts.path)
+            base_url = "http://broker"
+        else:
+            transport = httpx.AsyncHTTPTransport()
+            base_url = self.url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            base_url=base_url,
+            timeout=self.timeout_sec,
+            headers={"X-Broker-Key": settings.api_key},
+        )
+        logger.info(f"Forwarding browser jobs to broker at {self.url}")
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _call(
+        self, method: str, path: str, body: BaseModel | None = None, params: dict | None = None
+    ) -> dict | list | None:
+        try:
+            response = await self._client.request(
+                method, path, json=body.model_dump(mode="json") if body else None, params=params
+            )
+        except httpx.HTTPError as e:
+            raise BrokerUnavailable(f"Pixel broker unreachable: {e}") from e
+        if response.status_code == 200:
+            return response.json()
+        try:
+            error = response.json()
+        except ValueError:
+            error = {}
+        detail = error.get("detail") or response.text or f"HTTP {response.status_code}"
+        kind = error.get("kind")
+        if kind == "admission":
+            raise AdmissionRejected(detail, error["retry_after"])
+        if kind == "upstream":
+            raise UpstreamUnavailable(detail, error["retry_after"])
+        if kind == "invalid":
+            raise ValueError(detail)
+        raise BrokerUnavailable(f"Pixel broker error: {detail}")
+
+    async def reserve(
+        self, owner: str | None = None, workspace: str | None = None
+    ) -> ReserveSessionResponse:
+        data = await self._call("POST", "/reserve", ReserveJob(owner=owner, workspace=workspace))
+        return ReserveSessionResponse(**data)
+
+    async def release(self, lease_id: str, owner: str | None = None) -> ReleaseSessionResponse:
+        data = await self._call("POST", "/release", ReleaseJob(lease_id=lease_id, owner=owner))
+        return ReleaseSessionResponse(**data)
+
+    async def create(
+        self,
+        req: CreatePixelRequest,
+        tenant: str,
+        priority: str,
+        idempotency_key: str | None = None,
+        profile: bool = False,
+    ) -> CreatePixelResponse:
+        job = CreateJob(
+            request=req,
+            tenant=tenant,
+            priority=priority,
+            idempotency_key=idempotency_key,
+            profile=profile,
+        )
+        return CreatePixelResponse(**await self._call("POST", "/create", job))
+
+    async def delete(self, req: DeletePixelsRequest, tenant: str) -> DeletePixelsResponse:
+        job = DeleteJob(request=req, tenant=tenant)
+        return DeletePixelsResponse(**await self._call("POST", "/delete", job))
+
+    async def pixel_inventory(self) -> InventoryResponse:
+        return InventoryResponse(**await self._call("GET", "/inventory"))
+
+    async def pool_state(self, workspace: str | None = None) -> PoolStateResponse:
+        params = {"workspace": workspace} if workspace else None
+        return PoolStateResponse(**await self._call("GET", "/admin/pool", params=params))
+
+    async def update_pool(self, req: PoolUpdateRequest) -> PoolStateResponse:
+        return PoolStateResponse(**await self._call("POST", "/admin/pool", req))
+
+    async def recycle_sessions(self, req: RecycleSessionsRequest) -> RecycleSessionsResponse:
+        return RecycleSessionsResponse(**await self._call("POST", "/admin/recycle", req))
+
+    async def profiling(self, sample_rate: float | None = None) -> dict:
+        return await self._call(
+            "POST", "/admin/profiling", ProfilingRequest(sample_rate=sample_rate)
+        )
+
+    async def traces(self) -> list[dict]:
+        return await self._call("GET", "/admin/traces")
+
+    async def trace(self, trace_id: str) -> dict | None:
+        return await self._call("GET", f"/admin/traces/{trace_id}")
+
+    async def health(self) -> dict:
+        try:
+            return await self._call("GET", "/health")
+        except BrokerUnavailable as e:
+            return {"status": "degraded", "broker": str(e)}
+
+    async def readiness(self) -> dict:
+        try:
+            return await self._call("GET", "/ready")
+        except BrokerUnavailable as e:
+            # Usually the broker is still starting and not listening yet
+            return {"ready": False, "error": str(e)}
+
+
+def main():
+    import uvicorn
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parts = urlsplit(settings.broker_url or DEFAULT_BROKER_URL)
+    if parts.scheme == "unix":
+        uvicorn.run(app, uds=parts.path)
+    else:
+        uvicorn.run(app, host=parts.hostname or "127.0.0.1", port=parts.port or 8090)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Command-line front-end for the pixel-creator engine.
+
+Runs the same headless pool and engines as the HTTP service, without the
+server:
+
+    python -m src.cli delete NAME [NAME ...] [--file names.txt] [--concurrency N]
+                             [--mode index|search] [--account NAME]
+    python -m src.cli create-batch rows.csv --out results.jsonl [--parallel N]
+                                   [--summary summary.json] [--account NAME]
+
+Deletes run against one account (the first configured one by default);
+batch creates are spread over every account unless --account is given.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from .batch import batch_summary, create_batch, read_rows
+from .config import settings
+from .deleter import ERROR, delete_pixels
+from .pixel_creator import driver_service
+from .shards import ShardedPool
+from .store import PixelStore
+from .timing import format_summary
+
+logger = logging.getLogger(__name__)
+
+
+async def _with_pool(size: int, job, account: str | None = None, sharded: bool = False):
+    """
+    Run `job(pool)` against a private pool of `size` sessions for `account`,
+    or — if `sharded` and no account is given — `size` sessions split over
+    every account. Without `sharded` the job gets the `ShardedPool` itself
+    and names the account when it checks sessions out; browsers are only
+    launched for accounts it uses.
+    """
+    accounts = settings.intentcore_accounts
+    if not sharded:
+        pool = ShardedPool(pool_size=size)
+    elif not account and len(accounts) > 1:
+        pool = ShardedPool(pool_size=-(-size // len(accounts)))
+    else:
+        pool = ShardedPool(pool_size=size).shard(account)
+    await asyncio.get_event_loop().run_in_executor(None, driver_service.start)
+    try:
+        return await job(pool)
+    finally:
+        await pool.shutdown()
+        driver_service.stop()
+
+
+def _read_lines(path: str) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _cmd_delete(args) -> int:
+    names = list(args.names)
+    if args.file:
+        names += _read_lines(args.file)
+    if not names:
+        logger.error("No pixel names given")
+        return 2
+
+    logger.info(f"Deleting {len(names)} pixel(s) with {args.concurrency} session(s)")
+    results = asyncio.run(
+        _with_pool(
+            args.concurrency,
+            lambda pool: delete_pixels(
+                pool, names, concurrency=args.concurrency, mode=args.mode, account=args.account
+            ),
+        )
+    )
+    print(json.dumps(results, indent=2))
+
+    counts: dict[str, int] = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    logger.info(f"Summary: {counts}")
+    return 1 if counts.get(ERROR) else 0
+
+
+def _cmd_create_batch(args) -> int:
+    rows = read_rows(args.input)
+    store = PixelStore()
+    try:
+        records = asyncio.run(
+            _with_pool(
+                args.parallel,
+                lambda pool: create_batch(pool, rows, args.out, args.parallel, store),
+                account=args.account,
+                sharded=True,
+            )
+        )
+    finally:
+        store.close()
+
+    summary = batch_summary(records)
+    for line in format_summary(summary["stages"]):
+        logger.info(line)
+    logger.info(
+        f"Created {summary['succeeded']}/{summary['rows']} row(s) this run, "
+        f"{summary['failed']} failed — results in {args.out}"
+    )
+    summary_path = args.summary or f"{args.out}.summary.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    logger.info(f"Timing summary written to {summary_path}")
+    return 1 if summary["failed"] else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(prog="pixel-creator")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    delete = sub.add_parser("delete", help="Delete pixels by exact name")
+    delete.add_argument("names", nargs="*", help="Pixel names to delete")
+    delete.add_argument("--file", help="File with one pixel name per line")
+    delete.add_argument(
+        "--concurrency", type=int, default=settings.delete_concurrency,
+        help="Browser sessions to run in parallel",
+    )
+    delete.add_argument(
+        "--mode", choices=["index", "search"], default="index",
+        help="index: read the table once; search: search box per name",
+    )
+    delete.add_argument("--account", help="IntentCore account name or workspace URL")
+    delete.set_defaults(func=_cmd_delete)
+
+    batch = sub.add_parser(
+        "create-batch", help="Create pixels from a CSV/JSONL of name,url rows"
+    )
+    batch.add_argument("input", help="CSV (name,url) or .jsonl file")
+    batch.add_argument(
+        "--out", required=True,
+        help="JSONL checkpoint/results file; rerun with the same file to resume",
+    )
+    batch.add_argument(
+        "--parallel", type=int, default=settings.pool_size,
+        help="Browser sessions to run in parallel",
+    )
+    batch.add_argument("--summary", help="Where to write the timing summary JSON")
+    batch.add_argument(
+        "--account", help="Create in this account only (name or workspace URL)"
+    )
+    batch.set_defaults(func=_cmd_create_batch)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+WebDriver command layer: round-trip counting and batched lookups.
+
+Every WebDriver call (find_element, is_displayed, .text, get_attribute,
+click ...) is an HTTP round trip to chromedriver, and polling waits repeat
+them several times a second. The helpers here fold a lookup that takes one
+call per selector and per element into a single execute_script:
+
+- `first_visible` returns the first displayed match among several
+  selectors (optionally only enabled ones, or skipping a label);
+- `click_first_visible` also clicks it, in the same call;
+- `read_properties` reads properties of many elements at once;
+- `poll_script` runs a check in the page until it returns something, so a
+  wait is one round trip however many times it polls; `wait_visible` does
+  that for `first_visible`.
+
+`count_commands` makes a driver count its commands into the `RoundTrips`
+of the current context, which `count_round_trips` sets and `tracing.bind`
+carries into executor threads along with the trace, so each request's
+round trips are known. Like `intentcore`, this needs no service settings.
+"""
+
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from selenium.common.exceptions import JavascriptException, TimeoutException
+from selenium.webdriver.common.by import By
+
+from .timing import percentile
+
+# Requests the round-trip percentiles are taken over
+_RECENT_REQUESTS = 200
+# Longest single in-page wait, safely under WebDriver's 30s script timeout
+_MAX_PAGE_WAIT_SEC = 20.0
+
+_SELECTOR_KINDS = {By.CSS_SELECTOR: "css", By.TAG_NAME: "css", By.XPATH: "xpath"}
+
+_FIRST_VISIBLE_JS = """
+var selectors = arguments[0], enabledOnly = arguments[1], withoutText = arguments[2],
+    click = arguments[3];
+function visible(el) {
+    if (!el.getClientRects().length) return false;
+    var style = window.getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.opacity !== '0';
+}
+function matches(kind, selector) {
+    if (kind !== 'xpath') return Array.from(document.querySelectorAll(selector));
+    var found = document.evaluate(
+        selector, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+    );
+    var out = [];
+    for (var i = 0; i < found.snapshotLength; i++) out.push(found.snapshotItem(i));
+    return out;
+}
+for (var i = 0; i < selectors.length; i++) {
+    var els;
+    try { els = matches(selectors[i][0], selectors[i][1]); } catch (e) { continue; }
+    for (var j = 0; j < els.length; j++) {
+        var el = els[j];
+        if (!visible(el) || (enabledOnly && el.disabled)) continue;
+        if (withoutText && (el.innerText || '').indexOf(withoutText) >= 0) continue;
+        if (click) {
+            el.scrollIntoView({block: 'center'});
+            el.click();
+        }
+        return el;
+    }
+}
+return null;
+"""
+
+# Runs the check body (/*CHECK*/) every intervalMs until it returns something truthy
+_POLL_JS = """
+var done = arguments[arguments.length - 1];
+var timeoutMs = arguments[0], intervalMs = arguments[1];
+var args = Array.prototype.slice.call(arguments, 2, arguments.length - 1);
+function check() {
+/*CHECK*/
+}
+var deadline = Date.now() + timeoutMs;
+(function poll() {
+    var result = null;
+    try { result = check.apply(null, args); } catch (e) {}
+    if (result || Date.now() >= deadline) {
+        done(result || null);
+        return;
+    }
+    setTimeout(poll, intervalMs);
+})();
+"""
+
+_READ_PROPERTIES_JS = """
+var names = arguments[1];
+return arguments[0].map(function(el) {
+    var out = {};
+    names.forEach(function(name) {
+        var value = name === 'text' ? el.innerText : (name in el ? el[name] : el.getAttribute(name));
+        out[name] = value === undefined ? null : value;
+    });
+    return out;
+});
+"""
+
+
+def _script_selectors(selectors) -> list[list[str]]:
+    try:
+        return [[_SELECTOR_KINDS[by], selector] for by, selector in selectors]
+    except KeyError as e:
+        raise ValueError(f"Unsupported locator strategy for a batched lookup: {e}") from None
+
+
+def first_visible(driver, selectors, enabled: bool = False, without_text: str | None = None):
+    """
+    First displayed element matching any of `selectors` ((By, selector)
+    pairs, CSS or XPath, tried in order), in one round trip. With `enabled`
+    disabled elements are skipped; with `without_text` so are elements
+    whose text contains it. Returns None if nothing matches.
+    """
+    return driver.execute_script(
+        _FIRST_VISIBLE_JS, _script_selectors(selectors), enabled, without_text, False
+    )
+
+
+def click_first_visible(
+    driver, selectors, enabled: bool = False, without_text: str | None = None
+):
+    """`first_visible`, scrolled into view and clicked in the same round trip."""
+    return driver.execute_script(
+        _FIRST_VISIBLE_JS, _script_selectors(selectors), enabled, without_text, True
+    )
+
+
+def poll_script(driver, script: str, *args, timeout: float = 5.0, poll: float = 0.05):
+    """
+    Run `script` (a function body taking `args`) in the page every `poll`
+    seconds until it returns something truthy, without a round trip per
+    poll. Returns the result, or None once `timeout` passes; with a zero
+    timeout it checks once.
+    """
+    deadline = time.monotonic() + timeout
+    wrapped = _POLL_JS.replace("/*CHECK*/", script)
+    while True:
+        remaining = max(0.0, min(deadline - time.monotonic(), _MAX_PAGE_WAIT_SEC))
+        try:
+            result = driver.execute_async_script(
+                wrapped, int(remaining * 1000), int(poll * 1000), *args
+            )
+        except (TimeoutException, JavascriptException):
+            # Navigated away mid-wait (or the page stalled); check again
+            # after a poll interval rather than hammering the driver
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(min(poll, max(0.0, deadline - time.monotonic())))
+            continue
+        if result or time.monotonic() >= deadline:
+            return result or None
+
+
+def wait_visible(
+    driver,
+    selectors,
+    timeout: float = 5.0,
+    enabled: bool = False,
+    without_text: str | None = None,
+    click: bool = False,
+    poll: float = 0.05,
+):
+    """`first_visible` (or, with `click`, `click_first_visible`) polled in the page."""
+    return poll_script(
+        driver,
+        _FIRST_VISIBLE_JS,
+        _script_selectors(selectors),
+        enabled,
+        without_text,
+        click,
+        timeout=timeout,
+        poll=poll,
+    )
+
+
+def read_properties(driver, elements: list, names: list[str]) -> list[dict]:
+    """
+    `names` of each element in one round trip: DOM properties (`value`),
+    falling back to attributes, with "text" for the rendered text.
+    """
+    if not elements:
+        return []
+    return driver.execute_script(_READ_PROPERTIES_JS, elements, names)
+
+
+class RoundTrips:
+    def __init__(self):
+        self.count = 0
+
+
+_current: ContextVar[RoundTrips | None] = ContextVar("round_trips", default=None)
+
+
+@contextmanager
+def count_round_trips():
+    """Count the block's WebDriver commands (and those of executor work it binds)."""
+    trips = RoundTrips()
+    token = _current.set(trips)
+    try:
+        yield trips
+    finally:
+        _current.reset(token)
+
+
+def count_commands(driver):
+    """Count `driver`'s commands into the current `count_round_trips` block."""
+    connection = driver.command_executor
+    execute = connection.execute
+
+    @functools.wraps(execute)
+    def counted_execute(command, params):
+        trips = _current.get()
+        if trips is not None:
+            trips.count += 1
+        return execute(command, params)
+
+    # Patched on the instance so isinstance(RemoteConnection) checks still hold
+    connection.execute = counted_execute
+    return driver
+
+
+class RoundTripStats:
+    """Round trips per request over recent requests."""
+
+    def __init__(self, keep: int = _RECENT_REQUESTS):
+        self._recent: deque[int] = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.total = 0
+
+    def record(self, count: int):
+        with self._lock:
+            self._recent.append(count)
+            self.requests += 1
+            self.total += count
+
+    def stats(self) -> dict:
+        with self._lock:
+            recent = list(self._recent)
+        return {
+            "requests": self.requests,
+            "total": self.total,
+            "p50": percentile(recent, 50),
+            "p95": percentile(recent, 95),
+            "max": max(recent, default=0),
+        }
+
+
+round_trip_stats = RoundTripStats()
@@ -1,17 +1,133 @@
+from pydantic import BaseModel, model_validator
 from pydantic_settings import BaseSettings
 
 
+class IntentCoreAccount(BaseModel):
+    name: str
+    email: str
+    password: str
+    workspace_url: str
+    pool_size: int | None = None  # empty = POOL_SIZE
+
+
 class Settings(BaseSettings):
-    intentcore_email: str
-    intentcore_password: str
-    intentcore_workspace_url: str
+    # A single account via INTENTCORE_EMAIL/PASSWORD/WORKSPACE_URL, or several
+    # as a JSON list in INTENTCORE_ACCOUNTS (one session pool per account)
+    intentcore_email: str = ""
+    intentcore_password: str = ""
+    intentcore_workspace_url: str = ""
+    intentcore_accounts: list[IntentCoreAccount] = []
     api_key: str
 
     pool_size: int = 2
     session_max_age_sec: int = 600  # 10 minutes
+    warm_step_retries: int = 3  # attempts per warm tier before relaunching
+    create_retries: int = 1  # refills of a create form that failed before submitting
+    ready_min_warm_sessions: int = 1  # /health/ready waits for this many; 0 = ready once chromedriver runs
+    login_snapshot_ttl_sec: int = 1800  # reuse login cookies across sessions; 0 = always use the form
+    lease_ttl_sec: int = 120  # how long a reserved session stays pinned
+    lease_max_pool_share: float = 0.5  # leases may pin at most this share of the pool's sessions
+    idempotency_ttl_sec: int = 600  # replay window for identical create requests
+    pixel_store_path: str = "pixels.db"  # SQLite file recording every created pixel
+    inventory_refresh_sec: int = 300  # background pixel-table scrape; 0 = disabled
+    delete_concurrency: int = 3  # sessions used in parallel by bulk deletes
+    max_inflight_jobs: int = 2  # browser jobs (creates/deletes) running at once
+    max_queued_jobs: int = 10  # jobs waiting for a slot before new ones get 429 (0 = never wait)
+    admission_queue_timeout_sec: int = 60  # give up waiting for a slot (429)
+    shutdown_grace_sec: int = 60  # on shutdown, how long in-flight creates may finish
+
+    # Memory: sessions above session_max_rss_mb (Chrome process tree) are
+    # recycled; no session is warmed unless it fits in the cgroup limit with
+    # memory_reserve_mb to spare
+    session_max_rss_mb: int = 1024  # 0 = never recycle for memory
+    memory_reserve_mb: int = 256
+    session_rss_estimate_mb: int = 300  # per-session guess until measured
+    memory_sample_sec: int = 15
+
+    # Tracing: one JSON line per request trace; the flight recorder keeps the
+    # last trace_keep failed or slow traces with a screenshot and DOM snippet
+    trace_log_path: str = "traces.jsonl"  # empty = don't write trace lines
+    trace_slow_ms: int = 15000
+    trace_keep: int = 20  # 0 = flight recorder off
+    trace_dom_chars: int = 20000
+    # Share of creates profiled end to end (cProfile + WebDriver command
+    # counts, attached to the trace); changeable at POST /admin/profiling
+    profile_sample_rate: float = 0.0
+
+    # Multi-worker mode: API workers forward browser jobs to a broker process
+    # (python -m src.broker) at unix:///path.sock or http://127.0.0.1:PORT
+    broker_url: str = ""  # empty = run browsers in this process
+    broker_timeout_sec: int = 300  # longest a forwarded job may take
+
+    # Durable job queue shared by every instance (sqlite:///path/jobs.db);
+    # empty = creates run directly in the request
+    job_queue_url: str = ""
+    job_workers: int = 0  # queue consumers per instance; 0 = MAX_INFLIGHT_JOBS
+    job_lease_sec: int = 120  # a job is reclaimed if its worker stops heartbeating
+    job_max_attempts: int = 3
+    job_retry_delay_sec: int = 10  # before retrying a failed attempt
+    job_wait_sec: int = 120  # POST /api/create-pixel waits this long, then 202
+    job_retention_sec: int = 86400  # finished jobs are purged after this
+
+    # Tenants: extra API keys mapped to tenant names (JSON); callers using
+    # API_KEY may name their tenant with an X-Tenant-Id header instead
+    tenant_api_keys: dict[str, str] = {}
+    tenant_weights: dict[str, float] = {}  # fair-queuing weight, default 1
+    tenant_max_inflight_jobs: int = 0  # per-tenant cap; 0 = MAX_INFLIGHT_JOBS
+    tenant_max_queued_jobs: int = 5  # per-tenant queue depth before 429
+
+    # Upstream protection, per account: rate limits shared by its sessions and
+    # a circuit breaker
+    upstream_login_rate_per_min: float = 10  # 0 = unlimited
+    upstream_login_burst: int = 3
+    upstream_create_rate_per_min: float = 30  # 0 = unlimited
+    upstream_create_burst: int = 5
+    breaker_failure_threshold: int = 5  # consecutive failures that open the circuit
+    breaker_reset_sec: int = 30  # open period before a half-open probe
+    breaker_max_reset_sec: int = 300  # cap for the doubling after failed probes
+
     chrome_headless: bool = True
+    chrome_bin: str = ""  # empty = let chromedriver find Chrome
+    chromedriver_path: str = ""  # empty = probe PATH, then webdriver-manager
+
+    # Shared caching proxy for IntentCore static assets (optional)
+    asset_proxy_enabled: bool = False
+    asset_proxy_port: int = 0  # 0 = pick a free port
+    asset_proxy_intercept_hosts: list[str] = ["app.intentcore.io"]
+    asset_proxy_cert_file: str = ""  # TLS cert/key used to terminate
+    asset_proxy_key_file: str = ""  # intercepted hosts
+    asset_cache_memory_mb: int = 128
+    asset_cache_disk_dir: str = ""  # empty = memory-only cache
+    asset_cache_disk_mb: int = 512
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
+    @model_validator(mode="after")
+    def _resolve_accounts(self):
+        if not self.intentcore_accounts:
+            if not (
+                self.intentcore_email
+                and self.intentcore_password
+                and self.intentcore_workspace_url
+            ):
+                raise ValueError(
+                    "Set INTENTCORE_EMAIL, INTENTCORE_PASSWORD and "
+                    "INTENTCORE_WORKSPACE_URL, or INTENTCORE_ACCOUNTS"
+                )
+            self.intentcore_accounts = [
+                IntentCoreAccount(
+                    name="default",
+                    email=self.intentcore_email,
+                    password=self.intentcore_password,
+                    workspace_url=self.intentcore_workspace_url,
+                )
+            ]
+        names = [a.name for a in self.intentcore_accounts]
+        if len(set(names)) != len(names):
+            raise ValueError("INTENTCORE_ACCOUNTS names must be unique")
+        for account in self.intentcore_accounts:
+            account.workspace_url = account.workspace_url.rstrip("/")
+        return self
+
 
 settings = Settings()
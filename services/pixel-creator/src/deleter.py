@@ -0,0 +1,263 @@
+"""
+Headless bulk pixel deletion.
+
+Names are spread across several pooled sessions and deleted in parallel,
+waiting on DOM state instead of fixed sleeps. Every name gets a
+structured result. Sessions are checked out of the `ShardedPool`, so they
+show up as in use and are closed on shutdown; when an `admit` slot factory
+is given, every session beyond the first needs a free admission slot.
+Two modes:
+
+  index  — read the whole pixel table once (all pages, one script call),
+           mark names that are not in it as not_found without any search,
+           and delete matched rows page by page, last page first.
+  search — type each name into the table's search box and delete the
+           exact-name match.
+"""
+
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    NoSuchWindowException,
+    WebDriverException,
+)
+
+from .admission import AdmissionRejected
+from .config import settings
+from .intentcore import (
+    ERROR,
+    NOT_FOUND,
+    delete_pixel,
+    delete_result as _result,
+    delete_row,
+    find_row,
+)
+from .inventory import checkout_pixel_page, read_pixel_table, step_pages
+from .pixel_creator import Tier, WarmSession
+from .shards import ShardedPool
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the browser itself is unusable
+_FATAL_ERRORS = (InvalidSessionIdException, NoSuchWindowException)
+
+
+def _guarded(name: str, fn, *args) -> dict:
+    """Run one deletion, turning non-fatal errors into an error result."""
+    try:
+        result = fn(*args)
+    except _FATAL_ERRORS:
+        raise
+    except WebDriverException as e:
+        result = _result(name, ERROR, e.msg or type(e).__name__)
+    except Exception as e:
+        result = _result(name, ERROR, str(e))
+    logger.info(f"Delete '{name}': {result['status']}")
+    return result
+
+
+def delete_batch(session: WarmSession, names: list[str]) -> list[dict]:
+    """Delete `names` one after another in a single session (search mode)."""
+    return [_guarded(name, delete_pixel, session.driver, name) for name in names]
+
+
+def index_pixel_table(session: WarmSession) -> tuple[dict[str, int], int]:
+    """
+    Read the whole table once and return ({name: page}, last page index).
+    The table is left on its last page.
+    """
+    rows = read_pixel_table(session.driver)
+    index: dict[str, int] = {}
+    for row in rows:
+        index.setdefault(row["name"], row["page"])
+    last_page = max((row["page"] for row in rows), default=0)
+    return index, last_page
+
+
+def delete_indexed(
+    session: WarmSession, targets: dict[int, list[str]], current_page: int = 0
+) -> list[dict]:
+    """
+    Delete names whose rows were indexed on the given pages, visiting pages
+    from last to first so deletions never shift rows that are still to be
+    processed. A row that moved (because another session deleted on an
+    earlier page) is carried to the next page down, and anything still
+    missing at the end falls back to a search.
+    """
+    driver = session.driver
+    results = []
+    carry: list[str] = []
+    for page in sorted(targets, reverse=True):
+        names = targets[page] + carry
+        carry = []
+        if not step_pages(driver, page - current_page):
+            carry = names
+            break
+        current_page = page
+        for name in names:
+            row = find_row(driver, name)
+            if row is None:
+                carry.append(name)
+                continue
+            results.append(_guarded(name, delete_row, driver, row, name))
+    for name in carry:
+        results.append(_guarded(name, delete_pixel, driver, name))
+    return results
+
+
+async def _extra_slots(slots: AsyncExitStack, admit, wanted: int) -> int:
+    """Enter up to `wanted` admission slots from `admit` into `slots`; how many."""
+    if admit is None:
+        return wanted
+    taken = 0
+    while taken < wanted:
+        try:
+            await slots.enter_async_context(admit())
+        except AdmissionRejected:
+            break
+        taken += 1
+    return taken
+
+
+async def delete_pixels(
+    pool: ShardedPool,
+    names: list[str],
+    concurrency: int = settings.delete_concurrency,
+    mode: str = "index",
+    account: str | None = None,
+    admit=None,
+) -> list[dict]:
+    """
+    Delete `names` from `account` (the first configured one if None) using
+    up to `concurrency` pooled sessions in parallel. The caller holds the
+    first session's admission slot; `admit()`, if given, must enter another
+    one without waiting (or raise AdmissionRejected), and a session is added
+    for each slot it grants. Results are returned in the order of `names`.
+    """
+    if mode == "index":
+        return await _delete_pixels_indexed(pool, names, concurrency, account, admit)
+
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for name in dict.fromkeys(names):
+        queue.put_nowait(name)
+    results: dict[str, dict] = {}
+    loop = asyncio.get_event_loop()
+
+    async def worker():
+        session = None
+        try:
+            while True:
+                # Take the name first: another worker may empty the queue
+                # while this one waits for a session
+                try:
+                    name = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if session is None:
+                    session = await checkout_pixel_page(pool, account)
+                    if session is None:
+                        # Leave it to a worker that has a session
+                        queue.put_nowait(name)
+                        return
+                try:
+                    (result,) = await loop.run_in_executor(
+                        None, delete_batch, session, [name]
+                    )
+                except Exception as e:
+                    logger.error(f"Session {session.id} died while deleting: {e}")
+                    await pool.discard(session)
+                    session = None
+                    result = _result(name, ERROR, str(e))
+                results[name] = result
+        finally:
+            if session is not None:
+                # Search box and scroll state changed; reload before reuse
+                session.tier = Tier.LOGGED_IN
+                await pool.release(session)
+
+    async with AsyncExitStack() as slots:
+        workers = 1 + await _extra_slots(slots, admit, min(concurrency, queue.qsize()) - 1)
+        await asyncio.gather(*(worker() for _ in range(workers)))
+    return [
+        results.get(name) or _result(name, ERROR, "No browser session available")
+        for name in names
+    ]
+
+
+async def _delete_pixels_indexed(
+    pool: ShardedPool, names: list[str], concurrency: int, account: str | None, admit
+) -> list[dict]:
+    loop = asyncio.get_event_loop()
+    session = await checkout_pixel_page(pool, account)
+    if session is None:
+        return [_result(n, ERROR, "No browser session available") for n in names]
+    try:
+        index, last_page = await loop.run_in_executor(None, index_pixel_table, session)
+    except Exception as e:
+        logger.error(f"Indexing pixel table failed, falling back to search: {e}")
+        session.tier = Tier.LOGGED_IN
+        await pool.release(session)
+        return await delete_pixels(pool, names, concurrency, "search", account, admit)
+
+    results: dict[str, dict] = {}
+    by_page: dict[int, list[str]] = {}
+    for name in dict.fromkeys(names):
+        if name in index:
+            by_page.setdefault(index[name], []).append(name)
+        else:
+            results[name] = _result(name, NOT_FOUND)
+    logger.info(
+        f"Indexed pixel table: {len(by_page)} page(s) with matches, "
+        f"{len(results)} name(s) not found"
+    )
+
+    # Contiguous page ranges per session; the indexing session is already
+    # on the last page, so it takes the highest range
+    pages = sorted(by_page, reverse=True)
+    slots = AsyncExitStack()
+    workers = 1 + await _extra_slots(slots, admit, min(concurrency, len(pages)) - 1)
+    chunk = -(-len(pages) // workers) if pages else 0
+    ranges = [pages[i : i + chunk] for i in range(0, len(pages), chunk or 1)]
+
+    async def worker(session: WarmSession | None, page_range: list[int], start_page: int):
+        targets = {p: by_page[p] for p in page_range}
+        pending = [n for p in page_range for n in by_page[p]]
+        if session is None:
+            session = await checkout_pixel_page(pool, account)
+            if session is None:
+                for n in pending:
+                    results[n] = _result(n, ERROR, "No browser session available")
+                return
+        try:
+            for r in await loop.run_in_executor(
+                None, delete_indexed, session, targets, start_page
+            ):
+                results[r["name"]] = r
+        except Exception as e:
+            logger.error(f"Session {session.id} died while deleting: {e}")
+            await pool.discard(session)
+            session = None
+            for n in pending:
+                results.setdefault(n, _result(n, ERROR, str(e)))
+        finally:
+            if session is not None:
+                session.tier = Tier.LOGGED_IN
+                await pool.release(session)
+
+    async with slots:
+        if ranges:
+            await asyncio.gather(
+                worker(session, ranges[0], last_page),
+                *(worker(None, r, 0) for r in ranges[1:]),
+            )
+        else:
+            session.tier = Tier.LOGGED_IN
+            await pool.release(session)
+
+    return [
+        results.get(name) or _result(name, ERROR, "No result")
+        for name in names
+    ]
@@ -0,0 +1,118 @@
+"""
+Single long-lived chromedriver shared by every browser session.
+
+The chromedriver binary is resolved once and one chromedriver process is
+kept running; each session attaches to it as a remote client instead of
+spawning its own driver process. Quitting a session only ends that
+browser — the shared service keeps running. If the chromedriver process
+dies it is restarted transparently on the next request.
+"""
+
+import logging
+import os
+import shutil
+import threading
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service as ChromeService
+
+logger = logging.getLogger(__name__)
+
+_FALLBACK_PATHS = [
+    "/usr/bin/chromedriver",
+    "/opt/homebrew/bin/chromedriver",
+    "/usr/local/bin/chromedriver",
+]
+
+
+def resolve_chromedriver_path(explicit_path: str = "") -> str:
+    """Explicit path (CHROMEDRIVER_PATH) > PATH > known locations > webdriver-manager."""
+    if explicit_path:
+        if os.path.isfile(explicit_path):
+            return explicit_path
+        logger.warning(f"CHROMEDRIVER_PATH {explicit_path} does not exist, probing")
+    found = shutil.which("chromedriver")
+    if found:
+        return found
+    for path in _FALLBACK_PATHS:
+        if os.path.isfile(path):
+            return path
+    logger.info("Using webdriver-manager chromedriver")
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    return ChromeDriverManager().install()
+
+
+class SharedDriverService:
+    def __init__(self, path: str = ""):
+        self._explicit_path = path
+        self._path: str | None = None
+        self._service: ChromeService | None = None
+        self._lock = threading.Lock()
+        self.restarts = 0
+
+    @property
+    def path(self) -> str:
+        if self._path is None:
+            self._path = resolve_chromedriver_path(self._explicit_path)
+            logger.info(f"Resolved chromedriver: {self._path}")
+        return self._path
+
+    @property
+    def is_running(self) -> bool:
+        service = self._service
+        return (
+            service is not None
+            and service.process is not None
+            and service.process.poll() is None
+        )
+
+    def start(self):
+        """Resolve the binary and start chromedriver (idempotent)."""
+        self.ensure_running()
+
+    def ensure_running(self) -> ChromeService:
+        with self._lock:
+            if self.is_running and self._service.is_connectable():
+                return self._service
+            if self._service is not None:
+                logger.warning("chromedriver is not responding — restarting")
+                self._stop_locked()
+                self.restarts += 1
+            service = ChromeService(self.path)
+            service.start()
+            self._service = service
+            logger.info(f"chromedriver started at {service.service_url}")
+            return service
+
+    def new_driver(self, options) -> webdriver.Remote:
+        """Start a browser session on the shared chromedriver."""
+        service = self.ensure_running()
+        try:
+            return webdriver.Remote(command_executor=service.service_url, options=options)
+        except WebDriverException:
+            if self.is_running and service.is_connectable():
+                raise
+            # chromedriver died between the health check and the request
+            service = self.ensure_running()
+            return webdriver.Remote(command_executor=service.service_url, options=options)
+
+    def _stop_locked(self):
+        try:
+            self._service.stop()
+        except Exception:
+            pass
+        self._service = None
+
+    def stop(self):
+        with self._lock:
+            if self._service is not None:
+                self._stop_locked()
+
+    def stats(self) -> dict:
+        return {
+            "path": self._path,
+            "running": self.is_running,
+            "restarts": self.restarts,
+        }
@@ -0,0 +1,544 @@
+"""
+The browser-owning side of the service.
+
+`Engine` holds the sharded session pool, admission control, leases,
+idempotency cache and pixel inventory, and runs every job that needs a
+browser. It lives either inside the API process (the default) or in a
+separate broker process shared by several API workers (see `broker`).
+With a job queue configured it also runs the queue's consumers (`jobs`).
+Startup returns at once and warms up in the background; `readiness`
+reports when the engine can take traffic. Shutdown drains first: new work
+is refused, in-flight creates get up to `shutdown_grace_sec` to finish,
+then every browser is closed. Creates and deletes each run in a trace
+(see `tracing`).
+Errors are raised as AdmissionRejected, UpstreamUnavailable or ValueError
+(unknown workspace) for the API layer to turn into HTTP responses.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from . import tracing
+from .admission import BATCH, AdmissionController, AdmissionRejected
+from .asset_proxy import proxy as asset_proxy
+from .config import settings
+from .deleter import delete_pixels
+from .idempotency import RequestCoalescer, derive_key, normalize_name
+from .intentcore import PixelNotCreated
+from .inventory import PixelInventory
+from .jobqueue import open_queue
+from .jobs import JobRunner
+from .leases import LeaseManager
+from .memory import monitor as memory_monitor
+from .models import (
+    CreatePixelRequest,
+    CreatePixelResponse,
+    DeletePixelResult,
+    DeletePixelsRequest,
+    DeletePixelsResponse,
+    InventoryPixel,
+    InventoryResponse,
+    PoolStateResponse,
+    PoolUpdateRequest,
+    RecycleSessionsRequest,
+    RecycleSessionsResponse,
+    ReleaseSessionResponse,
+    ReserveSessionResponse,
+)
+from .commands import count_round_trips, round_trip_stats
+from .pixel_creator import (
+    CreateFailed,
+    driver_service,
+    fill_and_create,
+    recovery,
+)
+from .profiling import profiler
+from .shards import ShardedPool
+from .store import PixelStore
+from .tracing import recorder
+from .upstream import UpstreamUnavailable, guard
+
+logger = logging.getLogger(__name__)
+
+# Admission tenant of the background inventory refresh
+_INVENTORY_TENANT = "inventory"
+
+
+class Engine:
+    def __init__(self, store: PixelStore):
+        self.store = store
+        self.pool = ShardedPool()
+        self.admission = AdmissionController()
+        self.leases = LeaseManager(self.pool)
+        self.coalescer = RequestCoalescer()
+        self.inventory = PixelInventory(
+            self.pool, admit=lambda: self.admission.admit(_INVENTORY_TENANT, BATCH)
+        )
+        self.jobs = JobRunner(open_queue(), self) if settings.job_queue_url else None
+        self.started_at = time.time()
+        self._startup: asyncio.Task | None = None
+        self._driver_started = False
+        self._ready = False
+        self.startup_error: str | None = None
+        self.draining = False
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def start(self):
+        """Begin warming up in the background and return immediately."""
+        tracing.start(
+            settings.trace_log_path,
+            settings.trace_keep,
+            settings.trace_slow_ms,
+            settings.trace_dom_chars,
+        )
+        self._startup = asyncio.ensure_future(self._warm_up())
+
+    async def _warm_up(self):
+        loop = asyncio.get_event_loop()
+        try:
+            if asset_proxy is not None:
+                await loop.run_in_executor(None, asset_proxy.start)
+            # Resolving chromedriver may download it; keep it off the event loop
+            await loop.run_in_executor(None, driver_service.start)
+        except Exception as e:
+            self.startup_error = str(e) or type(e).__name__
+            logger.error(f"Engine startup failed: {self.startup_error}")
+            return
+        self._driver_started = True
+        if self.jobs is not None:
+            self.jobs.start()
+        self.inventory.start()
+        logger.info("Starting session pool...")
+        await self.pool.start()
+        logger.info(
+            f"Pool ready with {self.pool.warm_count} session(s) "
+            f"{time.time() - self.started_at:.1f}s after startup"
+        )
+
+    async def readiness(self) -> dict:
+        """
+        Ready once chromedriver runs and `ready_min_warm_sessions` sessions
+        have been warm; stays ready afterwards, since later requests can
+        warm sessions on demand.
+        """
+        if not self._ready and self._driver_started:
+            self._ready = self.pool.warm_count >= settings.ready_min_warm_sessions
+        return {
+            # Not ready while draining, so load balancers stop sending work
+            "ready": self._ready and not self.draining,
+            "draining": self.draining,
+            "warm_sessions": self.pool.warm_count,
+            "uptime_sec": round(time.time() - self.started_at, 1),
+            "error": self.startup_error,
+        }
+
+    @asynccontextmanager
+    async def _in_flight(self):
+        """Count a browser job, refusing new ones once draining."""
+        if self.draining:
+            raise AdmissionRejected("Service is shutting down", 1)
+        self._inflight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+            if not self._inflight:
+                self._idle.set()
+
+    async def drain(self, timeout_sec: float = settings.shutdown_grace_sec) -> bool:
+        """
+        Stop taking work and wait up to `timeout_sec` for running jobs.
+        Jobs still waiting for a slot are rejected (queued ones go back to
+        the job queue). Returns True if everything finished in time.
+        """
+        self.draining = True
+        self.admission.close("Service is shutting down")
+        if self.jobs is not None:
+            self.jobs.drain()
+        if self._inflight:
+            logger.info(f"Draining: waiting up to {timeout_sec}s for {self._inflight} job(s)")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout_sec)
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain timed out with {self._inflight} job(s) still running")
+            return False
+        logger.info("Drained")
+        return True
+
+    async def stop(self):
+        if self._startup is not None and not self._startup.done():
+            self._startup.cancel()
+            try:
+                await self._startup
+            except asyncio.CancelledError:
+                pass
+        await self.drain()
+        if self.jobs is not None:
+            await self.jobs.stop()
+            self.jobs.queue.close()
+        await self.inventory.stop()
+        logger.info("Shutting down session pool...")
+        self.leases.shutdown()
+        await self.pool.shutdown()
+        driver_service.stop()
+        if asset_proxy is not None:
+            asset_proxy.stop()
+        tracing.stop()
+
+    def check_workspace(self, workspace: str | None):
+        """Raise ValueError if `workspace` is not a configured account."""
+        if workspace:
+            self.pool.shard(workspace)
+
+    async def reserve(
+        self, owner: str | None = None, workspace: str | None = None
+    ) -> ReserveSessionResponse:
+        self.check_workspace(workspace)
+        async with self._in_flight():
+            lease = await self.leases.reserve(owner=owner, account=workspace)
+        return ReserveSessionResponse(
+            lease_id=lease.id,
+            expires_in_sec=self.leases.ttl_sec,
+            ready=lease.ready,
+        )
+
+    async def release(self, lease_id: str, owner: str | None = None) -> ReleaseSessionResponse:
+        return ReleaseSessionResponse(released=self.leases.release(lease_id, owner))
+
+    async def create(
+        self,
+        req: CreatePixelRequest,
+        tenant: str,
+        priority: str,
+        idempotency_key: str | None = None,
+        profile: bool = False,
+    ) -> CreatePixelResponse:
+        self.check_workspace(req.workspace)
+        # Identical concurrent requests share one browser run; recent
+        # successes are replayed instead of creating a duplicate pixel upstream
+        explicit_key = req.idempotency_key or idempotency_key
+        key = f"key:{explicit_key}" if explicit_key else f"derived:{derive_key(req.name, req.url)}"
+        if req.workspace:
+            key = f"{self.pool.shard(req.workspace).account.name}:{key}"
+
+        async def create_once() -> CreatePixelResponse:
+            # Runs in its own task, which outlives a caller that gives up,
+            # so it is counted for drain() separately
+            async with self._in_flight():
+                return await self._traced_create(req, tenant, priority, profile)
+
+        async with self._in_flight():
+            return await self.coalescer.run(
+                f"{tenant}:{key}", create_once, cache_if=lambda r: r.success
+            )
+
+    async def _traced_create(
+        self, req: CreatePixelRequest, tenant: str, priority: str, profile: bool = False
+    ) -> CreatePixelResponse:
+        with tracing.trace(
+            "create_pixel",
+            tenant=tenant,
+            priority=priority,
+            workspace=req.workspace,
+            name=req.name,
+            url=req.url,
+            lease=bool(req.lease_id),
+        ) as trace, profiler.profile(
+            enabled=profile or profiler.sample()
+        ) as prof, count_round_trips() as trips:
+            try:
+                response = await self._create_pixel(req, tenant, priority)
+            except (AdmissionRejected, UpstreamUnavailable) as e:
+                trace.fail(str(e), status=tracing.REJECTED)
+                raise
+            finally:
+                trace.attrs["round_trips"] = trips.count
+                if trips.count:
+                    round_trip_stats.record(trips.count)
+                if prof is not None:
+                    trace.profile = prof.report()
+                    logger.info(f"Profile of trace {trace.id}: {trace.profile['summary']}")
+            if not response.success:
+                trace.fail(response.error or "failed")
+            trace.attrs["account"] = response.account
+            response.trace_id = trace.id
+            return response
+
+    async def _create_pixel(
+        self, req: CreatePixelRequest, tenant: str, priority: str
+    ) -> CreatePixelResponse:
+        # Don't queue behind a circuit that is already open (for the requested
+        # account, or for every account)
+        self.pool.pick(req.workspace)
+
+        # The session reserved when the dialog opened is already held, so it
+        # skips admission (and is not counted in MAX_INFLIGHT_JOBS; see leases)
+        if req.lease_id:
+            with tracing.span("redeem_lease"):
+                session = await self.leases.redeem(req.lease_id, req.user_id)
+            if session is not None and req.workspace and (
+                session.account is not self.pool.shard(req.workspace).account
+            ):
+                logger.info("Leased session belongs to another account, returning it")
+                await self.pool.release(session)
+                session = None
+            if session is not None:
+                logger.info("Using leased session")
+                return await self._run_create(session, req)
+
+        # Otherwise wait for a job slot, then take a pooled session; if none is
+        # available, create one on the spot (bounded by the slot count)
+        async with self.admission.admit(tenant, priority) as ticket:
+            tracing.add_span(
+                "admission", ticket.enqueued_at, ticket.admitted_at, position=ticket.position
+            )
+            try:
+                with tracing.span("acquire"):
+                    session = await self.pool.acquire(timeout=5, account=req.workspace)
+                logger.info(f"Using pre-warmed session of '{session.account.name}'")
+            except TimeoutError:
+                account = self.pool.pick(req.workspace).account
+                if not memory_monitor.can_warm():
+                    raise AdmissionRejected(
+                        "No warm session available and no memory to start another",
+                        self.admission.retry_after(),
+                    )
+                logger.info(
+                    f"No warm session available, creating one for '{account.name}' on the fly..."
+                )
+                try:
+                    with tracing.span("warm_on_demand", account=account.name):
+                        session = await asyncio.wait_for(
+                            self.pool.warm_on_demand(account.name), timeout=60
+                        )
+                except UpstreamUnavailable:
+                    raise
+                except Exception as e:
+                    logger.error(f"Failed to create on-demand session: {e}")
+                    return CreatePixelResponse(
+                        success=False,
+                        error="Failed to start browser session. Please try again.",
+                        queue_position=ticket.position,
+                        retryable=True,
+                    )
+            response = await self._run_create(session, req)
+            response.queue_position = ticket.position
+            return response
+
+    async def _run_create(self, session, req: CreatePixelRequest) -> CreatePixelResponse:
+        timings: dict[str, int] = {}
+        account = session.account.name
+        try:
+            # Wait out the create rate limit here, so it does not count
+            # against the create's timeout or hold an executor thread
+            upstream = guard(account)
+            upstream.breaker.check()
+            with tracing.span("create_rate_limit"):
+                wait = upstream.create_limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            with tracing.span("fill_and_create", session=session.id, account=account):
+                pixel_code, pixel_id = await asyncio.wait_for(
+                    asyncio.get_event_loop().run_in_executor(
+                        None,
+                        tracing.bind(functools.partial(fill_and_create, token_taken=True)),
+                        session,
+                        req.name,
+                        req.url,
+                        timings,
+                    ),
+                    timeout=90,
+                )
+            if pixel_id:
+                try:
+                    with tracing.span("persist"):
+                        await asyncio.get_event_loop().run_in_executor(
+                            None, self.store.save, pixel_id, req.name, req.url, pixel_code, timings
+                        )
+                except Exception as e:
+                    logger.error(f"Failed to persist pixel {pixel_id}: {e}")
+            self.pool.record_create(session, ok=True)
+            self.inventory.record_created(account, req.name, req.url, pixel_id)
+            return CreatePixelResponse(
+                success=True,
+                pixel_code=pixel_code,
+                pixel_id=pixel_id,
+                account=account,
+            )
+        except UpstreamUnavailable:
+            # Refused before the session was touched — it can serve someone else
+            await self.pool.release(session)
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"Pixel creation in '{account}' timed out after 90s")
+            session.close()
+            self.pool.record_create(session, ok=False)
+            return CreatePixelResponse(
+                success=False,
+                error="Pixel creation timed out. Please try again.",
+                account=account,
+            )
+        except Exception as e:
+            logger.error(f"Pixel creation in '{account}' failed: {e}")
+            self.pool.record_create(session, ok=False)
+            if isinstance(e, CreateFailed):
+                # The browser survived and was reset; it is re-warmed for reuse
+                await self.pool.release(session)
+            return CreatePixelResponse(
+                success=False,
+                error=str(e),
+                account=account,
+                # CreateFailed keeps the classified error as its cause
+                retryable=isinstance(e, PixelNotCreated) or isinstance(e.__cause__, PixelNotCreated),
+            )
+
+    async def delete(self, req: DeletePixelsRequest, tenant: str) -> DeletePixelsResponse:
+        self.check_workspace(req.workspace)
+        # Pixel names are per workspace, so deletes never fall over to another
+        # account
+        shard = self.pool.shard(req.workspace)
+        self.pool.pick(shard.account.name)
+        with tracing.trace(
+            "delete_pixels",
+            tenant=tenant,
+            account=shard.account.name,
+            count=len(req.names),
+            mode=req.mode,
+        ) as trace:
+            try:
+                async with self._in_flight(), self.admission.admit(tenant, BATCH) as ticket:
+                    tracing.add_span("admission", ticket.enqueued_at, ticket.admitted_at)
+                    # Sessions beyond the first take a free slot each
+                    results = await delete_pixels(
+                        self.pool,
+                        req.names,
+                        concurrency=req.concurrency or settings.delete_concurrency,
+                        mode=req.mode,
+                        account=shard.account.name,
+                        admit=lambda: self.admission.admit(tenant, BATCH, wait=False),
+                    )
+            except AdmissionRejected as e:
+                trace.fail(str(e), status=tracing.REJECTED)
+                raise
+            failed = sum(r["status"] == "error" for r in results)
+            if failed:
+                trace.fail(f"{failed} of {len(results)} deletes failed")
+        for r in results:
+            if r["status"] == "deleted":
+                self.inventory.record_deleted(shard.account.name, r["name"])
+        return DeletePixelsResponse(
+            results=[DeletePixelResult(**r) for r in results],
+            deleted=sum(r["status"] == "deleted" for r in results),
+            not_found=sum(r["status"] == "not_found" for r in results),
+            failed=sum(r["status"] == "error" for r in results),
+        )
+
+    async def find_existing(self, req: CreatePixelRequest) -> CreatePixelResponse | None:
+        """
+        The pixel `req` asks for if it was already created: from the local
+        store (with its code), else from the last inventory scrape (which
+        has its id but not its code, so the response is a failure). None if
+        neither knows of it.
+        """
+        name = normalize_name(req.name)
+        records = await asyncio.get_event_loop().run_in_executor(
+            None, self.store.find_by_url, req.url
+        )
+        for record in records:
+            if normalize_name(record["name"]) == name:
+                return CreatePixelResponse(
+                    success=True, pixel_code=record["pixel_code"], pixel_id=record["pixel_id"]
+                )
+        account = self.pool.shard(req.workspace).account.name if req.workspace else None
+        for p in self.inventory.pixels:
+            if normalize_name(p["name"]) == name and account in (None, p["account"]):
+                return CreatePixelResponse(
+                    success=False,
+                    pixel_id=p["pixel_id"] or None,
+                    account=p["account"],
+                    error="Pixel already exists in IntentCore, but its code was not captured",
+                )
+        return None
+
+    async def pixel_inventory(self) -> InventoryResponse:
+        return InventoryResponse(
+            pixels=[InventoryPixel(**p) for p in self.inventory.pixels],
+            refreshed_at=self.inventory.refreshed_at,
+            age_sec=self.inventory.age_sec,
+            refreshing=self.inventory.refreshing,
+            error=self.inventory.last_error,
+        )
+
+    async def pool_state(self, workspace: str | None = None) -> PoolStateResponse:
+        return PoolStateResponse(accounts=self.pool.pool_state(workspace))
+
+    async def update_pool(self, req: PoolUpdateRequest) -> PoolStateResponse:
+        await self.pool.configure(
+            req.workspace,
+            pool_size=req.pool_size,
+            max_age_sec=req.max_age_sec,
+            paused=req.paused,
+        )
+        return await self.pool_state(req.workspace)
+
+    async def recycle_sessions(self, req: RecycleSessionsRequest) -> RecycleSessionsResponse:
+        if req.drain:
+            await self.pool.configure(req.workspace, paused=True)
+        closed, retiring = await self.pool.recycle(req.workspace, req.session_id)
+        logger.info(
+            f"Recycled sessions ({req.workspace or 'all accounts'}, "
+            f"{req.session_id or 'all'}): {closed} closed, {retiring} retiring"
+        )
+        return RecycleSessionsResponse(
+            closed=closed, retiring=retiring, pools=await self.pool_state(req.workspace)
+        )
+
+    async def profiling(self, sample_rate: float | None = None) -> dict:
+        """Profiler settings and counts; sets the sample rate if given."""
+        if sample_rate is not None:
+            profiler.sample_rate = sample_rate
+            logger.info(f"Profiling sample rate set to {sample_rate}")
+        return profiler.stats()
+
+    async def traces(self) -> list[dict]:
+        """Flight recorder: recent failed or slow traces, newest first."""
+        return recorder.traces()
+
+    async def trace(self, trace_id: str) -> dict | None:
+        """One recorded trace with its screenshot (base64 PNG) and DOM snippet."""
+        return recorder.get(trace_id)
+
+    async def health(self) -> dict:
+        readiness = await self.readiness()
+        if self.draining:
+            status = "draining"
+        elif not readiness["ready"]:
+            status = "starting"
+        else:
+            status = "degraded" if self.pool.degraded else "ok"
+        return {
+            "status": status,
+            "readiness": readiness,
+            "warm_sessions": self.pool.warm_count,
+            "is_warming": self.pool.is_warming,
+            "tiers": self.pool.tier_counts(),
+            "active_leases": self.leases.active_count,
+            "max_leases": self.leases.max_active,
+            "admission": self.admission.stats(),
+            "accounts": self.pool.stats(),
+            "memory": memory_monitor.stats(),
+            "idempotency": self.coalescer.stats(),
+            "jobs": self.jobs.stats() if self.jobs else None,
+            "flight_recorder": recorder.stats(),
+            "profiling": profiler.stats(),
+            "create_recovery": recovery.stats(),
+            "webdriver_round_trips": round_trip_stats.stats(),
+            "chromedriver": driver_service.stats(),
+            "asset_cache": asset_proxy.stats() if asset_proxy else None,
+        }
@@ -0,0 +1,145 @@
+"""
+Request coalescing and idempotent result cache for pixel creation.
+
+Double-clicks and client retries after a timeout would otherwise each
+start another browser run (and create duplicate pixels upstream).
+Requests are keyed by an explicit idempotency key or by the normalized
+name/URL; concurrent identical requests share one in-flight creation and
+recent successful results are served from a TTL cache.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlsplit
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_HOSTNAME_RE = re.compile(r"^(?=.{1,253}$)([a-z0-9-]{1,63}\.)+[a-z]{2,63}$")
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a website URL: scheme defaults to https, host is
+    lowercased, default ports, fragments and trailing slashes are dropped.
+    Raises ValueError for anything that is not a plain http(s) website URL.
+    """
+    url = url.strip()
+    if not url or any(c.isspace() for c in url):
+        raise ValueError("URL must not be empty or contain whitespace")
+    if "://" not in url:
+        url = f"https://{url}"
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in ("http", "https"):
+        raise ValueError("URL must use http or https")
+    host = (parts.hostname or "").lower()
+    if not _HOSTNAME_RE.match(host):
+        raise ValueError(f"Invalid hostname: {host or '(empty)'}")
+    try:
+        port = parts.port
+    except ValueError:
+        raise ValueError("Invalid port in URL")
+    netloc = host
+    if port and port not in (80, 443):
+        netloc = f"{host}:{port}"
+    path = parts.path.rstrip("/")
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{parts.scheme.lower()}://{netloc}{path}{query}"
+
+
+def derive_key(name: str, url: str) -> str:
+    raw = f"{normalize_name(name)}\n{normalize_url(url)}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+class RequestCoalescer:
+    def __init__(
+        self,
+        ttl_sec: float = settings.idempotency_ttl_sec,
+        max_entries: int = 1000,
+    ):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._results: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def _cached(self, key: str) -> Any | None:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if time.time() > expires_at:
+            del self._results[key]
+            return None
+        return result
+
+    def _store(self, key: str, result: Any):
+        now = time.time()
+        self._results[key] = (now + self.ttl_sec, result)
+        self._results.move_to_end(key)
+        while self._results:
+            oldest_key, (expires_at, _) = next(iter(self._results.items()))
+            if expires_at > now and len(self._results) <= self.max_entries:
+                break
+            del self._results[oldest_key]
+
+    async def run(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        cache_if: Callable[[Any], bool] = lambda result: True,
+    ) -> Any:
+        """
+        Return a recent cached result for `key`, join an identical in-flight
+        call, or run `factory()` and share its outcome.
+        """
+        cached = self._cached(key)
+        if cached is not None:
+            self.cache_hits += 1
+            logger.info(f"Idempotent replay for key {key[:8]}")
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.info(f"Coalescing duplicate request for key {key[:8]}")
+        else:
+            task = asyncio.ensure_future(self._lead(key, factory, cache_if))
+            self._inflight[key] = task
+        # The creation runs in its own task, so a caller that gives up
+        # (client disconnect, timeout) doesn't cancel it for the others
+        return await asyncio.shield(task)
+
+    async def _lead(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        cache_if: Callable[[Any], bool],
+    ) -> Any:
+        try:
+            result = await factory()
+            if cache_if(result):
+                self._store(key, result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "inflight": len(self._inflight),
+            "cached": len(self._results),
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+        }
@@ -0,0 +1,670 @@
+"""
+IntentCore browser automation shared by the service and the scripts.
+
+Everything here works on a plain WebDriver and takes credentials and URLs
+as arguments, so it can be imported without the service's settings:
+
+    sys.path.insert(0, "services/pixel-creator")
+    from src.intentcore import chrome_options, sign_in, open_pixel_page
+
+Waits are event-driven (poll the DOM for the state we need) rather than
+fixed sleeps. Lookups are batched into single script calls and most waits
+poll inside the page (see `commands`), so a step costs a round trip or two
+to chromedriver rather than one per selector, element and poll. A
+signed-in session can be snapshotted (cookies plus localStorage) and
+restored into a new browser to skip the login form.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from . import tracing
+from .commands import (
+    click_first_visible,
+    first_visible,
+    poll_script,
+    read_properties,
+    wait_visible,
+)
+from .timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+LOGIN_URL = "https://app.intentcore.io/auth/sign-in"
+
+CREATE_BUTTON = (By.XPATH, "//button[contains(normalize-space(.),'Create')]")
+
+DELETED = "deleted"
+NOT_FOUND = "not_found"
+ERROR = "error"
+
+
+# --- Browser and selectors ---
+
+
+def chrome_options(
+    user_data_dir: str | None = None,
+    headless: bool = True,
+    chrome_bin: str = "",
+    extra_args: list[str] | tuple[str, ...] = (),
+) -> Options:
+    options = Options()
+    if chrome_bin:
+        options.binary_location = chrome_bin
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    if user_data_dir:
+        options.add_argument(f"--user-data-dir={user_data_dir}")
+    for arg in extra_args:
+        options.add_argument(arg)
+    return options
+
+
+def find_clickable(driver, selectors, timeout: float = 30):
+    """Wait for one of `selectors` to be visible and enabled; returns it or None."""
+    return wait_visible(driver, selectors, timeout=timeout, enabled=True)
+
+
+def find_visible(driver, selectors):
+    """First visible match among `selectors`, without waiting (one round trip)."""
+    return first_visible(driver, selectors)
+
+
+def wait_until(driver, condition, timeout: float = 5.0, poll: float = 0.05):
+    """Poll `condition(driver)` until truthy; returns its value or None."""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=poll).until(condition)
+    except TimeoutException:
+        return None
+
+
+def wait_for_script(driver, script: str, *args, timeout: float = 5.0):
+    """Poll `script` in the page until it returns something truthy; returns it or None."""
+    try:
+        return poll_script(driver, script, *args, timeout=timeout)
+    except Exception:
+        return None
+
+
+# --- Sign-in ---
+
+
+def login_with_form(driver, email: str, password: str, timeout: int = 30):
+    """Sign in through the email/password form."""
+    wait = WebDriverWait(driver, timeout)
+
+    driver.get(LOGIN_URL)
+    email_input = wait.until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='email']"))
+    )
+    email_input.clear()
+    email_input.send_keys(email)
+    email_input.send_keys(Keys.ENTER)
+
+    pass_input = wait.until(
+        EC.element_to_be_clickable((By.CSS_SELECTOR, "input[type='password']"))
+    )
+    pass_input.clear()
+    pass_input.send_keys(password)
+    pass_input.send_keys(Keys.ENTER)
+
+    wait.until(lambda d: "/auth/" not in d.current_url)
+    logger.info("Logged in")
+
+
+_READ_STORAGE_JS = """
+var out = {};
+for (var i = 0; i < window.localStorage.length; i++) {
+    var k = window.localStorage.key(i);
+    out[k] = window.localStorage.getItem(k);
+}
+return out;
+"""
+
+_WRITE_STORAGE_JS = """
+var items = arguments[0];
+for (var k in items) window.localStorage.setItem(k, items[k]);
+"""
+
+_COOKIE_FIELDS = ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")
+
+
+def capture_snapshot(driver) -> dict:
+    """Cookies and localStorage of the signed-in app origin."""
+    parts = urlsplit(driver.current_url)
+    return {
+        "origin": f"{parts.scheme}://{parts.netloc}",
+        "cookies": driver.get_cookies(),
+        "local_storage": driver.execute_script(_READ_STORAGE_JS) or {},
+        "captured_at": time.time(),
+    }
+
+
+def restore_snapshot(
+    driver,
+    snapshot: dict,
+    landing_url: str,
+    ready_locator=CREATE_BUTTON,
+    timeout: float = 15,
+) -> bool:
+    """
+    Load `snapshot` into this browser and open `landing_url`. Returns True
+    once `ready_locator` is present, False if the app sent us to sign-in.
+    """
+    # Any same-origin URL lets us set cookies and storage; a static file
+    # avoids booting the app just to throw the page away
+    driver.get(f"{snapshot['origin']}/favicon.ico")
+    for cookie in snapshot["cookies"]:
+        try:
+            driver.add_cookie({k: v for k, v in cookie.items() if k in _COOKIE_FIELDS})
+        except WebDriverException:
+            continue
+    driver.execute_script(_WRITE_STORAGE_JS, snapshot["local_storage"])
+
+    driver.get(landing_url)
+    settled = wait_until(
+        driver,
+        lambda d: "/auth/" in d.current_url or d.find_elements(*ready_locator),
+        timeout=timeout,
+        poll=0.1,
+    )
+    return bool(settled) and "/auth/" not in driver.current_url
+
+
+def sign_in(
+    driver,
+    email: str,
+    password: str,
+    snapshot: dict | None = None,
+    landing_url: str = "",
+    ready_locator=CREATE_BUTTON,
+) -> tuple[dict, bool]:
+    """
+    Sign in, reusing `snapshot` when it is still accepted.
+
+    Returns (snapshot, restored). When `restored` is True the browser is
+    already on `landing_url`; otherwise the form was used and the returned
+    snapshot is a fresh capture.
+    """
+    if snapshot and landing_url:
+        try:
+            if restore_snapshot(driver, snapshot, landing_url, ready_locator):
+                logger.info("Signed in from session snapshot")
+                return snapshot, True
+        except WebDriverException as e:
+            logger.warning(f"Restoring session snapshot failed: {e.msg}")
+        logger.info("Session snapshot rejected, using the login form")
+        try:
+            driver.delete_all_cookies()
+            driver.execute_script("window.localStorage.clear();")
+        except WebDriverException:
+            pass
+    login_with_form(driver, email, password)
+    return capture_snapshot(driver), False
+
+
+def load_snapshot(path: str, max_age_sec: float) -> dict | None:
+    """A snapshot saved by `save_snapshot`, or None if missing or too old."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - snapshot.get("captured_at", 0) > max_age_sec:
+        return None
+    return snapshot
+
+
+def save_snapshot(path: str, snapshot: dict):
+    # Session cookies are credentials — keep the file private
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+
+
+# --- Pixels page and Create modal ---
+
+
+# Records the response that carries the pixel <script> tag, so the code can
+# be recovered even if the install view does not render it
+_PIXEL_CAPTURE_JS = """(function(){
+    try {
+        if (window.__PIXEL_CAPTURED__) return;
+        window.__PIXEL_CAPTURED__ = { pixel: '' };
+        var origFetch = window.fetch;
+        if (origFetch) {
+            window.fetch = async function(){
+                var res = await origFetch.apply(this, arguments);
+                try {
+                    var clone = res.clone();
+                    var text = await clone.text();
+                    if (/<script[^>]*src=/.test(text)) {
+                        window.__PIXEL_CAPTURED__.pixel = text;
+                    }
+                } catch(e) {}
+                return res;
+            };
+        }
+    } catch(e) {}
+})();"""
+
+
+def install_pixel_capture(driver):
+    driver.execute_script(_PIXEL_CAPTURE_JS)
+
+
+def open_pixel_page(driver, workspace_url: str, timeout: int = 30):
+    """Load the workspace's /pixel page and install the capture hook."""
+    driver.get(f"{workspace_url}/pixel")
+    WebDriverWait(driver, timeout).until(EC.presence_of_element_located(CREATE_BUTTON))
+    if "/auth/" in driver.current_url:
+        raise RuntimeError("Redirected to sign-in while opening Pixels page")
+    install_pixel_capture(driver)
+    logger.info("On Pixels page")
+
+
+_NAME_SELECTORS = [
+    (By.CSS_SELECTOR, "input[name='websiteName']"),
+    (By.CSS_SELECTOR, "input[name*='name']:not([placeholder*='Search'])"),
+    (By.CSS_SELECTOR, "form input[type='text']:not([placeholder*='Search'])"),
+]
+
+_URL_SELECTORS = [
+    (By.CSS_SELECTOR, 'input[placeholder="https://example.com"]'),
+    (By.CSS_SELECTOR, 'input[placeholder*="http"]'),
+    (By.CSS_SELECTOR, 'input[name*="url"]'),
+    (By.CSS_SELECTOR, 'input[type="url"]'),
+]
+
+_FINAL_CREATE_SELECTORS = [
+    (By.CSS_SELECTOR, "div[role='dialog'] button[type='submit']"),
+    (By.XPATH, "//div[@role='dialog']//button[contains(normalize-space(.),'Create')]"),
+    (By.XPATH, "//div[@role='dialog']//form//button[contains(normalize-space(.),'Create')]"),
+]
+
+
+def open_create_modal(driver, timeout: int = 30):
+    """Click Create on the /pixel page and select V4 in the modal."""
+    wait = WebDriverWait(driver, timeout)
+
+    # Click Create button (on the page, not in a dialog)
+    create_btn = find_clickable(driver, [
+        (By.XPATH, "//button[contains(normalize-space(.),'Create') and not(ancestor::div[@role='dialog'])]"),
+        (By.CSS_SELECTOR, "button.bg-primary"),
+        (By.XPATH, "//button[contains(@class,'primary') and contains(normalize-space(.),'Create')]"),
+        CREATE_BUTTON,
+    ], timeout=timeout)
+    if not create_btn:
+        raise RuntimeError("Create button not found on Pixels page")
+
+    driver.execute_script("arguments[0].scrollIntoView({block:'center'});", create_btn)
+    create_btn.click()
+
+    # Modal is usable once its form inputs render
+    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[role='dialog']")))
+    wait_visible(driver, _NAME_SELECTORS, timeout=5)
+
+    # Select V4 (Beta)
+    v4_btn = click_first_visible(driver, [
+        (By.XPATH, "//div[@role='dialog']//button[contains(normalize-space(.),'V4')]"),
+        (By.XPATH, "//div[@role='dialog']//*[contains(normalize-space(.),'V4 (Beta)') and (self::button or self::div)]"),
+        (By.XPATH, "//button[contains(normalize-space(.),'V4')]"),
+    ])
+    if v4_btn:
+        logger.info("V4 (Beta) selected")
+    else:
+        logger.warning("V4 button not found — may already be default")
+
+
+class PixelNotCreated(RuntimeError):
+    """The Create form failed before the pixel was submitted; safe to retry."""
+
+
+class PixelCodeMissing(RuntimeError):
+    """The pixel was submitted but its code could not be read from the page."""
+
+
+_INSTALL_TAB = (By.XPATH, "//button[contains(normalize-space(.),'Install')]")
+_BASIC_INSTALL = (By.XPATH, "//button[contains(normalize-space(.),'Basic Install')]")
+
+
+def _fill_form(driver, name: str, url: str, timer: StageTimer):
+    """Fill name/url and click Next; returns the final Create button."""
+    # Fill Website Name
+    name_field = wait_visible(driver, _NAME_SELECTORS, timeout=5)
+    if not name_field:
+        inputs = driver.find_elements(
+            By.CSS_SELECTOR,
+            "form input[type='text'], div[role='dialog'] input[type='text']",
+        )
+        for inp, props in zip(inputs, read_properties(driver, inputs, ["placeholder"])):
+            if "search" not in (props["placeholder"] or "").lower():
+                name_field = inp
+                break
+    if not name_field:
+        raise RuntimeError("Website name field not found")
+
+    name_field.clear()
+    name_field.send_keys(name)
+    timer.mark("fill_name")
+
+    # Fill Website URL
+    url_field = find_visible(driver, _URL_SELECTORS)
+    if not url_field:
+        inputs = driver.find_elements(
+            By.CSS_SELECTOR, "form input, div[role='dialog'] input"
+        )
+        if len(inputs) >= 2:
+            url_field = inputs[1]
+    if not url_field:
+        raise RuntimeError("Website URL field not found")
+
+    url_field.clear()
+    url_field.send_keys(url)
+    timer.mark("fill_url")
+
+    # Click Next and wait for the form to move to its second step
+    next_btn = find_visible(driver, [
+        (By.XPATH, "//div[@role='dialog']//button[contains(normalize-space(.),'Next')]"),
+        (By.XPATH, "//form//button[contains(normalize-space(.),'Next')]"),
+        (By.CSS_SELECTOR, "div[role='dialog'] button[type='submit']"),
+        (By.CSS_SELECTOR, "form button[type='submit']"),
+    ])
+    if not next_btn:
+        raise RuntimeError("Next button not found")
+    next_btn.click()
+
+    # The form has moved to its second step once a submit button no longer
+    # labelled Next shows up; click it once it is enabled
+    final_create = wait_visible(
+        driver, _FINAL_CREATE_SELECTORS, timeout=20, enabled=True, without_text="Next"
+    )
+    timer.mark("click_next")
+    if not final_create:
+        final_create = first_visible(driver, _FINAL_CREATE_SELECTORS, without_text="Next")
+    if not final_create:
+        buttons = driver.find_elements(By.CSS_SELECTOR, "div[role='dialog'] form button")
+        if buttons:
+            final_create = buttons[-1]
+    if not final_create:
+        raise RuntimeError("Final Create button not found in modal")
+    return final_create
+
+
+def _open_install_view(driver, timeout: float = 30):
+    """Click the Install tab, then Basic Install, once each shows up."""
+    if wait_visible(driver, [_INSTALL_TAB], timeout=timeout, enabled=True, click=True):
+        logger.info("Clicked Install tab")
+    else:
+        logger.warning("Install tab not found")
+
+    if wait_visible(driver, [_BASIC_INSTALL], timeout=5, click=True):
+        logger.info("Clicked Basic Install")
+    else:
+        logger.warning("Basic Install button not found")
+
+
+def submit_create_form(
+    driver, name: str, url: str, timings: dict[str, int] | None = None
+) -> tuple[str, str]:
+    """
+    Fill name/url in the open Create modal, create the pixel and read its
+    code from the install view. Returns (pixel_code, pixel_id). Raises
+    PixelNotCreated if the form failed before the pixel was submitted and
+    PixelCodeMissing if it was created but no code could be found.
+    Per-stage durations (ms) are written into `timings` if given.
+    """
+    timer = StageTimer(timings, span_prefix="fill.")
+
+    try:
+        final_create = _fill_form(driver, name, url, timer)
+    except Exception as e:
+        raise PixelNotCreated(str(e) or type(e).__name__) from e
+
+    try:
+        final_create.click()
+    except Exception:
+        driver.execute_script("arguments[0].click();", final_create)
+    timer.mark("click_create")
+
+    _open_install_view(driver)
+    timer.mark("open_install")
+
+    # Extract pixel code as soon as it renders
+    pixel_code = extract_pixel_code(driver, timeout=10)
+    timer.mark("extract_code")
+
+    logger.info(f"Pixel form submitted in {timer.total_ms}ms")
+
+    if not pixel_code:
+        try:
+            page_text = driver.execute_script("return document.body.innerText.substring(0, 500);")
+            logger.error(f"Page text at failure: {page_text}")
+        except Exception:
+            pass
+        raise PixelCodeMissing("Pixel code not found after creation. Got: (empty)")
+
+    return pixel_code, extract_pixel_id(pixel_code)
+
+
+def recover_pixel_code(driver, timeout: float = 10) -> str:
+    """
+    Second attempt at the code of a pixel that was created: reopen the
+    Install tab and Basic Install, then wait for the code or the captured
+    network response. Returns "" if it still does not show.
+    """
+    _open_install_view(driver, timeout=5)
+    return extract_pixel_code(driver, timeout=timeout)
+
+
+_PIXEL_CODE_JS = """
+function found(t, needsSrc) { return t && /<script/i.test(t) && (!needsSrc || /src=/i.test(t)); }
+// [strategy, selectors, read the value first, needs a src=]
+var strategies = [
+    ['dialog', ["div[role='dialog'] pre", "div[role='dialog'] code"], false, false],
+    ['pre_code', ['pre', 'code'], false, true],
+    ['textarea', ['textarea'], true, true],
+];
+for (var i = 0; i < strategies.length; i++) {
+    var s = strategies[i];
+    for (var j = 0; j < s[1].length; j++) {
+        var els = document.querySelectorAll(s[1][j]);
+        for (var k = 0; k < els.length; k++) {
+            var t = ((s[2] && els[k].value) || els[k].innerText || '').trim();
+            if (found(t, s[3])) return [s[0], t];
+        }
+    }
+}
+var all = document.querySelectorAll('pre, code, textarea, [class*="snippet"], [class*="code"]');
+for (var i = 0; i < all.length; i++) {
+    var t = (all[i].textContent || all[i].value || '').trim();
+    if (t && /<script[^>]+src=/i.test(t)) return ['page_scan', t];
+}
+// The captured response holds the whole snippet; keep the tag
+var captured = String((window.__PIXEL_CAPTURED__ && window.__PIXEL_CAPTURED__.pixel) || '');
+var tag = captured.match(/<script[^>]+src=["'][^"']+["'][^>]*>\s*<\/script>/i);
+return tag ? ['network_capture', tag[0]] : null;
+"""
+
+
+def extract_pixel_code(driver, timeout: float = 0) -> str:
+    """
+    Find the pixel <script> tag on the page, waiting up to `timeout` for it
+    to render. Strategies, in order: <pre> or <code> in the dialog, any
+    <pre>/<code>, a <textarea>, a scan of code-like elements, then the
+    network capture; all checked in the page, in one round trip.
+    """
+    with tracing.span("extract_pixel_code") as attrs:
+        try:
+            found = poll_script(driver, _PIXEL_CODE_JS, timeout=timeout, poll=0.1)
+        except WebDriverException:
+            return ""
+        if not found:
+            return ""
+        strategy, text = found
+        attrs["strategy"] = strategy
+        logger.info(f"Extracted pixel code via {strategy}: {text[:100]}")
+        return text
+
+
+def extract_pixel_id(pixel_code: str) -> str:
+    """Extract a pixel identifier from the pixel code snippet.
+
+    Handles multiple URL formats:
+      - .../pixels/<uuid>/p.js          (identitypxl format)
+      - .../idp-analytics-<hex>.min.js  (idpixel format)
+      - Falls back to extracting the src URL as the ID
+    """
+    # Format: /pixels/<uuid>/p.js
+    match = re.search(r"/pixels/([^/]+)/p\.js", pixel_code)
+    if match:
+        return match.group(1)
+    # Format: idp-analytics-<hex>.min.js
+    match = re.search(r"idp-analytics-([a-f0-9]+)\.min\.js", pixel_code)
+    if match:
+        return match.group(1)
+    # Fallback: extract the src URL itself
+    match = re.search(r'src=["\']([^"\']+)["\']', pixel_code)
+    if match:
+        return match.group(1).split("/")[-1].replace(".min.js", "").replace(".js", "")
+    return ""
+
+
+# --- Deleting pixels ---
+
+
+_FIND_ROW_JS = """
+var name = arguments[0];
+var rows = document.querySelectorAll('table tbody tr');
+for (var i = 0; i < rows.length; i++) {
+    var tr = rows[i];
+    if (tr.closest('[role="dialog"]')) continue;
+    var cells = tr.querySelectorAll('td');
+    for (var j = 0; j < cells.length; j++) {
+        if (cells[j].innerText.trim().split('\\n')[0].trim() === name) return tr;
+    }
+}
+return null;
+"""
+
+_ROW_GONE_JS = "return !(function() {%s}).apply(null, arguments);" % _FIND_ROW_JS
+
+_SEARCH_SETTLED_JS = """
+var needle = arguments[0].toLowerCase();
+var rows = Array.from(document.querySelectorAll('table tbody tr')).filter(function(tr) {
+    return tr.offsetParent !== null && !tr.closest('[role="dialog"]');
+});
+return rows.every(function(tr) { return tr.innerText.toLowerCase().indexOf(needle) >= 0; });
+"""
+
+_ROW_ACTION_BUTTON_JS = """
+var row = arguments[0];
+function visible(b) { return b.offsetParent !== null; }
+var preferred = ['action', 'menu', 'more'];
+for (var i = 0; i < preferred.length; i++) {
+    var b = row.querySelector('button[aria-label*="' + preferred[i] + '" i]');
+    if (b && visible(b)) return b;
+}
+var buttons = Array.from(row.querySelectorAll('button')).filter(visible);
+return buttons.length ? buttons[buttons.length - 1] : null;
+"""
+
+_MENU_DELETE_JS = """
+var items = document.querySelectorAll(
+    '[role="menuitem"], [role="menu"] *, [data-radix-popper-content-wrapper] *'
+);
+for (var i = 0; i < items.length; i++) {
+    var el = items[i];
+    if (el.offsetParent !== null && el.innerText && el.innerText.trim() === 'Delete') return el;
+}
+return null;
+"""
+
+_CONFIRM_JS = """
+var dialogs = document.querySelectorAll('[role="dialog"], [role="alertdialog"]');
+var labels = ['delete', 'confirm', 'yes'];
+for (var i = 0; i < dialogs.length; i++) {
+    var buttons = dialogs[i].querySelectorAll('button');
+    for (var j = 0; j < buttons.length; j++) {
+        var text = buttons[j].innerText.trim().toLowerCase();
+        if (buttons[j].offsetParent !== null && labels.indexOf(text) >= 0) return buttons[j];
+    }
+}
+return null;
+"""
+
+_SEARCH_SELECTORS = [
+    (By.CSS_SELECTOR, "input[placeholder*='Search']"),
+    (By.CSS_SELECTOR, "input[placeholder*='search']"),
+    (By.CSS_SELECTOR, "input[type='search']"),
+    (By.CSS_SELECTOR, "input[name='search']"),
+]
+
+
+def delete_result(name: str, status: str, error: str | None = None) -> dict:
+    return {"name": name, "status": status, "error": error}
+
+
+def find_row(driver, name: str):
+    """The pixel table row whose name cell is exactly `name`, or None."""
+    return driver.execute_script(_FIND_ROW_JS, name)
+
+
+def delete_row(driver, row, name: str) -> dict:
+    """Open `row`'s action menu, choose Delete and confirm."""
+    action_btn = driver.execute_script(_ROW_ACTION_BUTTON_JS, row)
+    if not action_btn:
+        return delete_result(name, ERROR, "No action button in row")
+    driver.execute_script("arguments[0].scrollIntoView({block:'center'});", action_btn)
+    action_btn.click()
+
+    delete_option = wait_for_script(driver, _MENU_DELETE_JS)
+    if not delete_option:
+        return delete_result(name, ERROR, "Delete option not found in menu")
+    delete_option.click()
+
+    confirm = wait_for_script(driver, _CONFIRM_JS, timeout=3)
+    if confirm:
+        confirm.click()
+
+    # Deleted once the row is gone
+    if not wait_for_script(driver, _ROW_GONE_JS, name, timeout=10):
+        return delete_result(name, ERROR, "Row still present after confirming delete")
+    return delete_result(name, DELETED)
+
+
+def delete_pixel(driver, name: str) -> dict:
+    """Search for `name` on the current /pixel page and delete it."""
+    search_input = find_visible(driver, _SEARCH_SELECTORS)
+    if search_input:
+        search_input.clear()
+        search_input.send_keys(name)
+        wait_for_script(driver, _SEARCH_SETTLED_JS, name, timeout=3)
+
+    row = find_row(driver, name)
+    if not row:
+        result = delete_result(name, NOT_FOUND)
+    else:
+        result = delete_row(driver, row, name)
+
+    if search_input:
+        try:
+            search_input.clear()
+        except Exception:
+            pass
+    return result
@@ -0,0 +1,362 @@
+"""
+Cached snapshot of the IntentCore workspaces' pixel tables.
+
+For each account a pooled session periodically reads the whole pixel table
+(all pages, in a single async script call), holding a batch admission slot
+like any other browser job, and the snapshot is updated
+incrementally after each create/delete that goes through this service.
+Reads never touch a browser; callers get the snapshot plus its age.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from contextlib import AsyncExitStack, contextmanager
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from .admission import AdmissionRejected
+from .config import settings
+from .pixel_creator import Tier, WarmSession, advance_session
+from .shards import ShardedPool
+from .upstream import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+_DOMAIN_RE = re.compile(r"^(https?://)?([a-z0-9-]+\.)+[a-z]{2,}(/\S*)?$", re.IGNORECASE)
+
+# Reads every page of the pixel table, clicking through pagination and
+# waiting for the first row to change, then calls back with all pages.
+_READ_TABLE_JS = """
+var done = arguments[arguments.length - 1];
+var maxPages = arguments[0];
+function outsideDialog(el) { return !el.closest('[role="dialog"]'); }
+function readPage() {
+    var tables = Array.from(document.querySelectorAll('table')).filter(outsideDialog);
+    if (!tables.length) return null;
+    var table = tables[0];
+    var headers = Array.from(table.querySelectorAll('thead th')).map(function(th) {
+        return th.innerText.trim();
+    });
+    var rows = Array.from(table.querySelectorAll('tbody tr')).map(function(tr) {
+        var link = tr.querySelector('a[href]');
+        var idEl = tr.querySelector('[data-pixel-id], [data-id]');
+        return {
+            cells: Array.from(tr.querySelectorAll('td')).map(function(td) {
+                return td.innerText.trim();
+            }),
+            href: link ? link.getAttribute('href') : '',
+            id: tr.getAttribute('data-id') || tr.getAttribute('data-row-key') ||
+                (idEl ? (idEl.getAttribute('data-pixel-id') || idEl.getAttribute('data-id')) : '')
+        };
+    });
+    return {headers: headers, rows: rows};
+}
+function nextButton() {
+    var buttons = Array.from(document.querySelectorAll('button, a[role="button"]')).filter(outsideDialog);
+    for (var i = 0; i < buttons.length; i++) {
+        var b = buttons[i];
+        var label = (b.getAttribute('aria-label') || b.innerText || '').trim().toLowerCase();
+        if (label === 'next' || label === 'next page' || label === 'go to next page' || label === '›' || label === '>') {
+            if (b.disabled || b.getAttribute('aria-disabled') === 'true') return null;
+            return b;
+        }
+    }
+    return null;
+}
+function signature() {
+    var row = document.querySelector('table tbody tr');
+    return row ? row.innerText : '';
+}
+var pages = [];
+function step() {
+    var page = readPage();
+    if (!page) { done({pages: pages, error: pages.length ? '' : 'table not found'}); return; }
+    pages.push(page);
+    var next = nextButton();
+    if (!next || pages.length >= maxPages) { done({pages: pages, error: ''}); return; }
+    var before = signature();
+    next.click();
+    var waited = 0;
+    (function poll() {
+        if (signature() !== before) { step(); return; }
+        waited += 50;
+        if (waited > 5000) { done({pages: pages, error: 'pagination stalled'}); return; }
+        setTimeout(poll, 50);
+    })();
+}
+step();
+"""
+
+
+# Clicks the table's next/previous pager button `count` times, waiting for
+# the first row to change after each click. Calls back true on success.
+_STEP_PAGES_JS = """
+var done = arguments[arguments.length - 1];
+var direction = arguments[0], count = arguments[1];
+var labels = direction === 'next'
+    ? ['next', 'next page', 'go to next page', '›', '>']
+    : ['previous', 'previous page', 'go to previous page', '‹', '<'];
+function pagerButton() {
+    var buttons = document.querySelectorAll('button, a[role="button"]');
+    for (var i = 0; i < buttons.length; i++) {
+        var b = buttons[i];
+        if (b.closest('[role="dialog"]')) continue;
+        var label = (b.getAttribute('aria-label') || b.innerText || '').trim().toLowerCase();
+        if (labels.indexOf(label) >= 0) {
+            if (b.disabled || b.getAttribute('aria-disabled') === 'true') return null;
+            return b;
+        }
+    }
+    return null;
+}
+function signature() {
+    var row = document.querySelector('table tbody tr');
+    return row ? row.innerText : '';
+}
+var moved = 0;
+function step() {
+    if (moved >= count) { done(true); return; }
+    var b = pagerButton();
+    if (!b) { done(false); return; }
+    var before = signature();
+    b.click();
+    var waited = 0;
+    (function poll() {
+        if (signature() !== before) { moved++; step(); return; }
+        waited += 50;
+        if (waited > 5000) { done(false); return; }
+        setTimeout(poll, 50);
+    })();
+}
+step();
+"""
+
+
+@contextmanager
+def _script_timeout(driver, seconds: float):
+    """Raise the driver's async script timeout for the block, then restore it."""
+    previous = driver.timeouts.script
+    driver.set_script_timeout(seconds)
+    try:
+        yield
+    finally:
+        driver.set_script_timeout(previous)
+
+
+def step_pages(driver, delta: int) -> bool:
+    """Move the pixel table `delta` pages forward (or back if negative)."""
+    if delta == 0:
+        return True
+    with _script_timeout(driver, max(30, abs(delta) * 6)):
+        return bool(
+            driver.execute_async_script(
+                _STEP_PAGES_JS, "next" if delta > 0 else "previous", abs(delta)
+            )
+        )
+
+
+async def checkout_pixel_page(
+    pool: ShardedPool, account: str | None, timeout: float = 60
+) -> WarmSession | None:
+    """A pooled session of `account` sitting on a clean /pixel page, or None."""
+    loop = asyncio.get_event_loop()
+    try:
+        session = await pool.acquire(timeout=timeout, target=Tier.PIXEL_PAGE, account=account)
+    except TimeoutError:
+        return None
+    if session.tier > Tier.PIXEL_PAGE:
+        # Dismiss the Create modal the pool opened by reloading /pixel
+        session.tier = Tier.LOGGED_IN
+        try:
+            await loop.run_in_executor(None, advance_session, session)
+        except UpstreamUnavailable:
+            await pool.release(session)
+            raise
+        except Exception as e:
+            logger.error(f"Session {session.id} could not reload /pixel: {e}")
+            await pool.discard(session)
+            return None
+    return session
+
+
+def _column(headers: list[str], *needles: str) -> int | None:
+    for i, header in enumerate(headers):
+        if any(n in header.lower() for n in needles):
+            return i
+    return None
+
+
+def _parse_pages(pages: list[dict]) -> list[dict]:
+    pixels = []
+    for page_no, page in enumerate(pages):
+        headers = page.get("headers") or []
+        name_col = _column(headers, "name")
+        url_col = _column(headers, "url", "website", "domain")
+        for row_no, row in enumerate(page.get("rows") or []):
+            cells = row.get("cells") or []
+            if not cells:
+                continue
+            name_cell = cells[name_col if name_col is not None and name_col < len(cells) else 0]
+            name = name_cell.split("\n")[0].strip()
+            if not name:
+                continue
+
+            url = ""
+            if url_col is not None and url_col < len(cells):
+                url = cells[url_col].split("\n")[0].strip()
+            else:
+                for line in "\n".join(cells).split("\n"):
+                    line = line.strip()
+                    if line != name and _DOMAIN_RE.match(line):
+                        url = line
+                        break
+
+            pixel_id = row.get("id") or ""
+            if not pixel_id and row.get("href"):
+                pixel_id = row["href"].rstrip("/").split("/")[-1]
+
+            pixels.append({
+                "name": name,
+                "url": url,
+                "pixel_id": pixel_id,
+                "page": page_no,
+                "row": row_no,
+            })
+    return pixels
+
+
+def read_pixel_table(driver, max_pages: int = 50) -> list[dict]:
+    """
+    Read every row of the pixel table on the current /pixel page.
+
+    Returns dicts with name, url, pixel_id and the (page, row) position the
+    row was found at. Raises RuntimeError if the table could not be read.
+    """
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr"))
+        )
+    except Exception:
+        # An empty workspace may render no rows at all
+        logger.info("Pixel table has no rows")
+        return []
+
+    with _script_timeout(driver, max(30, max_pages * 6)):
+        result = driver.execute_async_script(_READ_TABLE_JS, max_pages)
+    if result.get("error") and not result.get("pages"):
+        raise RuntimeError(f"Could not read pixel table: {result['error']}")
+    if result.get("error"):
+        logger.warning(f"Pixel table read incomplete: {result['error']}")
+    return _parse_pages(result["pages"])
+
+
+class PixelInventory:
+    def __init__(
+        self,
+        pool: ShardedPool,
+        refresh_sec: int = settings.inventory_refresh_sec,
+        admit=None,
+    ):
+        self.pool = pool
+        # Slot factory each refresh runs under, so reads queue with other jobs
+        self.admit = admit
+        self.refresh_sec = refresh_sec
+        self._by_account: dict[str, list[dict]] = {}
+        self.refreshed_at: float | None = None
+        self.last_error: str | None = None
+        self.refreshing = False
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pixels(self) -> list[dict]:
+        return [p for pixels in self._by_account.values() for p in pixels]
+
+    @property
+    def age_sec(self) -> float | None:
+        if self.refreshed_at is None:
+            return None
+        return round(time.time() - self.refreshed_at, 1)
+
+    def start(self):
+        if self.refresh_sec > 0 and self._task is None:
+            self._task = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_sec)
+
+    async def refresh(self):
+        """Re-read every account's full table with a pooled session each."""
+        if self.refreshing:
+            return
+        self.refreshing = True
+        try:
+            results = await asyncio.gather(
+                *(self._refresh_account(a.name) for a in self.pool.accounts)
+            )
+            errors = [e for e in results if e]
+            self.last_error = "; ".join(errors) or None
+            if len(errors) < len(results):
+                self.refreshed_at = time.time()
+        finally:
+            self.refreshing = False
+
+    async def _refresh_account(self, account: str) -> str | None:
+        """Refresh one account's rows; returns an error message on failure."""
+        try:
+            async with AsyncExitStack() as slot:
+                if self.admit is not None:
+                    await slot.enter_async_context(self.admit())
+                session = await checkout_pixel_page(self.pool, account, timeout=30)
+                if session is None:
+                    logger.info(f"Inventory refresh of '{account}' skipped: no session available")
+                    return None
+                try:
+                    pixels = await asyncio.get_event_loop().run_in_executor(
+                        None, self._scrape, session
+                    )
+                except Exception as e:
+                    logger.error(f"Inventory refresh of '{account}' failed: {e}")
+                    await self.pool.discard(session)
+                    return f"{account}: {e}"
+                await self.pool.release(session)
+        except (AdmissionRejected, UpstreamUnavailable) as e:
+            logger.info(f"Inventory refresh of '{account}' skipped: {e}")
+            return None
+        for p in pixels:
+            p["account"] = account
+        self._by_account[account] = pixels
+        logger.info(f"Inventory of '{account}' refreshed: {len(pixels)} pixel(s)")
+        return None
+
+    @staticmethod
+    def _scrape(session: WarmSession) -> list[dict]:
+        pixels = read_pixel_table(session.driver)
+        # Pagination moved the page — reload /pixel before this session is
+        # promoted again
+        session.tier = min(session.tier, Tier.LOGGED_IN)
+        return pixels
+
+    def record_created(self, account: str, name: str, url: str, pixel_id: str):
+        pixels = self._by_account.get(account, [])
+        pixels = [p for p in pixels if not pixel_id or p["pixel_id"] != pixel_id]
+        pixels.insert(0, {"name": name, "url": url, "pixel_id": pixel_id, "account": account})
+        self._by_account[account] = pixels
+
+    def record_deleted(self, account: str, name: str):
+        pixels = self._by_account.get(account, [])
+        self._by_account[account] = [p for p in pixels if p["name"] != name]
@@ -0,0 +1,334 @@
+"""
+Durable queue of browser jobs.
+
+Jobs are claimed with a time-limited lease, extended by heartbeats while
+they run, and acked (done), nacked (retried after a delay until
+`max_attempts`, then failed) or failed outright when a retry is unsafe. A
+job whose lease runs out — its worker crashed or was redeployed — is
+claimed again by the next worker marked `reclaimed`: it may already have
+reached IntentCore, so the worker reconciles it instead of running it
+again (see `jobs`). Queued
+and in-flight work survives restarts, and any number of pixel-creator
+instances can consume the same queue.
+
+`JobQueue` defines the interface; `open_queue` picks a backend from a URL.
+The bundled SQLite backend (sqlite:///path/to/jobs.db) is safe across
+processes and containers sharing the file on one host; a networked backend
+can be registered in `_BACKENDS` for queues shared between hosts.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue(ABC):
+    """Interface of a job queue backend. Jobs are plain dicts (see `get`)."""
+
+    @abstractmethod
+    def enqueue(
+        self, kind: str, payload: dict, job_id: str | None = None, max_attempts: int = 3
+    ) -> dict:
+        """
+        Add a job and return it. If `job_id` already exists the existing job
+        is returned instead (a failed one is queued again).
+        """
+
+    @abstractmethod
+    def claim(self, worker: str, lease_sec: float, kinds: list[str] | None = None) -> dict | None:
+        """
+        Lease the next runnable job to `worker`, or None if there is none. A
+        job taken over from an expired lease has `reclaimed` set and must be
+        reconciled, not run again.
+        """
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker: str, lease_sec: float) -> bool:
+        """Extend `worker`'s lease; False if the job is no longer its own."""
+
+    @abstractmethod
+    def ack(self, job_id: str, worker: str, result: dict) -> bool:
+        """Mark the job done with `result`."""
+
+    @abstractmethod
+    def nack(
+        self, job_id: str, worker: str, error: str, retry_delay_sec: float,
+        result: dict | None = None,
+    ) -> bool:
+        """Record a failed attempt; retry after the delay or fail for good."""
+
+    @abstractmethod
+    def fail(self, job_id: str, worker: str, error: str, result: dict | None = None) -> bool:
+        """Fail the job for good, without retrying (e.g. it may have had effects)."""
+
+    @abstractmethod
+    def defer(self, job_id: str, worker: str, delay_sec: float) -> bool:
+        """Give the job back without counting the attempt (it never started)."""
+
+    @abstractmethod
+    def abandon(self, job_id: str, worker: str) -> bool:
+        """
+        Give up the lease of a job interrupted mid-run (e.g. on shutdown), so
+        the next claim takes it over as `reclaimed` for reconciliation.
+        """
+
+    @abstractmethod
+    def ack_late(self, job_id: str, result: dict) -> bool:
+        """
+        Record the successful result of a run that lost its lease, unless
+        the job is done already (its pixel was created after all).
+        """
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict | None:
+        """The job, or None if there is no such job (or it was purged)."""
+
+    @abstractmethod
+    def purge(self, older_than_sec: float) -> int:
+        """Delete finished jobs older than `older_than_sec`; returns how many."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Job counts by status."""
+
+    def close(self):
+        pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id        TEXT PRIMARY KEY,
+    kind          TEXT NOT NULL,
+    payload       TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL,
+    available_at  REAL NOT NULL,
+    lease_owner   TEXT,
+    lease_until   REAL,
+    result        TEXT,
+    error         TEXT,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_runnable ON jobs (status, available_at);
+"""
+
+_COLUMNS = (
+    "job_id, kind, payload, status, attempts, max_attempts, available_at, "
+    "lease_owner, lease_until, result, error, created_at, updated_at"
+)
+
+
+def _row_to_dict(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class SQLiteJobQueue(JobQueue):
+    def __init__(self, path: str):
+        self.path = path
+        # Other processes may hold the write lock briefly; wait for it
+        self._conn = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def _write(self, fn):
+        """Run `fn()` in a write transaction that excludes other processes."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _get_locked(self, job_id: str) -> dict | None:
+        row = self._conn.execute(
+            f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def enqueue(
+        self, kind: str, payload: dict, job_id: str | None = None, max_attempts: int = 3
+    ) -> dict:
+        job_id = job_id or uuid.uuid4().hex
+
+        def insert():
+            now = time.time()
+            existing = self._get_locked(job_id)
+            if existing is not None:
+                if existing["status"] == FAILED:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, "
+                        "error = NULL, result = NULL, updated_at = ? WHERE job_id = ?",
+                        (QUEUED, now, now, job_id),
+                    )
+                    return self._get_locked(job_id)
+                return existing
+            self._conn.execute(
+                f"INSERT INTO jobs ({_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?, NULL, NULL, NULL, NULL, ?, ?)",
+                (job_id, kind, json.dumps(payload), QUEUED, max_attempts, now, now, now),
+            )
+            return self._get_locked(job_id)
+
+        return self._write(insert)
+
+    def claim(self, worker: str, lease_sec: float, kinds: list[str] | None = None) -> dict | None:
+        kind_filter = ""
+        kind_args: tuple = ()
+        if kinds:
+            kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})"
+            kind_args = tuple(kinds)
+
+        def take():
+            now = time.time()
+            row = self._conn.execute(
+                "SELECT job_id, status FROM jobs "
+                "WHERE ((status = ? AND available_at <= ?) OR (status = ? AND lease_until < ?))"
+                f"{kind_filter} ORDER BY available_at LIMIT 1",
+                (QUEUED, now, RUNNING, now, *kind_args),
+            ).fetchone()
+            if row is None:
+                return None
+            reclaimed = row["status"] == RUNNING
+            if reclaimed:
+                # Its worker vanished (or gave up) mid-run; reconciling the
+                # job is not another attempt
+                logger.warning(f"Job {row['job_id']} lease expired, reclaiming")
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_until = ?, "
+                "attempts = attempts + ?, updated_at = ? WHERE job_id = ?",
+                (RUNNING, worker, now + lease_sec, 0 if reclaimed else 1, now, row["job_id"]),
+            )
+            job = self._get_locked(row["job_id"])
+            job["reclaimed"] = reclaimed
+            return job
+
+        return self._write(take)
+
+    def _update_owned(self, job_id: str, worker: str, assignments: str, args: tuple) -> bool:
+        def update():
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? "
+                "WHERE job_id = ? AND status = ? AND lease_owner = ?",
+                (*args, time.time(), job_id, RUNNING, worker),
+            )
+            return cursor.rowcount > 0
+
+        return self._write(update)
+
+    def heartbeat(self, job_id: str, worker: str, lease_sec: float) -> bool:
+        return self._update_owned(
+            job_id, worker, "lease_until = ?", (time.time() + lease_sec,)
+        )
+
+    def ack(self, job_id: str, worker: str, result: dict) -> bool:
+        return self._update_owned(
+            job_id, worker,
+            "status = ?, lease_owner = NULL, result = ?, error = NULL",
+            (DONE, json.dumps(result)),
+        )
+
+    def nack(
+        self, job_id: str, worker: str, error: str, retry_delay_sec: float,
+        result: dict | None = None,
+    ) -> bool:
+        return self._update_owned(
+            job_id, worker,
+            "status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+            "available_at = ?, lease_owner = NULL, error = ?, result = ?",
+            (
+                FAILED, QUEUED, time.time() + retry_delay_sec, error,
+                json.dumps(result) if result is not None else None,
+            ),
+        )
+
+    def fail(self, job_id: str, worker: str, error: str, result: dict | None = None) -> bool:
+        return self._update_owned(
+            job_id, worker,
+            "status = ?, lease_owner = NULL, error = ?, result = ?",
+            (FAILED, error, json.dumps(result) if result is not None else None),
+        )
+
+    def defer(self, job_id: str, worker: str, delay_sec: float) -> bool:
+        return self._update_owned(
+            job_id, worker,
+            "status = ?, attempts = MAX(0, attempts - 1), available_at = ?, lease_owner = NULL",
+            (QUEUED, time.time() + delay_sec),
+        )
+
+    def abandon(self, job_id: str, worker: str) -> bool:
+        return self._update_owned(job_id, worker, "lease_until = ?", (0,))
+
+    def ack_late(self, job_id: str, result: dict) -> bool:
+        def update():
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, result = ?, error = NULL, "
+                "updated_at = ? WHERE job_id = ? AND status != ?",
+                (DONE, json.dumps(result), time.time(), job_id, DONE),
+            )
+            return cursor.rowcount > 0
+
+        return self._write(update)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            return self._get_locked(job_id)
+
+    def purge(self, older_than_sec: float) -> int:
+        def delete():
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - older_than_sec),
+            )
+            return cursor.rowcount
+
+        return self._write(delete)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update({r["status"]: r["n"] for r in rows})
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_BACKENDS = {"sqlite": SQLiteJobQueue}
+
+
+def open_queue(url: str = settings.job_queue_url) -> JobQueue:
+    """Open the queue at `url`, e.g. sqlite:///var/lib/pixel-creator/jobs.db."""
+    scheme, sep, location = url.partition("://")
+    if not sep or scheme not in _BACKENDS:
+        raise ValueError(f"Unsupported JOB_QUEUE_URL: {url}")
+    return _BACKENDS[scheme](location)
@@ -0,0 +1,297 @@
+"""
+Pixel creation through the durable job queue.
+
+API processes `submit_create` a job and wait for (or poll) its outcome;
+`JobRunner` loops in the process that owns the browsers claim jobs, run
+them through the `Engine` (so admission and fair queuing still apply),
+heartbeat their lease while they run and ack or nack the result. Only
+creates that failed before the pixel was submitted are retried; any other
+failure (a timeout, a missing pixel code, an invalid request) fails the job
+for good, since another attempt could create a duplicate. Jobs refused for
+backpressure are handed back without using up an attempt. On
+shutdown the runner first stops claiming (`drain`) so running jobs can
+finish; any still running when it is stopped give up their lease.
+
+A job whose run was interrupted — its lease expired, or it was given up
+on shutdown — may already have created its pixel, so it is never run
+again: the worker that reclaims it looks the pixel up
+(`Engine.find_existing`) and marks the job done if found, or failed for
+the caller to check and resubmit. A run that finds it lost its lease to such a
+worker records only a success, late (`JobQueue.ack_late`).
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import uuid
+
+from .admission import AdmissionRejected
+from .config import settings
+from .jobqueue import DONE, FAILED, JobQueue
+from .models import CreatePixelRequest, CreatePixelResponse, JobResponse
+from .upstream import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+CREATE_PIXEL = "create_pixel"
+
+_PURGE_INTERVAL_SEC = 3600
+
+
+def job_id_for(tenant: str, idempotency_key: str | None) -> str:
+    """Stable id for keyed requests, so a retried submit finds the same job."""
+    if not idempotency_key:
+        return uuid.uuid4().hex
+    return hashlib.sha256(f"{tenant}\n{idempotency_key}".encode()).hexdigest()[:32]
+
+
+def submit_create(
+    queue: JobQueue,
+    req: CreatePixelRequest,
+    tenant: str,
+    priority: str,
+    idempotency_key: str | None = None,
+    profile: bool = False,
+) -> dict:
+    """Enqueue a create (or return the existing job for the same key)."""
+    key = req.idempotency_key or idempotency_key
+    return queue.enqueue(
+        CREATE_PIXEL,
+        {
+            "request": req.model_dump(mode="json"),
+            "tenant": tenant,
+            "priority": priority,
+            "idempotency_key": key,
+            "profile": profile,
+        },
+        job_id=job_id_for(tenant, key),
+        max_attempts=settings.job_max_attempts,
+    )
+
+
+async def wait_for_job(queue: JobQueue, job_id: str, timeout_sec: float) -> dict | None:
+    """
+    Poll until the job is done or failed, or `timeout_sec` has passed. None
+    if the job no longer exists (purged meanwhile).
+    """
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout_sec
+    delay = 0.1
+    while True:
+        job = await loop.run_in_executor(None, queue.get, job_id)
+        if job is None or job["status"] in (DONE, FAILED) or loop.time() >= deadline:
+            return job
+        await asyncio.sleep(min(delay, max(0.0, deadline - loop.time())))
+        delay = min(delay * 2, 1.0)
+
+
+def job_response(job: dict) -> JobResponse:
+    result = job["result"]
+    return JobResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        attempts=job["attempts"],
+        max_attempts=job["max_attempts"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+        result=CreatePixelResponse(**result, job_id=job["job_id"]) if result else None,
+        error=job["error"],
+    )
+
+
+class JobRunner:
+    def __init__(
+        self,
+        queue: JobQueue,
+        engine,
+        workers: int = settings.job_workers or settings.max_inflight_jobs,
+        lease_sec: float = settings.job_lease_sec,
+        retry_delay_sec: float = settings.job_retry_delay_sec,
+        retention_sec: float = settings.job_retention_sec,
+        poll_sec: float = 1.0,
+    ):
+        self.queue = queue
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.lease_sec = lease_sec
+        self.retry_delay_sec = retry_delay_sec
+        self.retention_sec = retention_sec
+        self.poll_sec = poll_sec
+        self.instance = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: list[asyncio.Task] = []
+        self.draining = False
+        self.completed = 0
+        self.failed = 0
+        self.deferred = 0
+
+    def start(self):
+        self._tasks = [
+            asyncio.ensure_future(self._loop(f"{self.instance}:{n}"))
+            for n in range(self.workers)
+        ]
+        self._tasks.append(asyncio.ensure_future(self._purge_loop()))
+        logger.info(f"Job runner started with {self.workers} worker(s)")
+
+    def drain(self):
+        """Stop claiming jobs; those already claimed run to completion."""
+        self.draining = True
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, worker: str):
+        loop = asyncio.get_event_loop()
+        while not self.draining:
+            try:
+                job = await loop.run_in_executor(
+                    None, self.queue.claim, worker, self.lease_sec, [CREATE_PIXEL]
+                )
+            except Exception as e:
+                logger.error(f"Job queue claim failed: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_sec)
+                continue
+            if self.draining:
+                # Claimed just as draining began; give it straight back
+                if job.get("reclaimed"):
+                    await loop.run_in_executor(None, self.queue.abandon, job["job_id"], worker)
+                else:
+                    await loop.run_in_executor(None, self.queue.defer, job["job_id"], worker, 0)
+                return
+            if job.get("reclaimed"):
+                await self._reconcile(job, worker)
+            else:
+                await self._run(job, worker)
+
+    async def _heartbeat(self, job_id: str, worker: str) -> bool:
+        """Extend the lease until cancelled; returns False if it was lost."""
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.lease_sec / 3)
+            try:
+                owned = await loop.run_in_executor(
+                    None, self.queue.heartbeat, job_id, worker, self.lease_sec
+                )
+            except Exception as e:
+                logger.warning(f"Job {job_id} heartbeat failed: {e}")
+                continue
+            if not owned:
+                logger.error(
+                    f"Job {job_id} lease lost to another worker, which will reconcile it"
+                )
+                return False
+
+    async def _run(self, job: dict, worker: str):
+        loop = asyncio.get_event_loop()
+        job_id = job["job_id"]
+        payload = job["payload"]
+        logger.info(f"Job {job_id} claimed by {worker} (attempt {job['attempts']})")
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id, worker))
+        try:
+            response = await self.engine.create(
+                CreatePixelRequest(**payload["request"]),
+                payload["tenant"],
+                payload["priority"],
+                payload.get("idempotency_key"),
+                payload.get("profile", False),
+            )
+        except asyncio.CancelledError:
+            # Shutting down while the browser thread may still be submitting:
+            # give up the lease so the job is reconciled, not run again
+            await loop.run_in_executor(None, self.queue.abandon, job_id, worker)
+            raise
+        except (AdmissionRejected, UpstreamUnavailable) as e:
+            self.deferred += 1
+            logger.info(f"Job {job_id} deferred {e.retry_after}s: {e}")
+            await loop.run_in_executor(
+                None, self.queue.defer, job_id, worker, e.retry_after
+            )
+            return
+        except Exception as e:
+            response = CreatePixelResponse(success=False, error=str(e) or type(e).__name__)
+        finally:
+            heartbeat.cancel()
+
+        result = response.model_dump(exclude={"job_id"})
+        if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result() is False:
+            # Another worker owns the job now and reconciles it
+            if response.success:
+                self.completed += 1
+                await loop.run_in_executor(None, self.queue.ack_late, job_id, result)
+            logger.error(
+                f"Job {job_id} finished after losing its lease "
+                f"(success={response.success}, pixel_id={response.pixel_id})"
+            )
+            return
+        if response.success:
+            self.completed += 1
+            await loop.run_in_executor(None, self.queue.ack, job_id, worker, result)
+            logger.info(f"Job {job_id} done")
+        elif not response.retryable:
+            # The pixel may have been created (or the request can never
+            # succeed); another attempt could duplicate it upstream
+            self.failed += 1
+            await loop.run_in_executor(
+                None, self.queue.fail, job_id, worker, response.error or "failed", result
+            )
+            logger.warning(f"Job {job_id} failed, not retrying: {response.error}")
+        else:
+            self.failed += 1
+            await loop.run_in_executor(
+                None, self.queue.nack, job_id, worker, response.error or "failed",
+                self.retry_delay_sec, result,
+            )
+            logger.warning(f"Job {job_id} attempt {job['attempts']} failed: {response.error}")
+
+    async def _reconcile(self, job: dict, worker: str):
+        """Settle a job whose run was interrupted, without running it again."""
+        loop = asyncio.get_event_loop()
+        job_id = job["job_id"]
+        try:
+            response = await self.engine.find_existing(
+                CreatePixelRequest(**job["payload"]["request"])
+            )
+        except Exception as e:
+            response = CreatePixelResponse(success=False, error=str(e) or type(e).__name__)
+        if response is None:
+            response = CreatePixelResponse(
+                success=False,
+                error="Interrupted while creating the pixel and no record of it was found; "
+                "check IntentCore before resubmitting",
+            )
+        result = response.model_dump(exclude={"job_id"})
+        if response.success:
+            self.completed += 1
+            await loop.run_in_executor(None, self.queue.ack, job_id, worker, result)
+            logger.info(f"Job {job_id} reconciled: pixel {response.pixel_id} was created")
+        else:
+            self.failed += 1
+            await loop.run_in_executor(None, self.queue.fail, job_id, worker, response.error, result)
+            logger.warning(f"Job {job_id} reconciled as failed: {response.error}")
+
+    async def _purge_loop(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                purged = await loop.run_in_executor(None, self.queue.purge, self.retention_sec)
+                if purged:
+                    logger.info(f"Purged {purged} finished job(s)")
+            except Exception as e:
+                logger.warning(f"Job purge failed: {e}")
+            await asyncio.sleep(_PURGE_INTERVAL_SEC)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "draining": self.draining,
+            "completed": self.completed,
+            "failed_attempts": self.failed,
+            "deferred": self.deferred,
+            "queue": self.queue.stats(),
+        }
@@ -0,0 +1,143 @@
+"""
+Short-lived session leases.
+
+The web app reserves a session as soon as the Create Pixel dialog opens,
+so warm-up (if the pool was empty) overlaps with the user typing. The
+create call then redeems the lease. Leases that are never redeemed expire
+and their session goes back into the pool.
+
+A redeemed lease already holds its session, so that create runs outside
+admission control and does not count against MAX_INFLIGHT_JOBS. Instead
+leases are capped at LEASE_MAX_POOL_SHARE of the pool, an owner holds at
+most one (reserving again replaces it), and the dialog releases its lease
+when it closes without creating.
+"""
+
+import asyncio
+import logging
+import math
+import time
+import uuid
+
+from .admission import AdmissionRejected
+from .config import settings
+from .pixel_creator import WarmSession
+from .shards import ShardedPool
+
+logger = logging.getLogger(__name__)
+
+
+class Lease:
+    def __init__(self, owner: str | None, ttl_sec: float, task: asyncio.Future):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.expires_at = time.time() + ttl_sec
+        self.task = task  # resolves to the pinned WarmSession
+        self.expiry_handle: asyncio.TimerHandle | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.task.done() and not self.task.cancelled() and not self.task.exception()
+
+
+class LeaseManager:
+    def __init__(
+        self,
+        pool: ShardedPool,
+        ttl_sec: float = settings.lease_ttl_sec,
+        max_pool_share: float = settings.lease_max_pool_share,
+    ):
+        self.pool = pool
+        self.ttl_sec = ttl_sec
+        self.max_pool_share = max_pool_share
+        self._leases: dict[str, Lease] = {}
+
+    @property
+    def active_count(self) -> int:
+        return len(self._leases)
+
+    @property
+    def max_active(self) -> int:
+        return int(self.pool.pool_size * self.max_pool_share)
+
+    async def reserve(self, owner: str | None = None, account: str | None = None) -> Lease:
+        """
+        Pin a warm session (or start warming one) for `owner`, from
+        `account` or the least-loaded account. Replaces the owner's previous
+        lease; raises AdmissionRejected when the lease cap is reached.
+        """
+        if owner:
+            for previous in [l for l in self._leases.values() if l.owner == owner]:
+                self.release(previous.id, owner)
+        if len(self._leases) >= self.max_active:
+            soonest = min((l.expires_at for l in self._leases.values()), default=time.time())
+            raise AdmissionRejected(
+                "Too many sessions reserved", max(1, math.ceil(soonest - time.time()))
+            )
+        task = asyncio.ensure_future(
+            self.pool.acquire(timeout=self.ttl_sec, account=account)
+        )
+        lease = Lease(owner, self.ttl_sec, task)
+        lease.expiry_handle = asyncio.get_event_loop().call_later(
+            self.ttl_sec, self._expire, lease.id
+        )
+        self._leases[lease.id] = lease
+        # Let acquire() take an idle ready session right away if there is one
+        await asyncio.sleep(0)
+        logger.info(f"Lease {lease.id[:8]} reserved (ready={lease.ready})")
+        return lease
+
+    async def redeem(self, lease_id: str, owner: str | None = None) -> WarmSession | None:
+        """
+        Return the session pinned by `lease_id`, waiting for it to finish
+        warming if necessary. A lease reserved for an owner is only redeemed
+        by that owner. Returns None for unknown, expired, foreign or failed
+        leases so the caller can fall back to the pool.
+        """
+        lease = self._leases.get(lease_id)
+        if lease is None or (lease.owner and lease.owner != owner):
+            return None
+        del self._leases[lease_id]
+        lease.expiry_handle.cancel()
+        try:
+            return await lease.task
+        except Exception as e:
+            logger.warning(f"Lease {lease_id[:8]} could not provide a session: {e}")
+            return None
+
+    def release(self, lease_id: str, owner: str | None = None) -> bool:
+        """
+        Give up an unredeemed lease (the dialog closed); its session goes back
+        to the pool once acquired. False if the lease is unknown or foreign.
+        """
+        lease = self._leases.get(lease_id)
+        if lease is None or (lease.owner and lease.owner != owner):
+            return False
+        del self._leases[lease_id]
+        lease.expiry_handle.cancel()
+        logger.info(f"Lease {lease_id[:8]} released, returning session to pool")
+        lease.task.add_done_callback(self._return_to_pool)
+        return True
+
+    def _expire(self, lease_id: str):
+        lease = self._leases.pop(lease_id, None)
+        if lease is None:
+            return
+        logger.info(f"Lease {lease_id[:8]} expired unused, returning session to pool")
+        lease.task.add_done_callback(self._return_to_pool)
+
+    def _return_to_pool(self, task: asyncio.Future):
+        if task.cancelled() or task.exception():
+            return
+        asyncio.ensure_future(self.pool.release(task.result()))
+
+    def shutdown(self):
+        """
+        Drop every unredeemed lease. Sessions already acquired for them are
+        in use in the pool, which closes them with the rest.
+        """
+        for lease in self._leases.values():
+            lease.expiry_handle.cancel()
+            if not lease.task.done():
+                lease.task.cancel()
+        self._leases.clear()
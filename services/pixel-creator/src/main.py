@@ -2,37 +2,104 @@
 FastAPI service for creating IntentCore pixels via Selenium.
 
 Pre-warms browser sessions so user-facing latency is ~3-5s instead of 13s.
+
+By default the browsers run inside this process. With BROKER_URL set they
+live in a separate broker process (see `broker`) shared by every API
+worker, so the API can run with `--workers N` without one Chrome pool per
+worker. With JOB_QUEUE_URL set, creates are recorded in a durable job
+queue (see `jobs`) that survives restarts and can be shared by several
+instances.
+
+The server binds at once: the browser engine (and Selenium with it) is
+imported and warmed up in the background. /health/live answers as soon as
+the process is up, /health/ready once the first session is warm; browser
+endpoints answer 503 with Retry-After until the engine exists.
 """
 
 from __future__ import annotations
 
+import asyncio
+import base64
+import hashlib
+import importlib
 import logging
 from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
 
-from fastapi import FastAPI, Header, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from .admission import BATCH, INTERACTIVE, AdmissionRejected
+from .broker import BrokerClient, BrokerUnavailable
 from .config import settings
-from .models import CreatePixelRequest, CreatePixelResponse
-from .pixel_creator import fill_and_create, warm_session
-from .session_pool import SessionPool
+from .jobqueue import DONE, FAILED, open_queue
+from .jobs import job_response, submit_create, wait_for_job
+from .models import (
+    CreatePixelRequest,
+    CreatePixelResponse,
+    DeletePixelsRequest,
+    DeletePixelsResponse,
+    InventoryResponse,
+    JobResponse,
+    PixelListResponse,
+    PixelRecord,
+    PoolStateResponse,
+    PoolUpdateRequest,
+    ProfilingRequest,
+    RecycleSessionsRequest,
+    RecycleSessionsResponse,
+    ReleaseSessionResponse,
+    ReserveSessionRequest,
+    ReserveSessionResponse,
+)
+from .store import PixelStore
+from .upstream import UpstreamUnavailable
+
+if TYPE_CHECKING:
+    from .engine import Engine
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
-pool = SessionPool()
+# Reads go straight to the SQLite store, which the broker writes to
+store = PixelStore()
+# The in-process engine is built by `_boot_engine` once its imports load
+engine: Engine | BrokerClient | None = BrokerClient() if settings.broker_url else None
+queue = open_queue() if settings.job_queue_url else None
+
+
+async def _boot_engine():
+    """Import the engine (Selenium and all) off the event loop and start it."""
+    global engine
+    try:
+        module = await asyncio.get_event_loop().run_in_executor(
+            None, importlib.import_module, f"{__package__}.engine"
+        )
+        engine = module.Engine(store)
+        await engine.start()
+    except Exception:
+        logger.exception("Failed to start the browser engine")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("Starting session pool...")
-    await pool.start()
-    logger.info(f"Pool ready with {pool.warm_count} session(s)")
+    boot = None
+    if engine is None:
+        boot = asyncio.ensure_future(_boot_engine())
+    else:
+        await engine.start()
     yield
-    logger.info("Shutting down session pool...")
-    await pool.shutdown()
+    if boot is not None and not boot.done():
+        boot.cancel()
+        await asyncio.gather(boot, return_exceptions=True)
+    if engine is not None:
+        await engine.stop()
+    if queue is not None:
+        queue.close()
+    store.close()
 
 
 app = FastAPI(title="Pixel Creator", lifespan=lifespan)
@@ -45,75 +112,363 @@ app.add_middleware(
         "https://arkdata-hub.firebaseapp.com",
         "http://localhost:5173",
     ],
-    allow_methods=["GET", "POST"],
+    allow_methods=["GET", "POST", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 
-def _verify_api_key(x_api_key: str | None):
+def _verify_api_key(x_api_key: str | None, x_tenant_id: str | None = None) -> str:
+    """Authenticate the caller and return its tenant."""
+    if x_api_key and x_api_key in settings.tenant_api_keys:
+        return settings.tenant_api_keys[x_api_key]
     if not x_api_key or x_api_key != settings.api_key:
         raise HTTPException(status_code=401, detail="Invalid API key")
+    return (x_tenant_id or "").strip()[:64] or "default"
+
+
+def _verify_admin_key(x_api_key: str | None):
+    """Pool administration is reserved for the service's own API key."""
+    if not x_api_key or x_api_key != settings.api_key:
+        raise HTTPException(status_code=403, detail="Admin access requires the service API key")
+
+
+def _wants_profile(x_api_key: str | None, x_profile: str | None) -> bool:
+    """`X-Profile: 1` profiles the request, for the service's own key only."""
+    return (
+        (x_profile or "").strip().lower() in ("1", "true")
+        and bool(x_api_key)
+        and x_api_key == settings.api_key
+    )
+
+
+def _too_busy(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"{e} — try again in {e.retry_after}s",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _upstream_down(e: UpstreamUnavailable) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"{e} — try again in {e.retry_after}s",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _job_error(e: Exception) -> HTTPException:
+    if isinstance(e, AdmissionRejected):
+        return _too_busy(e)
+    if isinstance(e, UpstreamUnavailable):
+        return _upstream_down(e)
+    if isinstance(e, BrokerUnavailable):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return HTTPException(status_code=422, detail=str(e))
+
+
+# Errors a browser job reports to the caller (ValueError = unknown workspace)
+_JOB_ERRORS = (AdmissionRejected, UpstreamUnavailable, BrokerUnavailable, ValueError)
+
+
+def _engine() -> Engine | BrokerClient:
+    if engine is None:
+        raise HTTPException(
+            status_code=503, detail="Service is starting", headers={"Retry-After": "5"}
+        )
+    return engine
 
 
 @app.get("/health")
 async def health():
-    return {
-        "status": "ok",
-        "warm_sessions": pool.warm_count,
-        "is_warming": pool.is_warming,
-    }
+    if engine is None:
+        return {"status": "starting"}
+    return await engine.health()
+
+
+@app.get("/health/live")
+async def health_live():
+    """The process is up and serving; says nothing about the browsers."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """200 once a warm session can take a create, 503 until then."""
+    readiness = await engine.readiness() if engine is not None else {"ready": False}
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+
+@app.post("/api/sessions/reserve", response_model=ReserveSessionResponse)
+async def reserve_session(
+    req: ReserveSessionRequest | None = None,
+    x_api_key: str | None = Header(default=None),
+):
+    """Called when the pixel dialog opens so a session is warm by submit time."""
+    _verify_api_key(x_api_key)
+    try:
+        return await _engine().reserve(
+            owner=req.user_id if req else None,
+            workspace=req.workspace if req else None,
+        )
+    except _JOB_ERRORS as e:
+        raise _job_error(e)
+
+
+@app.delete("/api/sessions/{lease_id}", response_model=ReleaseSessionResponse)
+async def release_session(
+    lease_id: str,
+    user_id: str | None = None,
+    x_api_key: str | None = Header(default=None),
+):
+    """Called when the pixel dialog closes without creating, to free its session."""
+    _verify_api_key(x_api_key)
+    try:
+        return await _engine().release(lease_id, user_id)
+    except _JOB_ERRORS as e:
+        raise _job_error(e)
 
 
 @app.post("/api/create-pixel", response_model=CreatePixelResponse)
 async def create_pixel(
     req: CreatePixelRequest,
     x_api_key: str | None = Header(default=None),
+    x_tenant_id: str | None = Header(default=None),
+    x_job_priority: str | None = Header(default=None),
+    x_profile: str | None = Header(default=None),
+    idempotency_key: str | None = Header(default=None),
 ):
-    _verify_api_key(x_api_key)
+    tenant = _verify_api_key(x_api_key, x_tenant_id)
+    # Scripted/bulk callers mark themselves as batch so single creates from
+    # the web app are scheduled first
+    priority = BATCH if (x_job_priority or "").strip().lower() == BATCH else INTERACTIVE
+    profile = _wants_profile(x_api_key, x_profile)
+    if queue is not None:
+        return await _create_via_queue(req, tenant, priority, idempotency_key, profile)
+    try:
+        return await _engine().create(req, tenant, priority, idempotency_key, profile)
+    except _JOB_ERRORS as e:
+        raise _job_error(e)
+
+
+async def _create_via_queue(
+    req: CreatePixelRequest,
+    tenant: str,
+    priority: str,
+    idempotency_key: str | None,
+    profile: bool = False,
+):
+    """Enqueue the create and wait for it; 202 with the job id if it runs long."""
+    job = await asyncio.get_event_loop().run_in_executor(
+        None, submit_create, queue, req, tenant, priority, idempotency_key, profile
+    )
+    job = await wait_for_job(queue, job["job_id"], settings.job_wait_sec)
+    if job is None:
+        # Purged while we waited
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in (DONE, FAILED) and job["result"]:
+        return CreatePixelResponse(**job["result"], job_id=job["job_id"])
+    if job["status"] == FAILED:
+        return CreatePixelResponse(success=False, error=job["error"], job_id=job["job_id"])
+    pending = CreatePixelResponse(
+        success=False,
+        error=f"Still in progress — poll /api/jobs/{job['job_id']}",
+        job_id=job["job_id"],
+    )
+    return JSONResponse(status_code=202, content=pending.model_dump())
 
-    import asyncio
 
-    # Try to get a warm session; if none available, create one on the spot
-    session = None
+def _require_queue():
+    if queue is None:
+        raise HTTPException(status_code=404, detail="Job queue is not enabled")
+
+
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(
+    req: CreatePixelRequest,
+    x_api_key: str | None = Header(default=None),
+    x_tenant_id: str | None = Header(default=None),
+    x_job_priority: str | None = Header(default=None),
+    x_profile: str | None = Header(default=None),
+    idempotency_key: str | None = Header(default=None),
+):
+    """Queue a create and return immediately; poll GET /api/jobs/{job_id}."""
+    tenant = _verify_api_key(x_api_key, x_tenant_id)
+    _require_queue()
+    priority = BATCH if (x_job_priority or "").strip().lower() == BATCH else INTERACTIVE
+    profile = _wants_profile(x_api_key, x_profile)
+    job = await asyncio.get_event_loop().run_in_executor(
+        None, submit_create, queue, req, tenant, priority, idempotency_key, profile
+    )
+    return job_response(job)
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    x_api_key: str | None = Header(default=None),
+    x_tenant_id: str | None = Header(default=None),
+):
+    tenant = _verify_api_key(x_api_key, x_tenant_id)
+    _require_queue()
+    job = await asyncio.get_event_loop().run_in_executor(None, queue.get, job_id)
+    if job is None or job["payload"]["tenant"] != tenant:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+
+@app.get("/admin/pool", response_model=PoolStateResponse)
+async def pool_state(workspace: str | None = None, x_api_key: str | None = Header(default=None)):
+    """Every session with its tier, age, use count and RSS, per account."""
+    _verify_admin_key(x_api_key)
     try:
-        session = await pool.acquire(timeout=5)
-        logger.info("Using pre-warmed session")
-    except TimeoutError:
-        logger.info("No warm session available, creating one on the fly...")
-        try:
-            session = await asyncio.wait_for(
-                asyncio.get_event_loop().run_in_executor(None, warm_session),
-                timeout=60,
-            )
-        except Exception as e:
-            logger.error(f"Failed to create on-demand session: {e}")
-            return CreatePixelResponse(
-                success=False,
-                error="Failed to start browser session. Please try again.",
-            )
+        return await _engine().pool_state(workspace)
+    except _JOB_ERRORS as e:
+        raise _job_error(e)
+
 
+@app.post("/admin/pool", response_model=PoolStateResponse)
+async def update_pool(req: PoolUpdateRequest, x_api_key: str | None = Header(default=None)):
+    """Resize, change max age, or pause/resume warming without a restart."""
+    _verify_admin_key(x_api_key)
     try:
-        pixel_code, pixel_id = await asyncio.wait_for(
-            asyncio.get_event_loop().run_in_executor(
-                None, fill_and_create, session, req.name, req.url
-            ),
-            timeout=90,
-        )
-        return CreatePixelResponse(
-            success=True,
-            pixel_code=pixel_code,
-            pixel_id=pixel_id,
-        )
-    except asyncio.TimeoutError:
-        logger.error("Pixel creation timed out after 90s")
-        session.close()
-        return CreatePixelResponse(
-            success=False,
-            error="Pixel creation timed out. Please try again.",
-        )
-    except Exception as e:
-        logger.error(f"Pixel creation failed: {e}")
-        return CreatePixelResponse(
-            success=False,
-            error=str(e),
-        )
+        return await _engine().update_pool(req)
+    except _JOB_ERRORS as e:
+        raise _job_error(e)
+
+
+@app.post("/admin/sessions/recycle", response_model=RecycleSessionsResponse)
+async def recycle_sessions(
+    req: RecycleSessionsRequest, x_api_key: str | None = Header(default=None)
+):
+    """Replace one or all sessions (or drain, with `drain`); in-flight work finishes first."""
+    _verify_admin_key(x_api_key)
+    try:
+        return await _engine().recycle_sessions(req)
+    except _JOB_ERRORS as e:
+        raise _job_error(e)
+
+
+@app.get("/admin/profiling")
+async def profiling_state(x_api_key: str | None = Header(default=None)):
+    """Profiling sample rate and how many requests were profiled."""
+    _verify_admin_key(x_api_key)
+    try:
+        return await _engine().profiling()
+    except BrokerUnavailable as e:
+        raise _job_error(e)
+
+
+@app.post("/admin/profiling")
+async def set_profiling(req: ProfilingRequest, x_api_key: str | None = Header(default=None)):
+    """Change the share of creates profiled (reports land in /admin/traces)."""
+    _verify_admin_key(x_api_key)
+    try:
+        return await _engine().profiling(req.sample_rate)
+    except BrokerUnavailable as e:
+        raise _job_error(e)
+
+
+@app.get("/admin/traces")
+async def recorded_traces(x_api_key: str | None = Header(default=None)):
+    """Flight recorder: the last failed or slow traces, newest first."""
+    _verify_admin_key(x_api_key)
+    try:
+        return await _engine().traces()
+    except BrokerUnavailable as e:
+        raise _job_error(e)
+
+
+async def _recorded_trace(trace_id: str) -> dict:
+    try:
+        trace = await _engine().trace(trace_id)
+    except BrokerUnavailable as e:
+        raise _job_error(e)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not recorded")
+    return trace
+
+
+@app.get("/admin/traces/{trace_id}")
+async def recorded_trace(trace_id: str, x_api_key: str | None = Header(default=None)):
+    """Spans, DOM snippet and page URL of one recorded trace."""
+    _verify_admin_key(x_api_key)
+    trace = await _recorded_trace(trace_id)
+    artifacts = trace["artifacts"]
+    artifacts["has_screenshot"] = bool(artifacts.pop("screenshot_png", None))
+    return trace
+
+
+@app.get("/admin/traces/{trace_id}/screenshot.png")
+async def recorded_screenshot(trace_id: str, x_api_key: str | None = Header(default=None)):
+    _verify_admin_key(x_api_key)
+    trace = await _recorded_trace(trace_id)
+    png = trace["artifacts"].get("screenshot_png")
+    if not png:
+        raise HTTPException(status_code=404, detail="No screenshot for this trace")
+    return Response(content=base64.b64decode(png), media_type="image/png")
+
+
+def _etag_response(payload: PixelRecord | PixelListResponse, if_none_match: str | None):
+    """JSON response with a content-hash ETag; 304 if the client's copy matches."""
+    body = payload.model_dump_json()
+    etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in [t.strip() for t in if_none_match.split(",")]
+    ):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@app.post("/api/pixels/delete", response_model=DeletePixelsResponse)
+async def delete_pixels_endpoint(
+    req: DeletePixelsRequest,
+    x_api_key: str | None = Header(default=None),
+    x_tenant_id: str | None = Header(default=None),
+):
+    tenant = _verify_api_key(x_api_key, x_tenant_id)
+    try:
+        return await _engine().delete(req, tenant)
+    except _JOB_ERRORS as e:
+        raise _job_error(e)
+
+
+@app.get("/api/pixels/inventory", response_model=InventoryResponse)
+async def pixel_inventory(x_api_key: str | None = Header(default=None)):
+    """Snapshot of every workspace's pixel table; never touches a browser."""
+    _verify_api_key(x_api_key)
+    try:
+        return await _engine().pixel_inventory()
+    except BrokerUnavailable as e:
+        raise _job_error(e)
+
+
+@app.get("/api/pixels/{pixel_id}", response_model=PixelRecord)
+async def get_pixel(
+    pixel_id: str,
+    x_api_key: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+):
+    _verify_api_key(x_api_key)
+    record = store.get(pixel_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Pixel not found")
+    return _etag_response(PixelRecord(**record), if_none_match)
+
+
+@app.get("/api/pixels", response_model=PixelListResponse)
+async def find_pixels(
+    url: str,
+    x_api_key: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+):
+    _verify_api_key(x_api_key)
+    try:
+        records = store.find_by_url(url)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return _etag_response(
+        PixelListResponse(pixels=[PixelRecord(**r) for r in records]), if_none_match
+    )
@@ -0,0 +1,241 @@
+"""
+Memory accounting for pooled Chrome sessions (Linux).
+
+Each session's memory is the summed RSS of every process whose command
+line carries its `--user-data-dir`, plus their descendants, read from
+/proc in one scan for all sessions. The node's budget is the cgroup memory
+limit (v2 or v1), falling back to the host's MemTotal, and its usage is
+the cgroup working set (usage minus inactive page cache), the figure the
+OOM killer acts on.
+
+`MemoryMonitor` turns that into decisions: how many sessions fit, whether
+there is headroom to warm one more, and which sessions have grown past
+`session_max_rss_mb` and should be recycled. Without /proc (macOS, local
+development) every check passes and sizes are reported as unknown.
+"""
+
+import logging
+import os
+import weakref
+from collections import defaultdict
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+# Larger than any real limit: cgroups report "unlimited" as ~2^63
+_UNLIMITED = 1 << 60
+
+_CGROUP_V2 = "/sys/fs/cgroup"
+_CGROUP_V1 = "/sys/fs/cgroup/memory"
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _read_int(path: str) -> int | None:
+    value = _read(path)
+    if value is None or not value.isdigit():
+        return None
+    return int(value)
+
+
+def _stat_value(path: str, key: str) -> int:
+    for line in (_read(path) or "").splitlines():
+        name, _, value = line.partition(" ")
+        if name == key and value.isdigit():
+            return int(value)
+    return 0
+
+
+def _meminfo() -> dict[str, int]:
+    info = {}
+    for line in (_read("/proc/meminfo") or "").splitlines():
+        name, _, rest = line.partition(":")
+        parts = rest.split()
+        if parts and parts[0].isdigit():
+            info[name] = int(parts[0]) * 1024
+    return info
+
+
+def memory_limit() -> int | None:
+    """Bytes this container may use: cgroup limit, else host RAM."""
+    for path in (f"{_CGROUP_V2}/memory.max", f"{_CGROUP_V1}/memory.limit_in_bytes"):
+        limit = _read_int(path)
+        if limit is not None and limit < _UNLIMITED:
+            return limit
+    return _meminfo().get("MemTotal")
+
+
+def memory_usage() -> int | None:
+    """Working-set bytes in use by this container (or host)."""
+    current = _read_int(f"{_CGROUP_V2}/memory.current")
+    if current is not None and _read_int(f"{_CGROUP_V2}/memory.max") is not None:
+        return current - _stat_value(f"{_CGROUP_V2}/memory.stat", "inactive_file")
+    usage = _read_int(f"{_CGROUP_V1}/memory.usage_in_bytes")
+    limit = _read_int(f"{_CGROUP_V1}/memory.limit_in_bytes")
+    if usage is not None and limit is not None and limit < _UNLIMITED:
+        return usage - _stat_value(f"{_CGROUP_V1}/memory.stat", "total_inactive_file")
+    info = _meminfo()
+    if "MemTotal" in info and "MemAvailable" in info:
+        return info["MemTotal"] - info["MemAvailable"]
+    return None
+
+
+def _scan_processes() -> dict[int, tuple[int, str, int]]:
+    """pid -> (parent pid, command line, RSS bytes) for every process."""
+    procs = {}
+    try:
+        entries = os.listdir("/proc")
+        page_size = os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return procs
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ").decode(errors="replace")
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            with open(f"/proc/{entry}/statm") as f:
+                rss_pages = int(f.read().split()[1])
+            # The command name may contain spaces/parens; fields follow the last ")"
+            ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue  # exited mid-scan or not ours to read
+        procs[int(entry)] = (ppid, cmdline, rss_pages * page_size)
+    return procs
+
+
+def session_rss(user_data_dirs: list[str]) -> dict[str, int]:
+    """Process-tree RSS in bytes for each Chrome `--user-data-dir`."""
+    procs = _scan_processes()
+    children: dict[int, list[int]] = defaultdict(list)
+    for pid, (ppid, _, _) in procs.items():
+        children[ppid].append(pid)
+
+    result = {}
+    for user_data_dir in user_data_dirs:
+        flag = f"--user-data-dir={user_data_dir} "
+        stack = [pid for pid, (_, cmdline, _) in procs.items() if flag in cmdline + " "]
+        seen: set[int] = set()
+        while stack:
+            pid = stack.pop()
+            if pid not in seen:
+                seen.add(pid)
+                stack.extend(children.get(pid, ()))
+        result[user_data_dir] = sum(procs[pid][2] for pid in seen)
+    return result
+
+
+class MemoryMonitor:
+    def __init__(
+        self,
+        session_max_rss_mb: int = settings.session_max_rss_mb,
+        reserve_mb: int = settings.memory_reserve_mb,
+        session_estimate_mb: int = settings.session_rss_estimate_mb,
+    ):
+        self.session_max_rss = session_max_rss_mb * _MB
+        self.reserve = reserve_mb * _MB
+        self.session_estimate = session_estimate_mb * _MB
+        self.limit: int | None = None
+        self.usage: int | None = None
+        self.sessions_rss = 0  # summed over the last sample
+        self.sampled_sessions = 0
+        self.refused_warms = 0
+        self.recycled = 0
+        self.launching = 0  # browsers starting that usage does not show yet
+        self._sessions: weakref.WeakSet = weakref.WeakSet()
+
+    def track(self, session):
+        self._sessions.add(session)
+
+    def live_sessions(self) -> list:
+        """Every session whose browser has not been closed."""
+        return [s for s in list(self._sessions) if os.path.isdir(s.user_data_dir)]
+
+    @property
+    def avg_session_rss(self) -> int:
+        """Measured average per session, or the configured estimate."""
+        if self.sampled_sessions:
+            return max(self.sessions_rss // self.sampled_sessions, 1)
+        return self.session_estimate
+
+    def refresh(self):
+        self.limit = memory_limit()
+        self.usage = memory_usage()
+
+    def measure(self, sessions: list | None = None) -> None:
+        """Sample RSS of `sessions` (default: all live ones) and node usage."""
+        if sessions is None:
+            sessions = self.live_sessions()
+        self.refresh()
+        rss = session_rss([s.user_data_dir for s in sessions])
+        for s in sessions:
+            s.rss_bytes = rss.get(s.user_data_dir, 0)
+        measured = [s.rss_bytes for s in sessions if s.rss_bytes]
+        self.sessions_rss = sum(measured)
+        self.sampled_sessions = len(measured)
+
+    def over_limit(self, session) -> bool:
+        return bool(self.session_max_rss) and session.rss_bytes > self.session_max_rss
+
+    @property
+    def headroom(self) -> int | None:
+        if self.limit is None or self.usage is None:
+            return None
+        return self.limit - self.usage - self.reserve
+
+    @property
+    def max_sessions(self) -> int | None:
+        """How many sessions fit in the limit beside everything else running."""
+        if self.limit is None or self.usage is None:
+            return None
+        baseline = max(0, self.usage - self.sessions_rss)
+        return max(0, (self.limit - self.reserve - baseline) // self.avg_session_rss)
+
+    def can_warm(self) -> bool:
+        """Whether one more session fits beside those running or starting."""
+        self.refresh()
+        headroom = self.headroom
+        if headroom is None:
+            return True
+        headroom -= self.launching * self.avg_session_rss
+        running_sessions = len(self.live_sessions()) + self.launching
+        max_sessions = self.max_sessions
+        if headroom >= self.avg_session_rss and (
+            max_sessions is None or running_sessions < max_sessions
+        ):
+            return True
+        self.refused_warms += 1
+        logger.warning(
+            f"Not warming another session: {headroom // _MB}MB headroom, "
+            f"~{self.avg_session_rss // _MB}MB per session, "
+            f"{running_sessions}/{max_sessions} sessions"
+        )
+        return False
+
+    def stats(self) -> dict:
+        headroom = self.headroom
+        return {
+            "limit_mb": self.limit // _MB if self.limit else None,
+            "usage_mb": self.usage // _MB if self.usage is not None else None,
+            "headroom_mb": headroom // _MB if headroom is not None else None,
+            "sessions_mb": self.sessions_rss // _MB,
+            "avg_session_mb": self.avg_session_rss // _MB,
+            "live_sessions": len(self.live_sessions()),
+            "max_sessions": self.max_sessions,
+            "session_max_rss_mb": self.session_max_rss // _MB or None,
+            "refused_warms": self.refused_warms,
+            "recycled": self.recycled,
+        }
+
+
+monitor = MemoryMonitor()
@@ -1,9 +1,49 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field, field_validator
+
+from .idempotency import normalize_url
 
 
 class CreatePixelRequest(BaseModel):
     name: str
     url: str
+    lease_id: str | None = None
+    # Must match the user_id the lease was reserved for, if it had one
+    user_id: str | None = None
+    idempotency_key: str | None = None
+    # IntentCore account name or workspace URL; empty = least-loaded account
+    workspace: str | None = None
+
+    @field_validator("name")
+    @classmethod
+    def _name_not_blank(cls, v: str) -> str:
+        v = v.strip()
+        if not v:
+            raise ValueError("name must not be empty")
+        return v
+
+    @field_validator("url")
+    @classmethod
+    def _url_well_formed(cls, v: str) -> str:
+        # Reject malformed URLs before any browser work starts
+        normalize_url(v)
+        return v.strip()
+
+
+class ReserveSessionRequest(BaseModel):
+    user_id: str | None = None
+    workspace: str | None = None
+
+
+class ReserveSessionResponse(BaseModel):
+    lease_id: str
+    expires_in_sec: int
+    ready: bool
+
+
+class ReleaseSessionResponse(BaseModel):
+    released: bool  # False if the lease was unknown, expired, redeemed or foreign
 
 
 class CreatePixelResponse(BaseModel):
@@ -11,3 +51,124 @@ class CreatePixelResponse(BaseModel):
     pixel_code: str | None = None
     pixel_id: str | None = None
     error: str | None = None
+    queue_position: int | None = None  # jobs ahead of this one when it queued
+    account: str | None = None  # IntentCore account the pixel was created in
+    job_id: str | None = None  # queued job, pollable at GET /api/jobs/{job_id}
+    trace_id: str | None = None  # see GET /admin/traces if the run failed or was slow
+    # Failed before the pixel was submitted, so trying again cannot duplicate it
+    retryable: bool = False
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    attempts: int
+    max_attempts: int
+    created_at: float
+    updated_at: float
+    result: CreatePixelResponse | None = None
+    error: str | None = None
+
+
+class PixelRecord(BaseModel):
+    pixel_id: str
+    name: str
+    url: str
+    pixel_code: str
+    created_at: float
+    updated_at: float
+    timings: dict[str, int] = {}
+
+
+class PixelListResponse(BaseModel):
+    pixels: list[PixelRecord]
+
+
+class InventoryPixel(BaseModel):
+    name: str
+    url: str = ""
+    pixel_id: str = ""
+    account: str = ""
+
+
+class InventoryResponse(BaseModel):
+    pixels: list[InventoryPixel]
+    refreshed_at: float | None = None
+    age_sec: float | None = None
+    refreshing: bool = False
+    error: str | None = None
+
+
+class DeletePixelsRequest(BaseModel):
+    names: list[str] = Field(min_length=1)
+    concurrency: int | None = Field(default=None, ge=1, le=16)
+    # index: read the table once and act on matched rows; search: per-name search box
+    mode: Literal["index", "search"] = "index"
+    # IntentCore account name or workspace URL; empty = first configured account
+    workspace: str | None = None
+
+
+class DeletePixelResult(BaseModel):
+    name: str
+    status: Literal["deleted", "not_found", "error"]
+    error: str | None = None
+
+
+class DeletePixelsResponse(BaseModel):
+    results: list[DeletePixelResult]
+    deleted: int
+    not_found: int
+    failed: int
+
+
+class PoolSession(BaseModel):
+    id: str
+    account: str
+    tier: str
+    in_use: bool  # out on a job or lease
+    retiring: bool  # closes once its current work ends
+    age_sec: int
+    use_count: int
+    rss_mb: int
+
+
+class PoolAccountState(BaseModel):
+    account: str
+    workspace_url: str
+    pool_size: int
+    max_age_sec: int
+    paused: bool
+    warm_sessions: int
+    sessions: list[PoolSession]
+
+
+class PoolStateResponse(BaseModel):
+    accounts: list[PoolAccountState]
+
+
+class PoolUpdateRequest(BaseModel):
+    # IntentCore account name or workspace URL; empty = every account
+    workspace: str | None = None
+    pool_size: int | None = Field(default=None, ge=0, le=64)
+    max_age_sec: int | None = Field(default=None, ge=30)
+    # true stops launching browsers (existing sessions keep serving)
+    paused: bool | None = None
+
+
+class ProfilingRequest(BaseModel):
+    # Share of creates to profile; empty = leave unchanged
+    sample_rate: float | None = Field(default=None, ge=0, le=1)
+
+
+class RecycleSessionsRequest(BaseModel):
+    # IntentCore account name or workspace URL; empty = every account
+    workspace: str | None = None
+    session_id: str | None = None  # empty = every session
+    # Also pause warming, so the pool empties as sessions finish their work
+    drain: bool = False
+
+
+class RecycleSessionsResponse(BaseModel):
+    closed: int  # idle sessions closed right away
+    retiring: int  # busy sessions that close when their work ends
+    pools: PoolStateResponse
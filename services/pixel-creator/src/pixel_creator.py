@@ -4,72 +4,80 @@ IntentCore pixel creation via Selenium.
 Split into two phases for pre-warming:
   1. warm_session()  — launches Chrome, logs in, opens Create modal, selects V4
   2. fill_and_create() — fills name/url, clicks Create, extracts pixel code
+
+Warming is itself broken into tiers (launched, logged in, on the pixel page,
+modal ready) so the pool can advance sessions one step at a time and retry
+a failed step without relaunching Chrome. A failed create is recovered in
+the same browser where possible, and a browser that still works after a
+failure goes back to the pool at a lower tier instead of being closed.
+
+The browser steps themselves live in `intentcore`; this module binds them
+to the service's settings and pooled sessions.
 """
 
-import os
-import re
 import time
+import uuid
 import logging
 import tempfile
 import shutil
+import threading
+from enum import IntEnum
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 
-from .config import settings
+from .asset_proxy import proxy as asset_proxy
+from .config import IntentCoreAccount, settings
+from .driver_service import SharedDriverService
+from .intentcore import (
+    PixelCodeMissing,
+    PixelNotCreated,
+    chrome_options,
+    extract_pixel_id,
+    install_pixel_capture,
+    open_create_modal,
+    open_pixel_page,
+    recover_pixel_code,
+    sign_in,
+    submit_create_form,
+)
+from . import tracing
+from .commands import count_commands
+from .memory import monitor as memory_monitor
+from .profiling import instrument, profile_thread
+from .tracing import recorder
+from .upstream import UpstreamUnavailable, guard
 
 logger = logging.getLogger(__name__)
 
-LOGIN_URL = "https://app.intentcore.io/auth/sign-in"
-
-
-def _get_chromedriver_service() -> ChromeService:
-    """Use system chromedriver if available, fall back to webdriver-manager."""
-    for path in ["/opt/homebrew/bin/chromedriver", "/usr/local/bin/chromedriver"]:
-        if os.path.isfile(path):
-            logger.info(f"Using system chromedriver: {path}")
-            return ChromeService(path)
-    logger.info("Using webdriver-manager chromedriver")
-    return ChromeService(ChromeDriverManager().install())
-
+driver_service = SharedDriverService(settings.chromedriver_path)
 
-def _find_clickable(driver, wait, selectors):
-    """Try multiple selectors, return the first visible clickable element."""
-    for by, selector in selectors:
-        try:
-            el = wait.until(EC.element_to_be_clickable((by, selector)))
-            if el.is_displayed():
-                return el
-        except Exception:
-            continue
-    return None
 
+class Tier(IntEnum):
+    """How far a session has progressed towards being ready for a request."""
 
-def _find_visible(driver, selectors):
-    """Try multiple selectors without waiting, return first visible element."""
-    for by, selector in selectors:
-        try:
-            el = driver.find_element(by, selector)
-            if el.is_displayed():
-                return el
-        except Exception:
-            continue
-    return None
+    LAUNCHED = 0
+    LOGGED_IN = 1
+    PIXEL_PAGE = 2
+    MODAL_READY = 3
 
 
 class WarmSession:
-    """Holds a pre-warmed Chrome driver with the Create modal open and V4 selected."""
+    """Holds a Chrome driver and how far it has been warmed (see `Tier`)."""
 
-    def __init__(self, driver, user_data_dir, created_at):
+    def __init__(self, driver, user_data_dir, created_at, account: IntentCoreAccount):
+        self.id = uuid.uuid4().hex[:8]
         self.driver = driver
         self.user_data_dir = user_data_dir
         self.created_at = created_at
+        self.account = account
+        self.tier = Tier.LAUNCHED
+        self.busy = False  # a pool worker is currently advancing this session
+        self.failures = 0  # consecutive failed attempts at the next step
+        self.rss_bytes = 0  # Chrome process-tree RSS at the last memory sample
+        self.use_count = 0  # times handed out by the pool
+        self.retiring = False  # close instead of reusing once its current work ends
+        # Set once the flight recorder has saved the page of a failed run
+        self.capture_done: threading.Event | None = None
 
     def close(self):
         try:
@@ -79,371 +87,278 @@ class WarmSession:
         shutil.rmtree(self.user_data_dir, ignore_errors=True)
 
 
-def warm_session() -> WarmSession:
-    """
-    Launch Chrome, log in to IntentCore, navigate to /pixel,
-    click Create, select V4, and return a WarmSession with the modal open.
-    """
-    user_data_dir = tempfile.mkdtemp()
-    options = Options()
-    if settings.chrome_headless:
-        options.add_argument("--headless=new")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument(f"--user-data-dir={user_data_dir}")
+# Cookies/localStorage of each account's most recent form login, shared by
+# every new session of that account so only one browser per TTL has to go
+# through the login form
+_snapshots: dict[str, dict] = {}
+_snapshot_lock = threading.Lock()
 
-    t0 = time.perf_counter()
-    driver = webdriver.Chrome(
-        service=_get_chromedriver_service(),
-        options=options,
+
+def _current_snapshot(account: IntentCoreAccount) -> dict | None:
+    with _snapshot_lock:
+        snapshot = _snapshots.get(account.name)
+        if snapshot is None or settings.login_snapshot_ttl_sec <= 0:
+            return None
+        if time.time() - snapshot["captured_at"] > settings.login_snapshot_ttl_sec:
+            return None
+        return snapshot
+
+
+def _remember_snapshot(account: IntentCoreAccount, snapshot: dict):
+    with _snapshot_lock:
+        _snapshots[account.name] = snapshot
+
+
+def launch_browser(account: IntentCoreAccount) -> WarmSession:
+    """Start a fresh Chrome on the shared chromedriver (tier LAUNCHED)."""
+    user_data_dir = tempfile.mkdtemp()
+    options = chrome_options(
+        user_data_dir,
+        headless=settings.chrome_headless,
+        chrome_bin=settings.chrome_bin,
+        extra_args=asset_proxy.chrome_arguments() if asset_proxy is not None else (),
     )
-    wait = WebDriverWait(driver, 30)
-    logger.info(f"Chrome launched in {int((time.perf_counter()-t0)*1000)}ms")
 
+    t0 = time.perf_counter()
     try:
-        # Login
-        driver.get(LOGIN_URL)
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='email']")))
-
-        email_input = driver.find_element(By.CSS_SELECTOR, "input[type='email']")
-        email_input.clear()
-        email_input.send_keys(settings.intentcore_email)
-        email_input.send_keys(Keys.ENTER)
-
-        pass_input = wait.until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "input[type='password']"))
-        )
-        pass_input.clear()
-        pass_input.send_keys(settings.intentcore_password)
-        pass_input.send_keys(Keys.ENTER)
-
-        wait.until(lambda d: "/auth/" not in d.current_url)
-        logger.info("Logged in")
-
-        # Navigate to Pixels page
-        driver.get(f"{settings.intentcore_workspace_url}/pixel")
-        wait.until(
-            EC.presence_of_element_located(
-                (By.XPATH, "//button[contains(normalize-space(.),'Create')]")
-            )
-        )
-        logger.info("On Pixels page")
-
-        # Install network interceptor for pixel code capture
-        driver.execute_script("""(function(){
-            try {
-                if (window.__PIXEL_CAPTURED__) return;
-                window.__PIXEL_CAPTURED__ = { pixel: '' };
-                var origFetch = window.fetch;
-                if (origFetch) {
-                    window.fetch = async function(){
-                        var res = await origFetch.apply(this, arguments);
-                        try {
-                            var clone = res.clone();
-                            var text = await clone.text();
-                            if (/<script[^>]*src=/.test(text)) {
-                                window.__PIXEL_CAPTURED__.pixel = text;
-                            }
-                        } catch(e) {}
-                        return res;
-                    };
-                }
-            } catch(e) {}
-        })();""")
-
-        # Click Create button (on the page, not in a dialog)
-        create_btn = _find_clickable(driver, wait, [
-            (By.XPATH, "//button[contains(normalize-space(.),'Create') and not(ancestor::div[@role='dialog'])]"),
-            (By.CSS_SELECTOR, "button.bg-primary"),
-            (By.XPATH, "//button[contains(@class,'primary') and contains(normalize-space(.),'Create')]"),
-        ])
-        if not create_btn:
-            buttons = driver.find_elements(
-                By.XPATH, "//button[contains(normalize-space(.),'Create')]"
-            )
-            for btn in buttons:
-                if btn.is_displayed():
-                    create_btn = btn
-                    break
-        if not create_btn:
-            raise RuntimeError("Create button not found on Pixels page")
-
-        driver.execute_script("arguments[0].scrollIntoView({block:'center'});", create_btn)
-        time.sleep(0.3)
-        create_btn.click()
-
-        # Wait for modal
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[role='dialog']")))
-        time.sleep(0.5)
-
-        # Select V4 (Beta)
-        v4_btn = _find_visible(driver, [
-            (By.XPATH, "//div[@role='dialog']//button[contains(normalize-space(.),'V4')]"),
-            (By.XPATH, "//div[@role='dialog']//*[contains(normalize-space(.),'V4 (Beta)') and (self::button or self::div)]"),
-            (By.XPATH, "//button[contains(normalize-space(.),'V4')]"),
-        ])
-        if v4_btn:
-            try:
-                v4_btn.click()
-            except Exception:
-                driver.execute_script("arguments[0].click();", v4_btn)
-            time.sleep(0.3)
-            logger.info("V4 (Beta) selected")
-        else:
-            logger.warning("V4 button not found — may already be default")
-
-        elapsed = int((time.perf_counter() - t0) * 1000)
-        logger.info(f"Session warmed in {elapsed}ms")
-        return WarmSession(driver, user_data_dir, created_at=time.time())
-
+        with tracing.span("launch_browser", account=account.name):
+            driver = driver_service.new_driver(options)
     except Exception:
-        driver.quit()
         shutil.rmtree(user_data_dir, ignore_errors=True)
         raise
+    logger.info(f"Chrome launched in {int((time.perf_counter()-t0)*1000)}ms")
+    instrument(count_commands(driver))
+    session = WarmSession(driver, user_data_dir, created_at=time.time(), account=account)
+    memory_monitor.track(session)
+    return session
+
+
+def _login(session: WarmSession) -> Tier:
+    """LAUNCHED -> LOGGED_IN, or straight to PIXEL_PAGE via a snapshot"""
+    account = session.account
+    snapshot, restored = sign_in(
+        session.driver,
+        account.email,
+        account.password,
+        snapshot=_current_snapshot(account),
+        landing_url=f"{account.workspace_url}/pixel",
+    )
+    if restored:
+        install_pixel_capture(session.driver)
+        return Tier.PIXEL_PAGE
+    if settings.login_snapshot_ttl_sec > 0:
+        _remember_snapshot(account, snapshot)
+    return Tier.LOGGED_IN
 
 
-def fill_and_create(session: WarmSession, name: str, url: str) -> tuple[str, str]:
-    """
-    Fill in the pixel name/url on an already-warmed session, click Create,
-    and extract the pixel code.
+def _open_pixel_page(session: WarmSession):
+    """LOGGED_IN -> PIXEL_PAGE"""
+    open_pixel_page(session.driver, session.account.workspace_url)
 
-    Returns (pixel_code, pixel_id). Closes the session when done.
-    """
-    driver = session.driver
-    wait = WebDriverWait(driver, 30)
-    t0 = time.perf_counter()
 
-    try:
-        # Fill Website Name
-        name_field = _find_visible(driver, [
-            (By.CSS_SELECTOR, "input[name='websiteName']"),
-            (By.CSS_SELECTOR, "input[name*='name']:not([placeholder*='Search'])"),
-            (By.CSS_SELECTOR, "form input[type='text']:not([placeholder*='Search'])"),
-        ])
-        if not name_field:
-            inputs = driver.find_elements(
-                By.CSS_SELECTOR,
-                "form input[type='text'], div[role='dialog'] input[type='text']",
-            )
-            for inp in inputs:
-                placeholder = inp.get_attribute("placeholder") or ""
-                if "search" not in placeholder.lower():
-                    name_field = inp
-                    break
-        if not name_field:
-            raise RuntimeError("Website name field not found")
-
-        name_field.clear()
-        time.sleep(0.2)
-        name_field.send_keys(name)
-
-        # Fill Website URL
-        url_field = _find_visible(driver, [
-            (By.CSS_SELECTOR, 'input[placeholder="https://example.com"]'),
-            (By.CSS_SELECTOR, 'input[placeholder*="http"]'),
-            (By.CSS_SELECTOR, 'input[name*="url"]'),
-            (By.CSS_SELECTOR, 'input[type="url"]'),
-        ])
-        if not url_field:
-            inputs = driver.find_elements(
-                By.CSS_SELECTOR, "form input, div[role='dialog'] input"
-            )
-            if len(inputs) >= 2:
-                url_field = inputs[1]
-        if not url_field:
-            raise RuntimeError("Website URL field not found")
-
-        url_field.clear()
-        time.sleep(0.2)
-        url_field.send_keys(url)
-
-        # Click Next
-        next_btn = _find_visible(driver, [
-            (By.XPATH, "//div[@role='dialog']//button[contains(normalize-space(.),'Next')]"),
-            (By.XPATH, "//form//button[contains(normalize-space(.),'Next')]"),
-            (By.CSS_SELECTOR, "div[role='dialog'] button[type='submit']"),
-            (By.CSS_SELECTOR, "form button[type='submit']"),
-        ])
-        if not next_btn:
-            raise RuntimeError("Next button not found")
-        next_btn.click()
-        time.sleep(1)
-
-        # Click final Create
-        time.sleep(1)
-        final_create = _find_visible(driver, [
-            (By.CSS_SELECTOR, "div[role='dialog'] button[type='submit']"),
-            (By.XPATH, "//div[@role='dialog']//button[contains(normalize-space(.),'Create')]"),
-            (By.XPATH, "//div[@role='dialog']//form//button[contains(normalize-space(.),'Create')]"),
-        ])
-        if not final_create:
-            buttons = driver.find_elements(
-                By.CSS_SELECTOR, "div[role='dialog'] form button"
-            )
-            if buttons:
-                final_create = buttons[-1]
-        if not final_create:
-            raise RuntimeError("Final Create button not found in modal")
+def _open_create_modal(session: WarmSession):
+    """PIXEL_PAGE -> MODAL_READY"""
+    # A dialog left over from a failed attempt — start again from a clean page
+    if session.driver.find_elements(By.CSS_SELECTOR, "div[role='dialog']"):
+        _open_pixel_page(session)
+    open_create_modal(session.driver)
 
-        # Wait for button to be enabled
-        for _ in range(30):
-            if final_create.is_enabled():
-                break
-            time.sleep(0.5)
 
-        try:
-            final_create.click()
-        except Exception:
-            driver.execute_script("arguments[0].click();", final_create)
+_STEPS = {
+    Tier.LAUNCHED: _login,
+    Tier.LOGGED_IN: _open_pixel_page,
+    Tier.PIXEL_PAGE: _open_create_modal,
+}
 
-        # Wait for post-creation UI to settle
-        time.sleep(2)
 
-        # Navigate to Install tab
-        try:
-            install_tab = wait.until(
-                EC.element_to_be_clickable(
-                    (By.XPATH, "//button[contains(normalize-space(.),'Install')]")
+def advance_session(session: WarmSession) -> Tier:
+    """
+    Run the single step that moves `session` up one tier (a step may skip
+    ahead further). On failure the session stays at its last good tier so
+    the step can simply be retried. Raises UpstreamUnavailable without
+    running the step while IntentCore is being protected (see `upstream`).
+    """
+    upstream = guard(session.account.name)
+    upstream.breaker.check()
+    if session.tier == Tier.LAUNCHED:
+        upstream.login_limiter.acquire()
+    upstream.breaker.before_call()
+    t0 = time.perf_counter()
+    try:
+        with tracing.span(f"warm.{session.tier.name.lower()}", session=session.id):
+            reached = _STEPS[session.tier](session)
+    except Exception as e:
+        upstream.breaker.record_failure(e)
+        raise
+    upstream.breaker.record_success()
+    session.tier = reached or Tier(session.tier + 1)
+    elapsed = int((time.perf_counter() - t0) * 1000)
+    logger.info(f"Session {session.id} reached {session.tier.name} in {elapsed}ms")
+    return session.tier
+
+
+def promote_session(
+    session: WarmSession,
+    target: Tier = Tier.MODAL_READY,
+    max_attempts: int = settings.warm_step_retries,
+):
+    """Advance `session` to `target`, retrying each failed step in place."""
+    with profile_thread():
+        while session.tier < target:
+            try:
+                advance_session(session)
+                session.failures = 0
+            except UpstreamUnavailable:
+                raise
+            except Exception as e:
+                session.failures += 1
+                if session.failures >= max_attempts:
+                    raise
+                logger.warning(
+                    f"Session {session.id}: step from {session.tier.name} failed "
+                    f"({session.failures}/{max_attempts}), retrying: {e}"
                 )
-            )
-            driver.execute_script("arguments[0].click();", install_tab)
-            logger.info("Clicked Install tab")
-        except Exception as e:
-            logger.warning(f"Install tab not found: {e}")
 
-        # Click Basic Install
-        time.sleep(1)
+
+def warm_session(account: IntentCoreAccount) -> WarmSession:
+    """
+    Launch Chrome, log in to IntentCore, navigate to /pixel,
+    click Create, select V4, and return a WarmSession with the modal open.
+    """
+    t0 = time.perf_counter()
+    with profile_thread():
+        session = launch_browser(account)
         try:
-            basic_btn = driver.find_element(
-                By.XPATH, "//button[contains(normalize-space(.),'Basic Install')]"
-            )
-            driver.execute_script("arguments[0].click();", basic_btn)
-            logger.info("Clicked Basic Install")
+            promote_session(session)
         except Exception:
-            logger.warning("Basic Install button not found")
-
-        # Extract pixel code with retries
-        pixel_code = ""
-        for attempt in range(5):
-            time.sleep(1)
-            pixel_code = _extract_pixel_code(driver)
-            if pixel_code and "<script" in pixel_code.lower():
-                break
-            logger.info(f"Extraction attempt {attempt + 1}/5 — no code yet")
-
-        elapsed = int((time.perf_counter() - t0) * 1000)
-        logger.info(f"fill_and_create completed in {elapsed}ms")
-
-        if not pixel_code or "<script" not in pixel_code.lower():
-            # Save screenshot for debugging
-            try:
-                driver.save_screenshot("/tmp/pixel-creator-fail.png")
-                page_text = driver.execute_script("return document.body.innerText.substring(0, 500);")
-                logger.error(f"Page text at failure: {page_text}")
-            except Exception:
-                pass
-            raise RuntimeError(
-                f"Pixel code not found after creation. Got: {pixel_code[:200] if pixel_code else '(empty)'}"
-            )
+            session.close()
+            raise
+    elapsed = int((time.perf_counter() - t0) * 1000)
+    logger.info(f"Session warmed in {elapsed}ms")
+    return session
 
-        # Extract pixel ID from the code
-        pixel_id = _extract_pixel_id(pixel_code)
 
-        return pixel_code, pixel_id
+class CreateFailed(RuntimeError):
+    """
+    fill_and_create failed but the browser still works: the session was
+    reset to a tier it can be re-warmed from, and the caller should return
+    it to the pool rather than close it.
+    """
 
-    finally:
-        session.close()
 
+class CreateRecoveryStats:
+    def __init__(self):
+        self.retried = 0  # forms reopened and refilled after failing before submit
+        self.recovered = 0  # creates that succeeded after a retry or a second look
+        self.salvaged = 0  # failed sessions reset for the pool instead of closed
+        self.destroyed = 0  # failed sessions closed because the browser was gone
 
-def _extract_pixel_code(driver) -> str:
-    """Try multiple strategies to extract the pixel <script> tag from the page."""
-    # Strategy 1: <pre> or <code> in dialog containing a <script> tag
-    try:
-        for selector in ["div[role='dialog'] pre", "div[role='dialog'] code"]:
-            for el in driver.find_elements(By.CSS_SELECTOR, selector):
-                text = el.text.strip()
-                if text and "<script" in text.lower():
-                    logger.info(f"Extracted pixel code via dialog element: {text[:100]}")
-                    return text
-    except Exception:
-        pass
+    def stats(self) -> dict:
+        return dict(vars(self))
 
-    # Strategy 2: Any <pre> or <code> with a <script> tag
-    try:
-        for tag in ["pre", "code"]:
-            for el in driver.find_elements(By.TAG_NAME, tag):
-                text = el.text.strip()
-                if text and "<script" in text.lower() and "src=" in text.lower():
-                    logger.info(f"Extracted pixel code via {tag}: {text[:100]}")
-                    return text
-    except Exception:
-        pass
 
-    # Strategy 3: textarea containing script tag
-    try:
-        for ta in driver.find_elements(By.TAG_NAME, "textarea"):
-            text = ta.get_attribute("value") or ta.text
-            text = text.strip()
-            if text and "<script" in text.lower() and "src=" in text.lower():
-                logger.info(f"Extracted pixel code via textarea: {text[:100]}")
-                return text
-    except Exception:
-        pass
+recovery = CreateRecoveryStats()
 
-    # Strategy 4: Full page scan for elements containing script tags
-    try:
-        result = driver.execute_script("""
-            var all = document.querySelectorAll('pre, code, textarea, [class*="snippet"], [class*="code"]');
-            for (var i = 0; i < all.length; i++) {
-                var t = (all[i].textContent || all[i].value || '').trim();
-                if (t && /<script[^>]+src=/i.test(t)) {
-                    return t;
-                }
-            }
-            return '';
-        """)
-        if result:
-            logger.info(f"Extracted pixel code via page scan: {result.strip()[:100]}")
-            return result.strip()
-    except Exception:
-        pass
 
-    # Strategy 5: Network interceptor capture — extract the <script> tag from response
+def _resume_tier(session: WarmSession) -> Tier | None:
+    """Tier a failed session can be re-warmed from, or None if its browser is gone."""
     try:
-        captured = driver.execute_script(
-            "return (window.__PIXEL_CAPTURED__ && window.__PIXEL_CAPTURED__.pixel) || '';"
-        )
-        if captured:
-            match = re.search(r'<script[^>]+src=["\'][^"\']+["\'][^>]*>\s*</script>', captured, re.IGNORECASE)
-            if match:
-                logger.info(f"Extracted pixel code via network capture: {match.group(0)[:100]}")
-                return match.group(0)
+        current_url = session.driver.current_url
     except Exception:
-        pass
-
-    return ""
+        return None
+    # Reloading /pixel also gets rid of whatever dialog was left open
+    return Tier.LAUNCHED if "/auth/" in current_url else Tier.LOGGED_IN
 
 
-def _extract_pixel_id(pixel_code: str) -> str:
-    """Extract a pixel identifier from the pixel code snippet.
-
-    Handles multiple URL formats:
-      - .../pixels/<uuid>/p.js          (identitypxl format)
-      - .../idp-analytics-<hex>.min.js  (idpixel format)
-      - Falls back to extracting the src URL as the ID
+def _submit_with_recovery(
+    session: WarmSession, name: str, url: str, timings: dict[str, int] | None
+) -> tuple[str, str]:
+    """
+    submit_create_form, recovering in the same browser: a form that failed
+    before the pixel was submitted is reopened from a fresh /pixel page and
+    refilled (up to `create_retries` times), and a created pixel whose code
+    did not show gets a second look at the Install tab and network capture.
+    """
+    attempt = 0
+    while True:
+        try:
+            result = submit_create_form(session.driver, name, url, timings)
+        except PixelNotCreated as e:
+            if attempt >= settings.create_retries or _resume_tier(session) != Tier.LOGGED_IN:
+                raise
+            attempt += 1
+            recovery.retried += 1
+            logger.warning(
+                f"Session {session.id}: create form failed ({e}), reopening it "
+                f"({attempt}/{settings.create_retries})"
+            )
+            with tracing.span("recover.reopen_form", cause=str(e)):
+                _open_pixel_page(session)
+                open_create_modal(session.driver)
+            continue
+        except PixelCodeMissing:
+            with tracing.span("recover.pixel_code") as attrs:
+                pixel_code = recover_pixel_code(session.driver)
+                attrs["found"] = bool(pixel_code)
+            if not pixel_code:
+                raise
+            logger.info(f"Session {session.id}: recovered the code of the created pixel")
+            recovery.recovered += 1
+            return pixel_code, extract_pixel_id(pixel_code)
+        if attempt:
+            recovery.recovered += 1
+        return result
+
+
+def fill_and_create(
+    session: WarmSession,
+    name: str,
+    url: str,
+    timings: dict[str, int] | None = None,
+    keep_open: bool = False,
+    token_taken: bool = False,
+) -> tuple[str, str]:
+    """
+    Fill in the pixel name/url on an already-warmed session, click Create,
+    and extract the pixel code. Per-stage durations (ms) are written into
+    `timings` if given.
+
+    Returns (pixel_code, pixel_id). Closes the session when done unless
+    `keep_open` is set, in which case the caller owns it afterwards; a
+    failed or slow run's session goes to the flight recorder instead, which
+    screenshots it before closing it (see `tracing`). If the run fails but
+    the browser still responds, CreateFailed is raised and the session is
+    left open, reset for the caller to return to the pool. UpstreamUnavailable
+    is raised before touching the session, which then also stays open. With
+    `token_taken` the caller has already waited for the account's create
+    rate limit (see `TokenBucket.reserve`).
     """
-    # Format: /pixels/<uuid>/p.js
-    match = re.search(r"/pixels/([^/]+)/p\.js", pixel_code)
-    if match:
-        return match.group(1)
-    # Format: idp-analytics-<hex>.min.js
-    match = re.search(r"idp-analytics-([a-f0-9]+)\.min\.js", pixel_code)
-    if match:
-        return match.group(1)
-    # Fallback: extract the src URL itself
-    match = re.search(r'src=["\']([^"\']+)["\']', pixel_code)
-    if match:
-        return match.group(1).split("/")[-1].replace(".min.js", "").replace(".js", "")
-    return ""
+    upstream = guard(session.account.name)
+    upstream.breaker.check()
+    if not token_taken:
+        with tracing.span("create_rate_limit"):
+            upstream.create_limiter.acquire()
+    upstream.breaker.before_call()
+    failed = salvaged = False
+    try:
+        with profile_thread():
+            result = _submit_with_recovery(session, name, url, timings)
+        upstream.breaker.record_success()
+        return result
+    except Exception as e:
+        upstream.breaker.record_failure(e)
+        failed = True
+        resume_tier = _resume_tier(session)
+        if resume_tier is None:
+            recovery.destroyed += 1
+            raise
+        # The browser survived: keep it for the pool, which waits for the
+        # recorder's screenshot before using it again
+        session.capture_done = recorder.capture_page(session)
+        session.tier = resume_tier
+        recovery.salvaged += 1
+        salvaged = True
+        raise CreateFailed(str(e) or type(e).__name__) from e
+    finally:
+        if not keep_open and not salvaged and not recorder.capture(session, failed=failed):
+            session.close()
@@ -0,0 +1,210 @@
+"""
+On-demand profiling of individual requests.
+
+A profiled request (sampled at PROFILE_SAMPLE_RATE, or forced with an
+`X-Profile: 1` header from the service key) gets a `Profile` in a context
+variable, which travels with its trace into the executor threads. There:
+
+- every WebDriver command is counted and timed by a wrapper around the
+  driver's command executor (`instrument`), which costs one context-variable
+  read per command when no profile is active;
+- the browser work in `fill_and_create` and session warm-up runs under
+  cProfile (`profile_thread`), which yields time spent sleeping in waits
+  and the hottest Python functions.
+
+`Profile.report` turns both into a breakdown such as "38 WebDriver calls
+(21 findElement) 640ms, 1250ms sleeping, 85ms Python", attached to the
+request's trace. cProfile hooks every thread on newer Pythons, so only one
+request at a time gets it; others sampled meanwhile still count commands.
+"""
+
+import cProfile
+import functools
+import logging
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_TOP_FUNCTIONS = 10
+
+# cProfile can only be active once per process (see module docstring)
+_cprofile_lock = threading.Lock()
+
+
+class Profile:
+    def __init__(self):
+        self.commands: dict[str, list] = {}  # command -> [calls, seconds]
+        self._lock = threading.Lock()
+        self._cprofile: cProfile.Profile | None = None
+        self._depth = 0
+        self._entered_at = 0.0
+        self.thread_sec = 0.0  # wall time inside profile_thread sections
+
+    def record_command(self, command: str, elapsed: float):
+        with self._lock:
+            entry = self.commands.setdefault(command, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def claim_cprofile(self) -> bool:
+        if self._cprofile is None and _cprofile_lock.acquire(blocking=False):
+            self._cprofile = cProfile.Profile()
+        return self._cprofile is not None
+
+    def release_cprofile(self):
+        if self._cprofile is not None:
+            _cprofile_lock.release()
+
+    def enter_thread(self):
+        self._depth += 1
+        if self._depth == 1:
+            self._entered_at = time.perf_counter()
+            if self._cprofile is not None:
+                try:
+                    self._cprofile.enable()
+                except ValueError:
+                    # Another profiler is active (e.g. a timed-out request's
+                    # thread still running); fall back to command counts
+                    self.release_cprofile()
+                    self._cprofile = None
+
+    def exit_thread(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if self._cprofile is not None:
+                self._cprofile.disable()
+            self.thread_sec += time.perf_counter() - self._entered_at
+
+    def report(self) -> dict:
+        commands = sorted(self.commands.items(), key=lambda kv: -kv[1][1])
+        webdriver_calls = sum(calls for calls, _ in self.commands.values())
+        webdriver_ms = int(sum(sec for _, sec in self.commands.values()) * 1000)
+        thread_ms = int(self.thread_sec * 1000)
+        report = {
+            "thread_ms": thread_ms,
+            "webdriver": {
+                "calls": webdriver_calls,
+                "ms": webdriver_ms,
+                "by_command": {
+                    name: {"calls": calls, "ms": int(sec * 1000)} for name, (calls, sec) in commands
+                },
+            },
+            "sleep": None,
+            "python_ms": None,
+            "top": [],
+        }
+        parts = [f"{webdriver_calls} WebDriver calls"]
+        if commands:
+            parts[0] += " (" + ", ".join(f"{calls} {name}" for name, (calls, _) in commands[:3]) + ")"
+        parts[0] += f" {webdriver_ms}ms"
+
+        if self._cprofile is not None:
+            stats = pstats.Stats(self._cprofile).stats
+            sleep_calls = 0
+            sleep_sec = 0.0
+            top = []
+            for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.items():
+                if func == "<built-in method time.sleep>":
+                    sleep_calls += ncalls
+                    sleep_sec += tottime
+                top.append((tottime, cumtime, ncalls, f"{filename.rsplit('/', 1)[-1]}:{line}({func})"))
+            top.sort(reverse=True)
+            sleep_ms = int(sleep_sec * 1000)
+            # Command time includes its HTTP wait, which cProfile counts as
+            # Python; what is left is the service's own code
+            python_ms = max(0, thread_ms - sleep_ms - webdriver_ms)
+            report["sleep"] = {"calls": sleep_calls, "ms": sleep_ms}
+            report["python_ms"] = python_ms
+            report["top"] = [
+                {"function": name, "calls": ncalls, "tottime_ms": int(tot * 1000),
+                 "cumtime_ms": int(cum * 1000)}
+                for tot, cum, ncalls, name in top[:_TOP_FUNCTIONS]
+            ]
+            parts += [f"{sleep_ms}ms sleeping ({sleep_calls} sleeps)", f"{python_ms}ms Python"]
+        report["summary"] = ", ".join(parts) + f" of {thread_ms}ms in the browser thread"
+        return report
+
+
+_current: ContextVar[Profile | None] = ContextVar("profile", default=None)
+
+
+class Profiler:
+    def __init__(self, sample_rate: float = settings.profile_sample_rate):
+        self.sample_rate = sample_rate
+        self.profiled = 0
+        self.without_cprofile = 0  # profiled while another request held cProfile
+
+    def sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, enabled: bool = True):
+        """
+        Profile the block (and the executor work it starts); yields the
+        Profile, or None if not `enabled`.
+        """
+        if not enabled:
+            yield None
+            return
+        p = Profile()
+        if not p.claim_cprofile():
+            self.without_cprofile += 1
+        token = _current.set(p)
+        try:
+            yield p
+        finally:
+            _current.reset(token)
+            p.release_cprofile()
+            self.profiled += 1
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "profiled": self.profiled,
+            "without_cprofile": self.without_cprofile,
+        }
+
+
+@contextmanager
+def profile_thread():
+    """Run the block under the current request's profile, if it has one."""
+    p = _current.get()
+    if p is None:
+        yield
+        return
+    p.enter_thread()
+    try:
+        yield
+    finally:
+        p.exit_thread()
+
+
+def instrument(driver):
+    """Count and time `driver`'s WebDriver commands for profiled requests."""
+    connection = driver.command_executor
+    execute = connection.execute
+
+    @functools.wraps(execute)
+    def timed_execute(command, params):
+        p = _current.get()
+        if p is None:
+            return execute(command, params)
+        t0 = time.perf_counter()
+        try:
+            return execute(command, params)
+        finally:
+            p.record_command(command, time.perf_counter() - t0)
+
+    # Patched on the instance so isinstance(RemoteConnection) checks still hold
+    connection.execute = timed_execute
+    return driver
+
+
+profiler = Profiler()
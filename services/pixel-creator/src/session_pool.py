@@ -1,113 +1,396 @@
 """
 Async pool of pre-warmed Selenium sessions.
 
-Maintains up to `pool_size` warm sessions. Sessions are recycled after
-`max_age_sec` to avoid stale browser state. After a session is consumed,
+Maintains up to `pool_size` browser sessions, each at some warm tier
+(launched, logged in, on the pixel page, modal ready). Background workers
+promote lower tiers one step at a time; a failed step is retried from the
+last good tier rather than relaunching Chrome. Requests take the least-ready
+session that already meets their target tier (or else the most-ready one)
+and finish promoting it themselves if needed.
+
+Sessions are recycled after `max_age_sec` to avoid stale browser state, or
+once their Chrome grows past the memory limit (see `memory`); no session
+is launched without memory headroom for it. After a session is consumed,
 a new one is warmed in the background.
+
+Pools can be retuned while serving: `resize`, `recycle` and `paused` take
+effect at once for idle sessions, and sessions that are busy are marked
+`retiring` and closed as soon as their current work ends.
+
+Each pool serves a single IntentCore account; see `shards` for spreading
+work over several.
 """
 
 import asyncio
 import logging
+import threading
 import time
-from collections import deque
 
-from .config import settings
-from .pixel_creator import WarmSession, warm_session
+from . import tracing
+from .config import IntentCoreAccount, settings
+from .memory import monitor as memory_monitor
+from .pixel_creator import (
+    Tier,
+    WarmSession,
+    advance_session,
+    launch_browser,
+    promote_session,
+)
+from .upstream import OPEN, UpstreamUnavailable, guard
 
 logger = logging.getLogger(__name__)
 
+# Longest a returned session waits for the flight recorder's screenshot
+_CAPTURE_WAIT_SEC = 30
+
 
 class SessionPool:
     def __init__(
         self,
-        pool_size: int = settings.pool_size,
+        account: IntentCoreAccount | None = None,
+        pool_size: int | None = None,
         max_age_sec: int = settings.session_max_age_sec,
+        step_retries: int = settings.warm_step_retries,
     ):
-        self.pool_size = pool_size
+        self.account = account or settings.intentcore_accounts[0]
+        if pool_size is None:
+            pool_size = self.account.pool_size
+        self.pool_size = settings.pool_size if pool_size is None else pool_size
         self.max_age_sec = max_age_sec
-        self._sessions: deque[WarmSession] = deque()
-        self._warming = False
-        self._lock = asyncio.Lock()
-        self._available = asyncio.Event()
+        self.step_retries = step_retries
+        self._sessions: list[WarmSession] = []
+        self._launching = 0
+        self.paused = False  # no new browsers are launched while set
+        self._cond = asyncio.Condition()
 
     @property
     def warm_count(self) -> int:
-        return len(self._sessions)
+        return sum(1 for s in self._sessions if s.tier == Tier.MODAL_READY)
 
     @property
     def is_warming(self) -> bool:
-        return self._warming
+        return self._launching > 0 or any(s.busy for s in self._sessions)
+
+    def tier_counts(self) -> dict[str, int]:
+        counts = {tier.name.lower(): 0 for tier in Tier}
+        for s in self._sessions:
+            counts[s.tier.name.lower()] += 1
+        return counts
+
+    @property
+    def sessions(self) -> list[WarmSession]:
+        """Sessions currently held by the pool (idle or being promoted)."""
+        return list(self._sessions)
+
+    @property
+    def idle_count(self) -> int:
+        return sum(1 for s in self._sessions if not s.busy)
+
+    @property
+    def best_idle_tier(self) -> Tier | None:
+        return max((s.tier for s in self._sessions if not s.busy), default=None)
 
     async def start(self):
         """Fill the pool on startup."""
-        for _ in range(self.pool_size):
-            await self._warm_one()
-        if self._sessions:
-            self._available.set()
+        await asyncio.gather(
+            *(self._warm_one() for _ in range(self.pool_size - self._launching))
+        )
+
+    def _fill_locked(self):
+        """Launch browsers until the pool is back at `pool_size`."""
+        if self.paused:
+            return
+        missing = self.pool_size - len(self._sessions) - self._launching
+        for _ in range(missing):
+            asyncio.ensure_future(self._warm_one())
+
+    def _schedule_retry(self):
+        # While IntentCore is failing, wait for the circuit's next probe
+        breaker = guard(self.account.name).breaker
+        delay = max(30, breaker.retry_after()) if breaker.state == OPEN else 30
+        asyncio.get_event_loop().call_later(
+            delay, lambda: asyncio.ensure_future(self._warm_one())
+        )
 
     async def _warm_one(self):
-        """Warm a single session in a thread (Selenium is blocking)."""
-        self._warming = True
+        """Launch a browser in a thread (Selenium is blocking) and promote it."""
+        if self.paused or len(self._sessions) + self._launching >= self.pool_size:
+            return
+        if not memory_monitor.can_warm():
+            self._schedule_retry()
+            return
+        self._launching += 1
+        memory_monitor.launching += 1
         try:
             session = await asyncio.get_event_loop().run_in_executor(
-                None, warm_session
+                None, launch_browser, self.account
             )
-            async with self._lock:
-                self._sessions.append(session)
-                self._available.set()
-            logger.info(f"Session warmed. Pool size: {len(self._sessions)}")
         except Exception as e:
-            logger.error(f"Failed to warm session: {e}")
-            # Retry after delay
-            asyncio.get_event_loop().call_later(
-                30, lambda: asyncio.ensure_future(self._warm_one())
-            )
+            logger.error(f"Failed to launch browser: {e}")
+            self._schedule_retry()
+            return
         finally:
-            self._warming = False
+            self._launching -= 1
+            memory_monitor.launching -= 1
+
+        async with self._cond:
+            # The pool may have been shrunk or paused while Chrome started
+            surplus = self.paused or len(self._sessions) >= self.pool_size
+            if not surplus:
+                self._sessions.append(session)
+                self._cond.notify_all()
+        if surplus:
+            await asyncio.get_event_loop().run_in_executor(None, session.close)
+            return
+        await self._promote(session)
+
+    async def _promote(self, session: WarmSession):
+        """Background worker: advance an idle session one tier at a time."""
+        while session.tier < Tier.MODAL_READY:
+            async with self._cond:
+                if session not in self._sessions or session.busy:
+                    # Taken by a request, which finishes promotion itself
+                    return
+                session.busy = True
+
+            failed = False
+            backoff = 0
+            try:
+                await asyncio.get_event_loop().run_in_executor(
+                    None, advance_session, session
+                )
+                session.failures = 0
+            except UpstreamUnavailable as e:
+                # Not this session's fault; keep it and try again later
+                backoff = e.retry_after
+                logger.info(f"Session {session.id}: {e}, retrying in {backoff}s")
+            except Exception as e:
+                session.failures += 1
+                logger.warning(
+                    f"Session {session.id}: step from {session.tier.name} failed "
+                    f"({session.failures}/{self.step_retries}): {e}"
+                )
+                failed = session.failures >= self.step_retries
+            finally:
+                async with self._cond:
+                    session.busy = False
+                    if (failed or session.retiring) and session in self._sessions:
+                        self._sessions.remove(session)
+                        if session.retiring:
+                            self._fill_locked()
+                    self._cond.notify_all()
 
-    async def acquire(self, timeout: float = 60.0) -> WarmSession:
+            if session.retiring:
+                logger.info(f"Closing retired session {session.id}")
+                await asyncio.get_event_loop().run_in_executor(None, session.close)
+                return
+            if failed:
+                logger.error(f"Session {session.id} could not be warmed, relaunching")
+                await asyncio.get_event_loop().run_in_executor(None, session.close)
+                self._schedule_retry()
+                return
+            if backoff:
+                await asyncio.sleep(backoff)
+
+        logger.info(f"Session warmed. Pool size: {self.warm_count}")
+
+    def _evict_stale_locked(self):
+        now = time.time()
+        for s in list(self._sessions):
+            if not s.busy and now - s.created_at > self.max_age_sec:
+                self._sessions.remove(s)
+                logger.info(f"Evicted stale session {s.id}")
+                s.close()
+
+    async def recycle_over_memory(self) -> int:
+        """Close idle sessions whose last RSS sample is over the limit."""
+        async with self._cond:
+            bloated = [
+                s for s in self._sessions if not s.busy and memory_monitor.over_limit(s)
+            ]
+            for s in bloated:
+                self._sessions.remove(s)
+                logger.warning(
+                    f"Recycling session {s.id}: {s.rss_bytes // (1024 * 1024)}MB RSS"
+                )
+        for s in bloated:
+            await asyncio.get_event_loop().run_in_executor(None, s.close)
+        memory_monitor.recycled += len(bloated)
+        if bloated:
+            # Replace them now that their memory is freed
+            async with self._cond:
+                self._fill_locked()
+        return len(bloated)
+
+    def _take_best_locked(self, target: Tier) -> WarmSession | None:
+        """
+        The least-ready idle session at or above `target` (so jobs that need
+        less leave MODAL_READY sessions for creates), else the most-ready one.
         """
-        Get a warm session from the pool. Blocks up to `timeout` seconds
-        if none are available.
+        idle = [s for s in self._sessions if not s.busy]
+        if not idle:
+            return None
+        ready = [s for s in idle if s.tier >= target]
+        if ready:
+            session = min(ready, key=lambda s: s.tier)
+        else:
+            session = max(idle, key=lambda s: s.tier)
+        self._sessions.remove(session)
+        return session
+
+    async def acquire(
+        self, timeout: float = 60.0, target: Tier = Tier.MODAL_READY
+    ) -> WarmSession:
+        """
+        Get a session from the pool (see `_take_best_locked`), promoted to at
+        least `target`. Blocks up to `timeout` seconds if none are available.
         """
         deadline = time.time() + timeout
         while True:
-            async with self._lock:
-                # Evict stale sessions
-                while self._sessions:
-                    s = self._sessions[0]
-                    if time.time() - s.created_at > self.max_age_sec:
-                        self._sessions.popleft()
-                        logger.info("Evicted stale session")
-                        s.close()
-                    else:
+            async with self._cond:
+                while True:
+                    self._evict_stale_locked()
+                    session = self._take_best_locked(target)
+                    # Replenish in background (or start warming if empty)
+                    self._fill_locked()
+                    if session is not None:
+                        session.use_count += 1
                         break
 
-                if self._sessions:
-                    session = self._sessions.popleft()
-                    if not self._sessions:
-                        self._available.clear()
-                    # Replenish in background
-                    asyncio.ensure_future(self._warm_one())
-                    return session
-
-            # No session available — wait
-            remaining = deadline - time.time()
-            if remaining <= 0:
-                raise TimeoutError("No warm session available within timeout")
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError("No warm session available within timeout")
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError("No warm session available within timeout")
 
-            # If not already warming, start one
-            if not self._warming:
-                asyncio.ensure_future(self._warm_one())
+            if session.tier >= target:
+                return session
 
+            logger.info(f"Finishing warm-up of session {session.id} from {session.tier.name}")
             try:
-                await asyncio.wait_for(self._available.wait(), timeout=remaining)
-            except asyncio.TimeoutError:
-                raise TimeoutError("No warm session available within timeout")
+                await asyncio.get_event_loop().run_in_executor(
+                    None, tracing.bind(promote_session), session, target, self.step_retries
+                )
+                return session
+            except UpstreamUnavailable:
+                await self.release(session)
+                raise
+            except Exception as e:
+                logger.error(f"Session {session.id} could not be promoted: {e}")
+                session.close()
+                if time.time() >= deadline:
+                    raise TimeoutError("No warm session available within timeout")
+
+    async def release(self, session: WarmSession):
+        """
+        Return a session to the pool (e.g. from an expired lease or after a
+        read-only job); it is re-promoted if it is below MODAL_READY. A
+        session the flight recorder is still capturing is taken back once
+        that is done.
+        """
+        if session.capture_done is not None:
+            done, session.capture_done = session.capture_done, None
+            if not done.is_set():
+                asyncio.ensure_future(self._release_after(done, session))
+                return
+        to_close = None
+        bloated = False
+        async with self._cond:
+            if (
+                session.retiring
+                or self.pool_size == 0
+                or time.time() - session.created_at > self.max_age_sec
+            ):
+                to_close = session
+            elif memory_monitor.over_limit(session):
+                logger.warning(
+                    f"Recycling session {session.id}: "
+                    f"{session.rss_bytes // (1024 * 1024)}MB RSS"
+                )
+                memory_monitor.recycled += 1
+                to_close = session
+                bloated = True
+            elif len(self._sessions) + self._launching >= self.pool_size:
+                # Pool refilled meanwhile — keep whichever session is more ready
+                idle = [s for s in self._sessions if not s.busy]
+                worst = min(idle, key=lambda s: s.tier, default=None)
+                if worst is None or worst.tier >= session.tier:
+                    to_close = session
+                else:
+                    self._sessions.remove(worst)
+                    to_close = worst
+            if to_close is not session:
+                self._sessions.append(session)
+                self._cond.notify_all()
+        if to_close is not None:
+            await asyncio.get_event_loop().run_in_executor(None, to_close.close)
+        if bloated or session.retiring:
+            async with self._cond:
+                self._fill_locked()
+        if to_close is not session and session.tier < Tier.MODAL_READY:
+            asyncio.ensure_future(self._promote(session))
+
+    async def _release_after(self, done: threading.Event, session: WarmSession):
+        await asyncio.get_event_loop().run_in_executor(None, done.wait, _CAPTURE_WAIT_SEC)
+        await self.release(session)
+
+    async def resize(self, pool_size: int):
+        """
+        Change `pool_size` live. Growing warms the difference; shrinking
+        closes the least-ready idle sessions and retires busy ones if that
+        is not enough. Sessions out on a job are dropped when returned.
+        """
+        async with self._cond:
+            self.pool_size = pool_size
+            excess = len(self._sessions) - pool_size
+            surplus = []
+            if excess > 0:
+                idle = sorted((s for s in self._sessions if not s.busy), key=lambda s: s.tier)
+                surplus = idle[:excess]
+                for s in surplus:
+                    self._sessions.remove(s)
+                busy = [s for s in self._sessions if s.busy and not s.retiring]
+                for s in busy[: excess - len(surplus)]:
+                    s.retiring = True
+            self._fill_locked()
+        for s in surplus:
+            await asyncio.get_event_loop().run_in_executor(None, s.close)
+        logger.info(f"Pool of '{self.account.name}' resized to {pool_size}")
+
+    async def recycle(self, session_ids: set[str] | None = None) -> tuple[int, int]:
+        """
+        Close the pooled sessions in `session_ids` (all if None) and warm
+        replacements unless paused. Idle ones close now; ones being promoted
+        are retired after their current step. Returns (closed, retiring).
+        """
+        async with self._cond:
+            targets = [
+                s for s in self._sessions if session_ids is None or s.id in session_ids
+            ]
+            idle = [s for s in targets if not s.busy]
+            for s in idle:
+                self._sessions.remove(s)
+            retiring = [s for s in targets if s.busy]
+            for s in retiring:
+                s.retiring = True
+        for s in idle:
+            await asyncio.get_event_loop().run_in_executor(None, s.close)
+        async with self._cond:
+            self._fill_locked()
+        return len(idle), len(retiring)
+
+    async def resume(self):
+        """Undo `paused` and refill the pool."""
+        async with self._cond:
+            self.paused = False
+            self._fill_locked()
 
     async def shutdown(self):
-        """Close all sessions."""
-        async with self._lock:
-            while self._sessions:
-                self._sessions.popleft().close()
-            self._available.clear()
+        """Close all pooled sessions, in parallel."""
+        async with self._cond:
+            self.pool_size = 0
+            sessions, self._sessions = self._sessions, []
+        loop = asyncio.get_event_loop()
+        await asyncio.gather(*(loop.run_in_executor(None, s.close) for s in sessions))
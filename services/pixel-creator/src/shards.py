@@ -0,0 +1,308 @@
+"""
+Session pools sharded across several IntentCore accounts.
+
+Each configured account (see `Settings.intentcore_accounts`) gets its own
+`SessionPool`, login snapshot and upstream guard, so one account's rate
+limits or login trouble never holds up the others. Work is routed to an
+explicit account (by name or workspace URL) or else to the least-loaded
+account whose circuit is not open. `ShardedPool` has the same acquire/
+release interface as `SessionPool`, and runs the memory watchdog that
+samples every session's RSS and recycles those over the limit. The admin
+methods (`pool_state`, `configure`, `recycle`) act on one account or all.
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+
+from .config import IntentCoreAccount, settings
+from .memory import monitor as memory_monitor
+from . import tracing
+from .pixel_creator import Tier, WarmSession, warm_session
+from .session_pool import SessionPool
+from .upstream import OPEN, UpstreamUnavailable, guard
+
+logger = logging.getLogger(__name__)
+
+
+class _Shard:
+    def __init__(self, pool: SessionPool):
+        self.pool = pool
+        self.account = pool.account
+        # Sessions handed out and not yet returned; closed sessions drop out
+        # once garbage-collected
+        self.in_use: weakref.WeakSet[WarmSession] = weakref.WeakSet()
+        self.created = 0
+        self.failed = 0
+
+    @property
+    def available(self) -> bool:
+        return guard(self.account.name).breaker.state != OPEN
+
+    def load_key(self) -> tuple:
+        """Smaller is better: most-ready idle session, then most idle, then least busy."""
+        best = self.pool.best_idle_tier
+        return (
+            -(best if best is not None else -1),
+            -self.pool.idle_count,
+            len(self.in_use) / max(1, self.pool.pool_size),
+        )
+
+    def sessions(self) -> list[dict]:
+        """Every session of this account, pooled or out on a job."""
+        return [
+            {
+                "id": s.id,
+                "account": self.account.name,
+                "tier": s.tier.name.lower(),
+                "in_use": s in self.in_use,
+                "retiring": s.retiring,
+                "age_sec": int(time.time() - s.created_at),
+                "use_count": s.use_count,
+                "rss_mb": s.rss_bytes // (1024 * 1024),
+            }
+            for s in [*self.pool.sessions, *self.in_use]
+        ]
+
+    def state(self) -> dict:
+        return {
+            "account": self.account.name,
+            "workspace_url": self.account.workspace_url,
+            "pool_size": self.pool.pool_size,
+            "max_age_sec": self.pool.max_age_sec,
+            "paused": self.pool.paused,
+            "warm_sessions": self.pool.warm_count,
+            "sessions": self.sessions(),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "workspace_url": self.account.workspace_url,
+            "pool_size": self.pool.pool_size,
+            "warm_sessions": self.pool.warm_count,
+            "tiers": self.pool.tier_counts(),
+            "in_use": len(self.in_use),
+            "created": self.created,
+            "failed": self.failed,
+            "paused": self.pool.paused,
+            "upstream": guard(self.account.name).stats(),
+            "sessions": self.sessions(),
+        }
+
+
+class ShardedPool:
+    def __init__(
+        self,
+        accounts: list[IntentCoreAccount] | None = None,
+        pool_size: int | None = None,
+        max_age_sec: int = settings.session_max_age_sec,
+        step_retries: int = settings.warm_step_retries,
+        memory_sample_sec: float = settings.memory_sample_sec,
+    ):
+        accounts = accounts or settings.intentcore_accounts
+        self.memory_sample_sec = memory_sample_sec
+        self._watchdog: asyncio.Task | None = None
+        self._shards = {
+            a.name: _Shard(SessionPool(a, pool_size, max_age_sec, step_retries))
+            for a in accounts
+        }
+        self._default = accounts[0].name
+
+    @property
+    def accounts(self) -> list[IntentCoreAccount]:
+        return [s.account for s in self._shards.values()]
+
+    @property
+    def pool_size(self) -> int:
+        return sum(s.pool.pool_size for s in self._shards.values())
+
+    @property
+    def warm_count(self) -> int:
+        return sum(s.pool.warm_count for s in self._shards.values())
+
+    @property
+    def is_warming(self) -> bool:
+        return any(s.pool.is_warming for s in self._shards.values())
+
+    @property
+    def degraded(self) -> bool:
+        """True if any account's circuit is open."""
+        return not all(s.available for s in self._shards.values())
+
+    def tier_counts(self) -> dict[str, int]:
+        counts = {tier.name.lower(): 0 for tier in Tier}
+        for s in self._shards.values():
+            for tier, n in s.pool.tier_counts().items():
+                counts[tier] += n
+        return counts
+
+    def _find(self, key: str) -> _Shard:
+        shard = self._shards.get(key)
+        if shard is None:
+            url = key.rstrip("/")
+            shard = next(
+                (s for s in self._shards.values() if s.account.workspace_url == url), None
+            )
+        if shard is None:
+            raise ValueError(f"Unknown IntentCore account or workspace: {key}")
+        return shard
+
+    def shard(self, key: str | None = None) -> SessionPool:
+        """
+        The pool for account name or workspace URL `key` (the first
+        configured account if None). Raises ValueError for unknown keys.
+        """
+        return self._find(key or self._default).pool
+
+    def pick(self, key: str | None = None) -> SessionPool:
+        """
+        The pool that should take the next job: the one for `key` if given,
+        otherwise the least-loaded account whose circuit is closed. Raises
+        UpstreamUnavailable if the chosen (or every) account is unavailable.
+        """
+        if key:
+            pool = self._find(key).pool
+            guard(pool.account.name).breaker.check()
+            return pool
+        candidates = [s for s in self._shards.values() if s.available]
+        if not candidates:
+            raise UpstreamUnavailable(
+                "Every IntentCore account is unavailable (circuits open)",
+                min(guard(name).breaker.retry_after() for name in self._shards),
+            )
+        return min(candidates, key=_Shard.load_key).pool
+
+    async def start(self):
+        if self._watchdog is None and self.memory_sample_sec > 0:
+            self._watchdog = asyncio.ensure_future(self._watch_memory())
+        await asyncio.gather(*(s.pool.start() for s in self._shards.values()))
+
+    async def _watch_memory(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.memory_sample_sec)
+            try:
+                await loop.run_in_executor(None, memory_monitor.measure)
+                for s in self._shards.values():
+                    await s.pool.recycle_over_memory()
+            except Exception as e:
+                logger.warning(f"Memory sample failed: {e}")
+
+    async def acquire(
+        self,
+        timeout: float = 60.0,
+        target: Tier = Tier.MODAL_READY,
+        account: str | None = None,
+    ) -> WarmSession:
+        """Take a session from `account`'s pool, or the least-loaded one."""
+        pool = self.pick(account)
+        session = await pool.acquire(timeout, target)
+        self._shards[pool.account.name].in_use.add(session)
+        return session
+
+    async def warm_on_demand(self, account: str | None = None) -> WarmSession:
+        """
+        Launch and warm a session outside the pool (none was free), checked
+        out like one from `acquire`. The caller checks memory headroom first.
+        """
+        pool = self.pick(account)
+        memory_monitor.launching += 1
+        try:
+            session = await asyncio.get_event_loop().run_in_executor(
+                None, tracing.bind(warm_session), pool.account
+            )
+        finally:
+            memory_monitor.launching -= 1
+        self._shards[pool.account.name].in_use.add(session)
+        return session
+
+    async def release(self, session: WarmSession):
+        shard = self._shards[session.account.name]
+        shard.in_use.discard(session)
+        await shard.pool.release(session)
+
+    async def discard(self, session: WarmSession):
+        """Close a checked-out session instead of returning it (it is broken)."""
+        self._shards[session.account.name].in_use.discard(session)
+        await asyncio.get_event_loop().run_in_executor(None, session.close)
+
+    def record_create(self, session: WarmSession, ok: bool):
+        """Count a finished create (which consumed `session`) against its account."""
+        shard = self._shards[session.account.name]
+        shard.in_use.discard(session)
+        if ok:
+            shard.created += 1
+        else:
+            shard.failed += 1
+
+    async def shutdown(self):
+        """Close every browser, pooled or still out on a job, in parallel."""
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        loop = asyncio.get_event_loop()
+        in_use = [session for s in self._shards.values() for session in s.in_use]
+        if in_use:
+            logger.warning(f"Closing {len(in_use)} session(s) still in use")
+        await asyncio.gather(
+            *(s.pool.shutdown() for s in self._shards.values()),
+            *(loop.run_in_executor(None, session.close) for session in in_use),
+        )
+
+    def stats(self) -> dict:
+        return {name: s.stats() for name, s in self._shards.items()}
+
+    # --- Administration ---
+
+    def _select(self, key: str | None) -> list[_Shard]:
+        """The shard for `key`, or every shard if None."""
+        return [self._find(key)] if key else list(self._shards.values())
+
+    def pool_state(self, key: str | None = None) -> list[dict]:
+        return [s.state() for s in self._select(key)]
+
+    async def configure(
+        self,
+        key: str | None = None,
+        pool_size: int | None = None,
+        max_age_sec: int | None = None,
+        paused: bool | None = None,
+    ):
+        """Change pool settings live for account `key` (every account if None)."""
+        for s in self._select(key):
+            if max_age_sec is not None:
+                s.pool.max_age_sec = max_age_sec
+            if paused is True:
+                s.pool.paused = True
+            if pool_size is not None:
+                await s.pool.resize(pool_size)
+            if paused is False:
+                await s.pool.resume()
+
+    async def recycle(
+        self, key: str | None = None, session_id: str | None = None
+    ) -> tuple[int, int]:
+        """
+        Replace session `session_id` (every session if None) of account
+        `key` (every account if None). Sessions out on a job are retired and
+        closed when they come back. Returns (closed, retiring).
+        """
+        closed = retiring = 0
+        found = session_id is None
+        for s in self._select(key):
+            for session in list(s.in_use):
+                if session_id is None or session.id == session_id:
+                    session.retiring = True
+                    retiring += 1
+                    found = True
+            ids = None if session_id is None else {session_id}
+            if session_id is not None and not any(x.id == session_id for x in s.pool.sessions):
+                continue
+            found = True
+            n_closed, n_retiring = await s.pool.recycle(ids)
+            closed += n_closed
+            retiring += n_retiring
+        if not found:
+            raise ValueError(f"Unknown session: {session_id}")
+        return closed, retiring
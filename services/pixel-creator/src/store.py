@@ -0,0 +1,113 @@
+"""
+Durable local store of created pixels.
+
+Every successful creation is written to an embedded SQLite database so a
+snippet can be re-displayed without another browser run. Lookups by pixel
+ID hit the primary key; lookups by URL use an index on the normalized URL.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from .config import settings
+from .idempotency import normalize_url
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pixels (
+    pixel_id        TEXT PRIMARY KEY,
+    name            TEXT NOT NULL,
+    url             TEXT NOT NULL,
+    normalized_url  TEXT NOT NULL,
+    pixel_code      TEXT NOT NULL,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL,
+    timings         TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_pixels_normalized_url ON pixels (normalized_url);
+"""
+
+_COLUMNS = (
+    "pixel_id, name, url, normalized_url, pixel_code, created_at, updated_at, timings"
+)
+
+
+def _row_to_dict(row: sqlite3.Row) -> dict:
+    record = dict(row)
+    record["timings"] = json.loads(record["timings"])
+    return record
+
+
+class PixelStore:
+    def __init__(self, path: str = settings.pixel_store_path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def save(
+        self,
+        pixel_id: str,
+        name: str,
+        url: str,
+        pixel_code: str,
+        timings: dict[str, int] | None = None,
+    ) -> dict:
+        """Insert or update a pixel record and return it."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"""
+                INSERT INTO pixels ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (pixel_id) DO UPDATE SET
+                    name = excluded.name,
+                    url = excluded.url,
+                    normalized_url = excluded.normalized_url,
+                    pixel_code = excluded.pixel_code,
+                    updated_at = excluded.updated_at,
+                    timings = excluded.timings
+                """,
+                (
+                    pixel_id,
+                    name,
+                    url,
+                    normalize_url(url),
+                    pixel_code,
+                    now,
+                    now,
+                    json.dumps(timings or {}),
+                ),
+            )
+        return self.get(pixel_id)
+
+    def get(self, pixel_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM pixels WHERE pixel_id = ?", (pixel_id,)
+            ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def find_by_url(self, url: str) -> list[dict]:
+        """All pixels created for `url` (normalized), newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM pixels WHERE normalized_url = ? "
+                "ORDER BY created_at DESC",
+                (normalize_url(url),),
+            ).fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pixels").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,70 @@
+"""
+Lightweight per-stage wall-clock timing.
+
+A StageTimer records how long each named stage took since the previous
+mark, so a linear flow like fill_and_create() can be instrumented with one
+call per stage. Each mark is also a span of the current trace (see
+`tracing`).
+"""
+
+import time
+
+from . import tracing
+
+
+class StageTimer:
+    def __init__(self, stages: dict[str, int] | None = None, span_prefix: str = ""):
+        # Callers may pass their own dict to read stage timings even if the
+        # timed flow raises part-way through
+        self.stages = stages if stages is not None else {}
+        self.span_prefix = span_prefix
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, label: str) -> int:
+        """Record the time since the previous mark under `label` (ms)."""
+        now = time.perf_counter()
+        elapsed = int((now - self._last) * 1000)
+        self.stages[label] = elapsed
+        tracing.add_span(self.span_prefix + label, self._last, now)
+        self._last = now
+        return elapsed
+
+    @property
+    def total_ms(self) -> int:
+        return int((time.perf_counter() - self._start) * 1000)
+
+
+def percentile(values: list[int], pct: float) -> int:
+    """Nearest-rank percentile of `values` (0 for an empty list)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples: list[dict[str, int]]) -> dict[str, dict[str, int]]:
+    """Per-stage count/p50/p95/max over many runs' stage timings."""
+    by_stage: dict[str, list[int]] = {}
+    for stages in samples:
+        for label, ms in stages.items():
+            by_stage.setdefault(label, []).append(ms)
+    return {
+        label: {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": max(values),
+        }
+        for label, values in by_stage.items()
+    }
+
+
+def format_summary(summary: dict[str, dict[str, int]]) -> list[str]:
+    """Render a summarize() result as the bar chart the scripts print."""
+    lines = ["=" * 60, "  TIMING SUMMARY (p50 / p95)", "=" * 60]
+    for label, s in summary.items():
+        bar = "█" * max(1, s["p50"] // 100)
+        lines.append(f"  {s['p50']:>6}ms / {s['p95']:>6}ms  {bar}  {label}")
+    lines.append("=" * 60)
+    return lines
@@ -0,0 +1,357 @@
+"""
+Per-request traces and the slow-request flight recorder.
+
+Each browser job runs inside a `trace`: a trace id plus timed spans for
+admission, acquire, every warm and fill step and each poll for the
+pixel code. The current trace lives in a context variable, so the
+Selenium helpers add spans without it being passed around; `bind` carries
+it into executor threads. Finished traces are written as JSON lines to
+TRACE_LOG_PATH through a QueueHandler, so no request waits on the disk.
+
+`recorder` keeps the last TRACE_KEEP traces that failed, took longer
+than TRACE_SLOW_MS or were profiled. For those, `fill_and_create` hands its session to the
+recorder's thread, which saves a screenshot and a DOM snippet of the page
+and then closes the session, so the request returns without waiting. A
+failed session that goes back to the pool is queued the same way but left
+open (`capture_page`); the pool takes it back once the capture is done.
+
+Spans are cheap and always recorded; writing and keeping traces is off
+until `start` is called (the engine does, with the TRACE_* settings), so
+the scripts can use the instrumented helpers without the service's config.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+ERROR = "error"
+REJECTED = "rejected"  # refused by admission control or an open circuit
+
+# Enough for a create polling for the pixel code for its full timeout
+_MAX_SPANS = 500
+# Sessions waiting for a screenshot; beyond this they are closed unrecorded
+_MAX_PENDING_CAPTURES = 4
+
+_DOM_SNIPPET_JS = """
+var root = document.querySelector("div[role='dialog']") || document.body;
+return root ? root.outerHTML.substring(0, arguments[0]) : "";
+"""
+
+
+class Trace:
+    def __init__(self, name: str, /, **attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: list[dict] = []
+        self.dropped_spans = 0
+        self.status = OK
+        self.error: str | None = None
+        self.duration_ms: int | None = None
+        self.profile: dict | None = None  # see `profiling`
+        # Screenshot, DOM snippet and URL, filled in by the flight recorder
+        self.artifacts: dict = {}
+
+    @property
+    def elapsed_ms(self) -> int:
+        return int((time.perf_counter() - self._t0) * 1000)
+
+    def fail(self, error: str, status: str = ERROR):
+        self.status = status
+        self.error = error
+
+    def add_span(
+        self, name: str, start: float, end: float, error: str | None = None, /, **attrs
+    ):
+        """Record a span between two time.perf_counter() readings."""
+        if len(self.spans) >= _MAX_SPANS:
+            self.dropped_spans += 1
+            return
+        span = {
+            "name": name,
+            "start_ms": round((start - self._t0) * 1000, 1),
+            "duration_ms": round((end - start) * 1000, 1),
+        }
+        if attrs:
+            span["attrs"] = attrs
+        if error:
+            span["error"] = error
+        self.spans.append(span)
+
+    def to_dict(self, artifacts: bool = False) -> dict:
+        data = {
+            "trace_id": self.id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms if self.duration_ms is not None else self.elapsed_ms,
+            "status": self.status,
+            "error": self.error,
+            "spans": list(self.spans),
+            "dropped_spans": self.dropped_spans,
+        }
+        if self.profile is not None:
+            data["profile"] = self.profile
+        if artifacts:
+            data["artifacts"] = dict(self.artifacts)
+        return data
+
+
+_current: ContextVar[Trace | None] = ContextVar("trace", default=None)
+
+
+def current() -> Trace | None:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, /, **attrs):
+    """
+    Time the block as a span of the current trace (a no-op outside one).
+    Yields a dict the block may add attributes to.
+    """
+    trace = _current.get()
+    if trace is None:
+        yield attrs
+        return
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = str(e) or type(e).__name__
+        raise
+    finally:
+        trace.add_span(name, start, time.perf_counter(), error, **attrs)
+
+
+def add_span(name: str, start: float, end: float, /, **attrs):
+    """Record an already-timed span on the current trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add_span(name, start, end, **attrs)
+
+
+def bind(fn):
+    """`fn` bound to the current context (and trace), for run_in_executor."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+@contextmanager
+def trace(name: str, /, **attrs):
+    """Run the block as a new trace, then log it and offer it to the recorder."""
+    t = Trace(name, **attrs)
+    token = _current.set(t)
+    try:
+        yield t
+    except BaseException as e:
+        if t.status == OK:
+            t.fail(str(e) or type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        t.duration_ms = t.elapsed_ms
+        _writer.write(t)
+        recorder.keep(t)
+
+
+class _TraceWriter:
+    """JSON lines to a file, written by a QueueListener thread."""
+
+    def __init__(self):
+        self._logger = logging.getLogger(f"{__name__}.jsonl")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._listener: logging.handlers.QueueListener | None = None
+        self._handler: logging.Handler | None = None
+
+    def start(self, path: str):
+        if self._listener is not None or not path:
+            return
+        file_handler = logging.FileHandler(path)
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        self._handler = logging.handlers.QueueHandler(records)
+        self._logger.addHandler(self._handler)
+        self._listener = logging.handlers.QueueListener(records, file_handler)
+        self._listener.start()
+
+    def write(self, t: Trace):
+        if self._listener is not None:
+            self._logger.info(json.dumps(t.to_dict(), default=str))
+
+    def stop(self):
+        """Flush pending lines and close the file."""
+        if self._listener is None:
+            return
+        self._logger.removeHandler(self._handler)
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+        self._listener = None
+
+
+class FlightRecorder:
+    def __init__(self, keep: int = 0, slow_ms: int = 0, dom_chars: int = 0):
+        self.slow_ms = slow_ms
+        self.dom_chars = dom_chars
+        self._traces: deque[Trace] = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._captures: queue.Queue = queue.Queue(maxsize=_MAX_PENDING_CAPTURES)
+        self._thread: threading.Thread | None = None
+        self.kept = 0
+        self.captured = 0
+        self.skipped_captures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._traces.maxlen)
+
+    def configure(self, keep: int, slow_ms: int, dom_chars: int):
+        with self._lock:
+            self._traces = deque(self._traces, maxlen=keep)
+        self.slow_ms = slow_ms
+        self.dom_chars = dom_chars
+
+    def _wants(self, t: Trace) -> bool:
+        return self.enabled and (
+            t.status == ERROR
+            or t.profile is not None
+            or (t.status == OK and t.elapsed_ms >= self.slow_ms)
+        )
+
+    def keep(self, t: Trace):
+        if self._wants(t):
+            with self._lock:
+                self._traces.append(t)
+            self.kept += 1
+
+    def capture(self, session, failed: bool = False) -> bool:
+        """
+        Take over `session` if the current trace is failing or slow: the
+        recorder's thread screenshots it and then closes it. Returns False
+        if it was not taken, in which case the caller still owns it.
+        """
+        t = _current.get()
+        if t is None or not self.enabled:
+            return False
+        if not failed and t.elapsed_ms < self.slow_ms:
+            return False
+        self._start_thread()
+        try:
+            self._captures.put_nowait((t, session, None))
+        except queue.Full:
+            self.skipped_captures += 1
+            return False
+        return True
+
+    def capture_page(self, session) -> threading.Event | None:
+        """
+        Have the recorder's thread save the page of the current trace's
+        failed run, leaving the session open (for sessions that are reused).
+        Returns an event set once the page is saved, or None if it is not
+        captured; the session must not be used before then.
+        """
+        t = _current.get()
+        if t is None or not self.enabled:
+            return None
+        self._start_thread()
+        done = threading.Event()
+        try:
+            self._captures.put_nowait((t, session, done))
+        except queue.Full:
+            self.skipped_captures += 1
+            return None
+        return done
+
+    def _start_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="flight-recorder", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._captures.get()
+            if item is None:
+                return
+            t, session, done = item
+            try:
+                self._save_page(t, session)
+            finally:
+                if done is None:
+                    session.close()
+                else:
+                    done.set()
+
+    def _save_page(self, t: Trace, session):
+        try:
+            driver = session.driver
+            t.artifacts["url"] = driver.current_url
+            t.artifacts["dom"] = driver.execute_script(_DOM_SNIPPET_JS, self.dom_chars)
+            t.artifacts["screenshot_png"] = driver.get_screenshot_as_base64()
+            self.captured += 1
+        except Exception as e:
+            t.artifacts["capture_error"] = str(e) or type(e).__name__
+
+    def stop(self):
+        """Finish pending captures (closing the sessions that are not reused)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._captures.put(None)
+            thread.join(timeout=30)
+
+    def traces(self) -> list[dict]:
+        """Kept traces, newest first, without their artifacts."""
+        with self._lock:
+            kept = list(self._traces)
+        return [
+            {**t.to_dict(), "has_screenshot": "screenshot_png" in t.artifacts}
+            for t in reversed(kept)
+        ]
+
+    def get(self, trace_id: str) -> dict | None:
+        with self._lock:
+            t = next((t for t in self._traces if t.id == trace_id), None)
+        return t.to_dict(artifacts=True) if t is not None else None
+
+    def stats(self) -> dict:
+        return {
+            "kept": len(self._traces),
+            "slow_ms": self.slow_ms,
+            "recorded": self.kept,
+            "screenshots": self.captured,
+            "skipped_screenshots": self.skipped_captures,
+        }
+
+
+_writer = _TraceWriter()
+recorder = FlightRecorder()
+
+
+def start(log_path: str, keep: int, slow_ms: int, dom_chars: int):
+    """Write trace lines to `log_path` (if set) and turn on the recorder."""
+    _writer.start(log_path)
+    recorder.configure(keep, slow_ms, dom_chars)
+
+
+def stop():
+    recorder.stop()
+    _writer.stop()
@@ -0,0 +1,238 @@
+"""
+Protection for the IntentCore upstream: rate limits and a circuit breaker.
+
+Each IntentCore account has its own guard. Logins and creates draw from
+token buckets shared by every session of the account, so a burst of
+warm-ups or requests is spread out instead of hitting IntentCore all at
+once. Every warm step and create reports its outcome to the account's
+circuit breaker; after `failure_threshold` consecutive failures the circuit
+opens and browser work fails fast with UpstreamUnavailable. Once the open
+period has passed a single half-open probe is let through — success closes
+the circuit, failure re-opens it with a longer wait.
+
+Both are used from executor threads as well as the event loop, so they
+are guarded by plain locks.
+"""
+
+import logging
+import math
+import threading
+import time
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Browser work refused to protect IntentCore; retry after `retry_after`."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, name: str, rate_per_min: float, burst: int, max_wait_sec: float):
+        self.name = name
+        self.rate = rate_per_min / 60.0
+        self.burst = max(1, burst)
+        self.max_wait_sec = max_wait_sec
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_ms = 0
+        self.refused = 0
+
+    def _refill_locked(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Take one token, sleeping until one is available (blocking — call
+        from a worker thread). Raises UpstreamUnavailable if that would take
+        longer than `max_wait_sec`.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def reserve(self) -> float:
+        """
+        Take one token without waiting and return how many seconds the
+        caller must wait before using it (so the event loop can sleep
+        instead). Raises UpstreamUnavailable like `acquire`.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            # Reserve the token now; a negative balance queues later callers
+            # behind us
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > self.max_wait_sec:
+                self.refused += 1
+                raise UpstreamUnavailable(
+                    f"IntentCore {self.name} rate limit reached", math.ceil(wait)
+                )
+            self._tokens -= 1
+        if wait > 0:
+            logger.info(f"Rate limit: waiting {wait:.1f}s for a {self.name} token")
+            self.waited_ms += int(wait * 1000)
+        return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill_locked(time.monotonic())
+            tokens = self._tokens
+        return {
+            "rate_per_min": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "tokens": round(tokens, 2),
+            "waited_ms": self.waited_ms,
+            "refused": self.refused,
+        }
+
+
+class CircuitBreaker:
+    def __init__(
+        self, name: str, failure_threshold: int, reset_sec: float, max_reset_sec: float
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_sec = reset_sec
+        self.max_reset_sec = max_reset_sec
+        self._state = CLOSED
+        self._failures = 0
+        self._open_for = reset_sec
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.last_error: str | None = None
+
+    def _state_locked(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._open_for:
+            self._state = HALF_OPEN
+            logger.info(f"Circuit '{self.name}' half-open: next call is a probe")
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked()
+
+    def retry_after(self) -> int:
+        with self._lock:
+            if self._state_locked() != OPEN:
+                return 1
+            remaining = self._open_for - (time.monotonic() - self._opened_at)
+            return max(1, math.ceil(remaining))
+
+    def check(self):
+        """Fail fast if the circuit is open (does not take the probe slot)."""
+        if self.state == OPEN:
+            raise UpstreamUnavailable(
+                f"IntentCore account '{self.name}' is unavailable (circuit open)",
+                self.retry_after(),
+            )
+
+    def before_call(self):
+        """Gate one upstream call; must be followed by record_success/failure."""
+        with self._lock:
+            state = self._state_locked()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+        raise UpstreamUnavailable(
+            f"IntentCore account '{self.name}' is unavailable (circuit open)",
+            self.retry_after(),
+        )
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed: probe succeeded")
+            self._state = CLOSED
+            self._failures = 0
+            self._open_for = self.reset_sec
+            self._probing = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.last_error = str(error) or type(error).__name__
+            self._failures += 1
+            if self._state == HALF_OPEN:
+                # Failed probe: stay away longer each time
+                self._open_for = min(self.max_reset_sec, self._open_for * 2)
+            elif self._failures < self.failure_threshold or self._state == OPEN:
+                return
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+            self._probing = False
+            self.trips += 1
+            logger.error(
+                f"Circuit '{self.name}' open for {self._open_for:.0f}s after {self._failures} "
+                f"consecutive failure(s): {self.last_error}"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_after_sec": self.retry_after() if self.state == OPEN else 0,
+            "trips": self.trips,
+            "last_error": self.last_error,
+        }
+
+
+class AccountGuard:
+    """Rate limits and circuit breaker for one IntentCore account."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.login_limiter = TokenBucket(
+            f"{name} login",
+            settings.upstream_login_rate_per_min,
+            settings.upstream_login_burst,
+            max_wait_sec=60,
+        )
+        self.create_limiter = TokenBucket(
+            f"{name} create",
+            settings.upstream_create_rate_per_min,
+            settings.upstream_create_burst,
+            max_wait_sec=30,
+        )
+        self.breaker = CircuitBreaker(
+            name,
+            settings.breaker_failure_threshold,
+            settings.breaker_reset_sec,
+            settings.breaker_max_reset_sec,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.stats(),
+            "login_limiter": self.login_limiter.stats(),
+            "create_limiter": self.create_limiter.stats(),
+        }
+
+
+_guards: dict[str, AccountGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def guard(account: str) -> AccountGuard:
+    """The (shared) guard for the named account."""
+    with _guards_lock:
+        if account not in _guards:
+            _guards[account] = AccountGuard(account)
+        return _guards[account]
@@ -0,0 +1,7 @@
+import os
+
+# Settings are read on import and require an account and an API key
+os.environ.setdefault("INTENTCORE_EMAIL", "test@example.com")
+os.environ.setdefault("INTENTCORE_PASSWORD", "test")
+os.environ.setdefault("INTENTCORE_WORKSPACE_URL", "https://app.intentcore.io/home/test")
+os.environ.setdefault("API_KEY", "test-key")
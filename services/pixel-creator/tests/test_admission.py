@@ -0,0 +1,203 @@
+import asyncio
+
+import pytest
+
+from src.admission import BATCH, INTERACTIVE, AdmissionController, AdmissionRejected
+
+
+def make_controller(**overrides) -> AdmissionController:
+    options = dict(
+        max_inflight=1,
+        max_queue=10,
+        queue_timeout_sec=5,
+        tenant_max_inflight=0,
+        tenant_max_queue=10,
+        tenant_weights={},
+    )
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+async def hold(controller, tenant="t", priority=INTERACTIVE, until=None, order=None):
+    async with controller.admit(tenant, priority):
+        if order is not None:
+            order.append(tenant)
+        if until is not None:
+            await until.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_queues_beyond_max_inflight():
+    controller = make_controller(max_inflight=2)
+    release = asyncio.Event()
+    jobs = [asyncio.create_task(hold(controller, until=release)) for _ in range(3)]
+    await settle()
+    assert controller.inflight == 2
+    assert controller.queued == 1
+
+    release.set()
+    await asyncio.gather(*jobs)
+    assert controller.inflight == 0
+    assert controller.admitted == 3
+
+
+async def test_rejects_when_queue_is_full():
+    controller = make_controller(max_queue=1)
+    release = asyncio.Event()
+    jobs = [asyncio.create_task(hold(controller, until=release)) for _ in range(2)]
+    await settle()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await hold(controller)
+    assert rejected.value.retry_after >= 1
+    assert controller.rejected == 1
+
+    release.set()
+    await asyncio.gather(*jobs)
+
+
+async def test_rejects_when_tenant_queue_is_full():
+    controller = make_controller(tenant_max_queue=1)
+    release = asyncio.Event()
+    jobs = [asyncio.create_task(hold(controller, "a", until=release)) for _ in range(2)]
+    await settle()
+
+    with pytest.raises(AdmissionRejected):
+        await hold(controller, "a")
+    # Another tenant may still queue
+    other = asyncio.create_task(hold(controller, "b"))
+    await settle()
+    assert controller.queued == 2
+
+    release.set()
+    await asyncio.gather(*jobs, other)
+
+
+async def test_queue_bounds_only_apply_to_jobs_that_wait():
+    controller = make_controller(max_queue=0)
+    await hold(controller)
+    assert controller.admitted == 1
+    assert controller.rejected == 0
+
+
+async def test_no_wait_rejects_without_counting():
+    controller = make_controller()
+    release = asyncio.Event()
+    job = asyncio.create_task(hold(controller, until=release))
+    await settle()
+
+    with pytest.raises(AdmissionRejected):
+        async with controller.admit("t", wait=False):
+            pass
+    assert controller.rejected == 0
+    assert controller.queued == 0
+
+    release.set()
+    await job
+
+
+async def test_weighted_fair_order():
+    controller = make_controller(tenant_weights={"heavy": 2.0})
+    release = asyncio.Event()
+    blocker = asyncio.create_task(hold(controller, "blocker", until=release))
+    await settle()
+
+    order = []
+    jobs = [asyncio.create_task(hold(controller, "heavy", order=order)) for _ in range(4)]
+    jobs += [asyncio.create_task(hold(controller, "light", order=order)) for _ in range(2)]
+    await settle()
+    release.set()
+    await asyncio.gather(blocker, *jobs)
+
+    # Twice the weight, twice the share — without starving the other tenant
+    assert order == ["heavy", "heavy", "light", "heavy", "heavy", "light"]
+
+
+async def test_interactive_runs_before_batch():
+    controller = make_controller()
+    release = asyncio.Event()
+    blocker = asyncio.create_task(hold(controller, "blocker", until=release))
+    await settle()
+
+    order = []
+    batch = asyncio.create_task(hold(controller, "bulk", BATCH, order=order))
+    await settle()
+    interactive = asyncio.create_task(hold(controller, "web", INTERACTIVE, order=order))
+    await settle()
+    release.set()
+    await asyncio.gather(blocker, batch, interactive)
+
+    assert order == ["web", "bulk"]
+
+
+async def test_tenant_inflight_cap():
+    controller = make_controller(max_inflight=3, tenant_max_inflight=1)
+    release = asyncio.Event()
+    jobs = [asyncio.create_task(hold(controller, "a", until=release)) for _ in range(2)]
+    jobs.append(asyncio.create_task(hold(controller, "b", until=release)))
+    await settle()
+
+    assert controller.inflight == 2
+    assert controller.queued == 1
+
+    release.set()
+    await asyncio.gather(*jobs)
+
+
+async def test_timeout_gives_back_the_tag():
+    controller = make_controller(queue_timeout_sec=0.05)
+    release = asyncio.Event()
+    blocker = asyncio.create_task(hold(controller, until=release))
+    await settle()
+    tag = controller._tenants["t"].last_tag
+
+    with pytest.raises(AdmissionRejected):
+        await hold(controller)
+    assert controller.timed_out == 1
+    assert controller.queued == 0
+    assert controller._tenants["t"].last_tag == tag
+
+    release.set()
+    await blocker
+    assert controller.inflight == 0
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    controller = make_controller()
+    release = asyncio.Event()
+    blocker = asyncio.create_task(hold(controller, until=release))
+    waiter = asyncio.create_task(hold(controller))
+    await settle()
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert controller.queued == 0
+
+    release.set()
+    await blocker
+    assert controller.inflight == 0
+
+
+async def test_close_rejects_waiters_and_new_jobs():
+    controller = make_controller()
+    release = asyncio.Event()
+    blocker = asyncio.create_task(hold(controller, until=release))
+    waiter = asyncio.create_task(hold(controller))
+    await settle()
+
+    controller.close()
+    with pytest.raises(AdmissionRejected):
+        await waiter
+    with pytest.raises(AdmissionRejected):
+        await hold(controller)
+
+    # The admitted job keeps its slot until it finishes
+    assert controller.inflight == 1
+    release.set()
+    await blocker
+    assert controller.inflight == 0
@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from src.asset_proxy import AssetCache, CachedAsset, may_be_cached, should_cache
+
+
+def asset(body: bytes, status: int = 200) -> CachedAsset:
+    return CachedAsset(status, [("Content-Type", "text/javascript")], body)
+
+
+@pytest.mark.parametrize(
+    "path, cached",
+    [
+        ("/assets/app-3f9c2a1b.js", True),
+        ("/main.3f9c2a1b9d.css?v=2", True),
+        ("/_next/static/chunks/main.js", True),
+        ("/assets/logo.svg", True),
+        ("/app.js", False),
+        ("/api/pixels", False),
+        ("/pixel", False),
+    ],
+)
+def test_may_be_cached(path, cached):
+    assert may_be_cached(path) is cached
+
+
+@pytest.mark.parametrize(
+    "path, status, cache_control, stored",
+    [
+        ("/assets/app-3f9c2a1b.js", 200, "", True),
+        ("/assets/app-3f9c2a1b.js", 404, "", False),
+        ("/assets/app-3f9c2a1b.js", 200, "no-store", False),
+        ("/assets/app-3f9c2a1b.js", 200, "private, max-age=60", False),
+        ("/_next/static/chunks/main.js", 200, "max-age=60", False),
+        ("/_next/static/chunks/main.js", 200, "public, max-age=31536000, immutable", True),
+    ],
+)
+def test_should_cache(path, status, cache_control, stored):
+    assert should_cache(path, status, cache_control) is stored
+
+
+def test_cached_asset_round_trip():
+    original = CachedAsset(200, [("Content-Type", "text/css"), ("ETag", '"x"')], b"body")
+    copy = CachedAsset.from_bytes(original.to_bytes())
+    assert (copy.status, copy.headers, copy.body) == (original.status, original.headers, b"body")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = AssetCache(memory_bytes=10)
+    cache.put("a", asset(b"aaaa"))
+    cache.put("b", asset(b"bbbb"))
+    assert cache.get("a") is not None
+    cache.put("c", asset(b"cccc"))
+
+    assert cache.get("b") is None
+    assert cache.get("a").body == b"aaaa"
+    assert cache.get("c").body == b"cccc"
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_bytes"] == 8
+
+
+def test_assets_larger_than_memory_are_not_kept():
+    cache = AssetCache(memory_bytes=4)
+    cache.put("big", asset(b"too large"))
+    assert cache.get("big") is None
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    cache = AssetCache(memory_bytes=100, disk_dir=str(tmp_path), disk_bytes=10_000)
+    cache.put("k", asset(b"bundle"))
+
+    restarted = AssetCache(memory_bytes=100, disk_dir=str(tmp_path), disk_bytes=10_000)
+    hit = restarted.get("k")
+    assert hit.body == b"bundle"
+    assert hit.headers == [("Content-Type", "text/javascript")]
+    assert restarted.disk_hits == 1
+    # Promoted to memory
+    restarted.get("k")
+    assert restarted.disk_hits == 1
+    assert restarted.hits == 2
+
+
+def test_disk_tier_evicts_by_bytes(tmp_path):
+    entry_size = len(asset(b"x" * 100).to_bytes())
+    cache = AssetCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=entry_size * 2)
+    for key in ("a", "b", "c"):
+        cache.put(key, asset(b"x" * 100))
+
+    assert cache.stats()["disk_entries"] == 2
+    assert len(os.listdir(tmp_path)) == 2
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+
+def test_corrupt_disk_entry_is_dropped(tmp_path):
+    cache = AssetCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=10_000)
+    cache.put("k", asset(b"bundle"))
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(b"\x00\x00\x00\xffnot json")
+
+    assert cache.get("k") is None
+    assert cache.stats()["disk_entries"] == 0
+    assert not path.exists()
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from src.idempotency import RequestCoalescer, derive_key, normalize_url
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("Example.COM/", "https://example.com"),
+        ("  www.example.com  ", "https://www.example.com"),
+        ("https://example.com:443/", "https://example.com"),
+        ("http://example.com:80/Path/?q=1#frag", "http://example.com/Path?q=1"),
+        ("https://shop.example.co.uk:8443/a", "https://shop.example.co.uk:8443/a"),
+    ],
+)
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "",
+        "exa mple.com",
+        "ftp://example.com",
+        "localhost",
+        "https://example",
+        "https://example.com:99999",
+    ],
+)
+def test_normalize_url_rejects(url):
+    with pytest.raises(ValueError):
+        normalize_url(url)
+
+
+def test_derive_key_ignores_spelling_variants():
+    assert derive_key("My  Pixel", "Example.com/") == derive_key("my pixel", "https://example.com")
+    assert derive_key("My Pixel", "example.com") != derive_key("My Pixel", "example.org")
+
+
+class Factory:
+    def __init__(self, result="ok", error: Exception | None = None, delay: float = 0.01):
+        self.result = result
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def test_concurrent_requests_share_one_run():
+    coalescer = RequestCoalescer(ttl_sec=60)
+    factory = Factory()
+    results = await asyncio.gather(*(coalescer.run("k", factory) for _ in range(3)))
+    assert results == ["ok"] * 3
+    assert factory.calls == 1
+    assert coalescer.coalesced == 2
+    assert coalescer.stats()["inflight"] == 0
+
+
+async def test_recent_result_is_replayed():
+    coalescer = RequestCoalescer(ttl_sec=60)
+    factory = Factory()
+    await coalescer.run("k", factory)
+    assert await coalescer.run("k", factory) == "ok"
+    assert factory.calls == 1
+    assert coalescer.cache_hits == 1
+
+
+async def test_results_failing_cache_if_are_not_replayed():
+    coalescer = RequestCoalescer(ttl_sec=60)
+    factory = Factory(result="failed")
+    await coalescer.run("k", factory, cache_if=lambda r: r == "ok")
+    await coalescer.run("k", factory, cache_if=lambda r: r == "ok")
+    assert factory.calls == 2
+
+
+async def test_expired_result_runs_again():
+    coalescer = RequestCoalescer(ttl_sec=-1)
+    factory = Factory()
+    await coalescer.run("k", factory)
+    await coalescer.run("k", factory)
+    assert factory.calls == 2
+
+
+async def test_cache_keeps_max_entries():
+    coalescer = RequestCoalescer(ttl_sec=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        await coalescer.run(key, Factory())
+    factory = Factory()
+    await coalescer.run("a", factory)
+    assert factory.calls == 1
+    assert coalescer.stats()["cached"] == 2
+
+
+async def test_error_is_shared_and_not_cached():
+    coalescer = RequestCoalescer(ttl_sec=60)
+    factory = Factory(error=RuntimeError("boom"))
+    results = await asyncio.gather(
+        coalescer.run("k", factory), coalescer.run("k", factory), return_exceptions=True
+    )
+    assert [str(r) for r in results] == ["boom", "boom"]
+    assert factory.calls == 1
+
+    with pytest.raises(RuntimeError):
+        await coalescer.run("k", factory)
+    assert factory.calls == 2
+
+
+async def test_cancelled_first_caller_does_not_fail_the_others():
+    coalescer = RequestCoalescer(ttl_sec=60)
+    factory = Factory(delay=0.05)
+    first = asyncio.create_task(coalescer.run("k", factory))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(coalescer.run("k", factory))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert await second == "ok"
+    assert factory.calls == 1
+
+
+async def test_run_outlives_a_lone_caller():
+    coalescer = RequestCoalescer(ttl_sec=60)
+    factory = Factory(delay=0.02)
+    caller = asyncio.create_task(coalescer.run("k", factory))
+    await asyncio.sleep(0)
+    caller.cancel()
+    await asyncio.sleep(0.05)
+
+    # The run finished without its caller, and its result is replayed
+    assert await coalescer.run("k", factory) == "ok"
+    assert factory.calls == 1
@@ -0,0 +1,142 @@
+import pytest
+
+from src.jobqueue import DONE, FAILED, QUEUED, RUNNING, SQLiteJobQueue, open_queue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    yield q
+    q.close()
+
+
+def test_claim_and_ack(queue):
+    job = queue.enqueue("create", {"name": "a"})
+    assert job["status"] == QUEUED
+
+    claimed = queue.claim("w1", lease_sec=60)
+    assert claimed["job_id"] == job["job_id"]
+    assert claimed["status"] == RUNNING
+    assert claimed["attempts"] == 1
+    assert claimed["reclaimed"] is False
+    assert queue.claim("w2", lease_sec=60) is None
+
+    assert queue.ack(job["job_id"], "w1", {"success": True})
+    done = queue.get(job["job_id"])
+    assert done["status"] == DONE
+    assert done["result"] == {"success": True}
+
+
+def test_enqueue_is_idempotent_by_job_id(queue):
+    first = queue.enqueue("create", {"name": "a"}, job_id="j1")
+    again = queue.enqueue("create", {"name": "b"}, job_id="j1")
+    assert again["payload"] == first["payload"]
+    assert queue.stats()[QUEUED] == 1
+
+
+def test_failed_job_is_queued_again_on_enqueue(queue):
+    queue.enqueue("create", {}, job_id="j1")
+    queue.claim("w1", lease_sec=60)
+    queue.fail("j1", "w1", "boom")
+    assert queue.get("j1")["status"] == FAILED
+
+    again = queue.enqueue("create", {}, job_id="j1")
+    assert again["status"] == QUEUED
+    assert again["attempts"] == 0
+    assert again["error"] is None
+
+
+def test_claim_filters_by_kind(queue):
+    queue.enqueue("delete", {})
+    assert queue.claim("w1", lease_sec=60, kinds=["create"]) is None
+    assert queue.claim("w1", lease_sec=60, kinds=["delete"])["kind"] == "delete"
+
+
+def test_nack_retries_until_max_attempts(queue):
+    job = queue.enqueue("create", {}, max_attempts=2)
+    queue.claim("w1", lease_sec=60)
+    assert queue.nack(job["job_id"], "w1", "flaky", retry_delay_sec=0)
+    assert queue.get(job["job_id"])["status"] == QUEUED
+
+    assert queue.claim("w1", lease_sec=60)["attempts"] == 2
+    assert queue.nack(job["job_id"], "w1", "flaky again", retry_delay_sec=0)
+    failed = queue.get(job["job_id"])
+    assert failed["status"] == FAILED
+    assert failed["error"] == "flaky again"
+
+
+def test_nack_delays_the_retry(queue):
+    job = queue.enqueue("create", {})
+    queue.claim("w1", lease_sec=60)
+    queue.nack(job["job_id"], "w1", "busy", retry_delay_sec=60)
+    assert queue.claim("w1", lease_sec=60) is None
+
+
+def test_defer_does_not_count_an_attempt(queue):
+    job = queue.enqueue("create", {})
+    queue.claim("w1", lease_sec=60)
+    assert queue.defer(job["job_id"], "w1", delay_sec=0)
+    assert queue.claim("w1", lease_sec=60)["attempts"] == 1
+
+
+def test_only_the_lease_owner_updates_a_job(queue):
+    job = queue.enqueue("create", {})
+    queue.claim("w1", lease_sec=60)
+    assert not queue.heartbeat(job["job_id"], "w2", lease_sec=60)
+    assert not queue.ack(job["job_id"], "w2", {})
+    assert queue.heartbeat(job["job_id"], "w1", lease_sec=60)
+
+
+def test_expired_lease_is_reclaimed_for_reconciliation(queue):
+    job = queue.enqueue("create", {})
+    queue.claim("w1", lease_sec=-1)
+
+    reclaimed = queue.claim("w2", lease_sec=60)
+    assert reclaimed["job_id"] == job["job_id"]
+    assert reclaimed["reclaimed"] is True
+    assert reclaimed["lease_owner"] == "w2"
+    # Reconciling is not another attempt
+    assert reclaimed["attempts"] == 1
+    # The first worker lost the job
+    assert not queue.ack(job["job_id"], "w1", {})
+    assert not queue.heartbeat(job["job_id"], "w1", lease_sec=60)
+
+
+def test_abandoned_job_is_reclaimable_at_once(queue):
+    job = queue.enqueue("create", {})
+    queue.claim("w1", lease_sec=60)
+    assert queue.abandon(job["job_id"], "w1")
+
+    reclaimed = queue.claim("w2", lease_sec=60)
+    assert reclaimed["job_id"] == job["job_id"]
+    assert reclaimed["reclaimed"] is True
+
+
+def test_ack_late_records_a_result_once(queue):
+    job = queue.enqueue("create", {})
+    queue.claim("w1", lease_sec=-1)
+    queue.claim("w2", lease_sec=60)
+
+    assert queue.ack_late(job["job_id"], {"success": True})
+    assert queue.get(job["job_id"])["status"] == DONE
+    assert not queue.ack_late(job["job_id"], {"success": True})
+    assert not queue.ack(job["job_id"], "w2", {})
+
+
+def test_purge_and_stats(queue):
+    done = queue.enqueue("create", {})
+    queue.claim("w1", lease_sec=60)
+    queue.ack(done["job_id"], "w1", {})
+    queue.enqueue("create", {})
+
+    assert queue.stats() == {QUEUED: 1, RUNNING: 0, DONE: 1, FAILED: 0}
+    assert queue.purge(older_than_sec=-1) == 1
+    assert queue.get(done["job_id"]) is None
+
+
+def test_open_queue(tmp_path):
+    queue = open_queue(f"sqlite://{tmp_path}/jobs.db")
+    assert isinstance(queue, SQLiteJobQueue)
+    queue.close()
+    with pytest.raises(ValueError):
+        open_queue("redis://localhost/0")
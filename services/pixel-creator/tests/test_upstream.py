@@ -0,0 +1,132 @@
+import types
+
+import pytest
+
+from src import upstream
+from src.upstream import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    TokenBucket,
+    UpstreamUnavailable,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(
+        upstream, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep)
+    )
+    return clock
+
+
+def test_bucket_allows_a_burst_then_spaces_calls(clock):
+    bucket = TokenBucket("create", rate_per_min=60, burst=2, max_wait_sec=10)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1.0)
+    # Reserved tokens queue later callers behind earlier ones
+    assert bucket.reserve() == pytest.approx(2.0)
+
+
+def test_bucket_refills_over_time(clock):
+    bucket = TokenBucket("create", rate_per_min=60, burst=1, max_wait_sec=10)
+    bucket.reserve()
+    clock.now += 1
+    assert bucket.reserve() == 0
+    clock.now += 100
+    assert bucket.stats()["tokens"] == 1
+
+
+def test_bucket_refuses_waits_beyond_the_limit(clock):
+    bucket = TokenBucket("login", rate_per_min=6, burst=1, max_wait_sec=5)
+    bucket.reserve()
+    with pytest.raises(UpstreamUnavailable) as refused:
+        bucket.reserve()
+    assert refused.value.retry_after == 10
+    assert bucket.refused == 1
+
+
+def test_acquire_sleeps_out_the_wait(clock):
+    bucket = TokenBucket("create", rate_per_min=60, burst=1, max_wait_sec=10)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.now == pytest.approx(1001.0)
+    assert bucket.waited_ms == 1000
+
+
+def test_zero_rate_is_unlimited(clock):
+    bucket = TokenBucket("create", rate_per_min=0, burst=1, max_wait_sec=0)
+    assert all(bucket.reserve() == 0 for _ in range(10))
+
+
+def make_breaker() -> CircuitBreaker:
+    return CircuitBreaker("acct", failure_threshold=2, reset_sec=30, max_reset_sec=100)
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = make_breaker()
+    breaker.record_failure(RuntimeError("one"))
+    breaker.record_success()
+    breaker.record_failure(RuntimeError("two"))
+    assert breaker.state == CLOSED
+
+    breaker.record_failure(RuntimeError("three"))
+    assert breaker.state == OPEN
+    assert breaker.trips == 1
+    with pytest.raises(UpstreamUnavailable) as refused:
+        breaker.check()
+    assert refused.value.retry_after == 30
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+
+
+def test_breaker_lets_one_probe_through_when_half_open(clock):
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.record_failure(RuntimeError("down"))
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+
+    breaker.check()
+    breaker.before_call()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_for_longer(clock):
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.record_failure(RuntimeError("down"))
+
+    for expected in (60, 100, 100):
+        clock.now += 100
+        breaker.before_call()
+        breaker.record_failure(RuntimeError("still down"))
+        assert breaker.state == OPEN
+        assert breaker.retry_after() == expected
+
+    # Success resets the open period
+    clock.now += 100
+    breaker.before_call()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure(RuntimeError("down again"))
+    assert breaker.retry_after() == 30